@@ -1,12 +1,22 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import pandas_market_calendars as mcal
 import numpy as np
-import plotly.graph_objects as go
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 import os
 import requests
 import warnings
 import logging
+import time
+
+from candle_scheduler import CandleScheduler, candle_close, due_tasks, nse_holidays
+from market_data import TIMEFRAMES, fetch_task, load_universe
+from scan_cache import ScanCache, cache_key, cached_stages
+from single_flight import SingleFlight, shared_stages
+from scan_jobs import discard_checkpoint, get_job, list_checkpoints, rescan_job, resume_job, start_job
+from series_store import SeriesStore, series_id
+from zone_charts import ZOOM_FULL, ZOOM_RECENT, grid_selection, setup_chart
+from zone_kernel import ENGINE_VERSION, detect_zones_universe, max_base_for, zones_by_symbol
 
 
 st.set_page_config("Demand & Supply Scanner", layout="wide")
@@ -14,166 +24,66 @@ st.set_page_config("Demand & Supply Scanner", layout="wide")
 # ---------------- LOAD NIFTY 500 ---------------- #
 @st.cache_data
 def load_nifty500():
-    df = pd.read_csv("ind_nifty500list.csv")  # column: Symbol
-    return [s + ".NS" for s in df["Symbol"].tolist()]
+    return load_universe("ind_nifty500list.csv")
 
 
 STOCKS = load_nifty500()[:50]
 
-TIMEFRAMES = {
-    "15m": "15m", "30m": "30m", "60m": "60m", "75m": "75m",
-    "120m": "120m", "125m": "125m", "240m": "240m",
-    "Daily": "1d", "Weekly": "1wk", "Monthly": "1mo"
-}
+FETCH_WORKERS = 8
+DETECT_BATCH_SIZE = 32
+JOB_POLL_SECONDS = 1.0
+RESCAN_POLL_SECONDS = 30  # longest wait between checks for a closed candle
+# Saved scans hold (zones, series id) per task; bump when that changes
+CHECKPOINT_VERSION = (ENGINE_VERSION, 2)
 
 # ---------------- CORE FUNCTIONS ---------------- #
-# def fetch_data(symbol, interval):
-#     try:
-#         logging.getLogger('yfinance').setLevel(logging.CRITICAL)
-#         warnings.filterwarnings('ignore')
-#         data = yf.download(symbol, 
-#                            period="1y",
-#                            interval=interval, 
-#                            progress=False, 
-#                             show_errors=False )
-#         return data if not data.empty else pd.DataFrame()
-#     except Exception as e:
-#         st.warning(f"⚠️ Failed to fetch {symbol}: {str(e)[:50]}")
-#         return pd.DataFrame()
-def fetch_data(symbol, interval):
-    import sys
-    from io import StringIO
-    
-    # Suppress all stdout/stderr from yfinance
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
-    sys.stdout = StringIO()
-    sys.stderr = StringIO()
-    
-    try:
-        data = yf.download(
-            symbol, 
-            period="1y",
-            interval=interval, 
-            progress=False,
-            timeout=10  # Add explicit timeout
-        )
-        result = data if not data.empty else pd.DataFrame()
-    except Exception:
-        result = pd.DataFrame()
-    finally:
-        # Restore stdout/stderr
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-    
-    return result
-
-def is_explosive(c, avg):
-    return (c["High"] - c["Low"]) >= 2 * avg
-
-def is_one_touch(df, zh, zl, idx):
-    touches = 0
-    for _, r in df.iloc[idx+1:].iterrows():
-        if r["High"] >= zl and r["Low"] <= zh:
-            touches += 1
-        if touches > 1:
-            return False
-    return True
-
-def within_1_percent(price, zh, zl):
-    if price > zh:
-        d = (price - zh) / price * 100
-    elif price < zl:
-        d = (zl - price) / price * 100
-    else:
-        d = 0
-    return d <= 1
-
-def rr_ok(entry, sl, target):
-    risk = abs(entry - sl)
-    reward = abs(target - entry)
-    return risk > 0 and reward / risk >= 3
-
-# ---------------- ZONE DETECTION ---------------- #
-def detect_zones(df, tf):
+def detect_batch(batch):
+    # Run the universe kernel once per timeframe over whatever the fetchers delivered
+    zones = {}
+    for tf in {task[1] for task, _ in batch}:
+        frames = {task[0]: df for task, df in batch if task[1] == tf}
+        zones[tf] = zones_by_symbol(detect_zones_universe(frames, tf))
+    # Only stocks with zones keep their frame, for the charts; results hold
+    # its series store id rather than the frame itself
+    series_store = get_series_store()
     results = []
-    avg_range = (df["High"] - df["Low"]).rolling(20).mean()
-    max_base = 3 if tf in ["15m","30m","60m","75m","120m","125m","240m"] else 6
-    price = df.iloc[-1]["Close"]
-
-    for i in range(len(df) - max_base - 2):
-        leg_in = df.iloc[i]
-        base = df.iloc[i+1:i+1+max_base]
-        leg_out = df.iloc[i+1+max_base]
-
-        if base.empty:
-            continue
-
-        zh, zl = base["High"].max(), base["Low"].min()
-
-        # -------- SUPPLY -------- #
-        if (
-            leg_in["Close"] > leg_in["Open"]
-            and leg_out["Close"] < leg_out["Open"]
-            and is_explosive(leg_in, avg_range.iloc[i])
-            and is_explosive(leg_out, avg_range.iloc[i])
-        ):
-            entry = zh
-            sl = zh * 1.002
-            target = entry - (entry - sl) * 3
-
-            if (
-                is_one_touch(df, zh, zl, i)
-                and within_1_percent(price, zh, zl)
-                and rr_ok(entry, sl, target)
-            ):
-                results.append(
-                    ("Supply", entry, sl, target, zh, zl)
-                )
-
-        # -------- DEMAND -------- #
-        if (
-            leg_in["Close"] < leg_in["Open"]
-            and leg_out["Close"] > leg_out["Open"]
-            and is_explosive(leg_in, avg_range.iloc[i])
-            and is_explosive(leg_out, avg_range.iloc[i])
-        ):
-            entry = zl
-            sl = zl * 0.998
-            target = entry + (entry - sl) * 3
-
-            if (
-                is_one_touch(df, zh, zl, i)
-                and within_1_percent(price, zh, zl)
-                and rr_ok(entry, sl, target)
-            ):
-                results.append(
-                    ("Demand", entry, sl, target, zh, zl)
-                )
-
+    for (stock, tf), df in batch:
+        found = zones[tf].get(stock, [])
+        key = None
+        if found:
+            key = series_id(stock, tf, df.index[-1])
+            series_store.put(key, df)
+        results.append((found, key))
     return results
 
-# ---------------- PLOT ---------------- #
-def plot_chart(df, zones, symbol, tf):
-    fig = go.Figure()
-    fig.add_candlestick(
-        x=df.index, open=df["Open"], high=df["High"],
-        low=df["Low"], close=df["Close"]
-    )
+@st.cache_resource
+def get_series_store():
+    return SeriesStore()
 
-    for z in zones:
-        ztype, entry, sl, tgt, zh, zl = z
-        color = "red" if ztype == "Supply" else "green"
+# NSE holidays, so no candle is expected to close on them
+@st.cache_resource
+def get_nse_holidays():
+    return nse_holidays(mcal.get_calendar('NSE'))
 
-        fig.add_shape(type="rect", x0=df.index[0], x1=df.index[-1],
-                      y0=zl, y1=zh, fillcolor=color, opacity=0.25, line_width=0)
+@st.cache_resource
+def get_result_cache():
+    return ScanCache()
 
-        fig.add_hline(y=entry, line_dash="dot", line_color="blue")
-        fig.add_hline(y=sl, line_dash="dash", line_color="red")
-        fig.add_hline(y=tgt, line_dash="dash", line_color="green")
+# Identical fetches / detections running in several sessions are done once
+@st.cache_resource
+def get_flights():
+    return SingleFlight()
 
-    fig.update_layout(title=f"{symbol} | {tf}", xaxis_rangeslider_visible=False)
-    return fig
+def scan_key(task):
+    stock, tf = task
+    return cache_key(stock, tf, {"max_base": max_base_for(tf)}, ENGINE_VERSION)
+
+def scan_stages(spec):
+    fetch, detect = shared_stages(fetch_task, detect_batch, get_flights(), lambda task: task,
+                                  lambda task, df: (scan_key(task), df.index[-1]))
+    fetch, detect = cached_stages(fetch, detect, get_result_cache(), scan_key,
+                                  lambda task, last_bar_time: candle_close(task[1], last_bar_time, get_nse_holidays()))
+    return fetch, detect, {"fetch_workers": FETCH_WORKERS, "batch_size": DETECT_BATCH_SIZE}
 
 # ---------------- UI ---------------- #
 st.title("📊 Demand & Supply Scanner (Exact Entry | SL | Target)")
@@ -192,62 +102,129 @@ st.success("""
 ✔ Exact Entry, SL & Target  
 """)
 
-results_table = []
-
+# ---------------- SCAN JOB ---------------- #
+# The scan runs as a background job; every rerun of this script (any widget
+# click) only polls it, so a long scan survives interaction and can be
+# resumed from its checkpoint after a restart.
 if st.button("🔍 Scan Now"):
-    progress = st.progress(0)
-    status = st.empty()
-
-    debug_info = {
-        "stocks_scanned": 0,
-        "timeframes_checked": 0,
-        "zones_found": 0,
-        "zones_filtered_out": 0
-    }
-
-    for i, stock in enumerate(STOCKS):
-        status.text(f"Scanning {stock} ({i+1}/{len(STOCKS)})")
-        progress.progress((i+1)/len(STOCKS))
-        debug_info["stocks_scanned"] += 1
-
-
-        for tf in selected_tf:
-            debug_info["timeframes_checked"] += 1
-            df = fetch_data(stock, TIMEFRAMES[tf])
-            if df.empty or len(df) < 60:
-                continue
+    spec = {"selected_tf": list(selected_tf), "stocks": STOCKS}
+    tasks = [(stock, tf) for tf in selected_tf for stock in STOCKS]
+    fetch, detect, pipeline_kwargs = scan_stages(spec)
+    job = start_job("app", spec, tasks, fetch, detect, version=CHECKPOINT_VERSION, **pipeline_kwargs)
+    st.session_state["scan_job_id"] = job.job_id
+
+scan_job = get_job(st.session_state.get("scan_job_id"))
+
+if scan_job is None or not scan_job.running:
+    for job_id, meta, done in list_checkpoints("app", CHECKPOINT_VERSION):
+        c1, c2 = st.columns([4, 1])
+        if c1.button(f"▶️ Resume scan {job_id} ({done}/{len(meta['tasks'])} done)", key=f"resume_{job_id}"):
+            scan_job = resume_job(job_id, scan_stages)
+            st.session_state["scan_job_id"] = scan_job.job_id
+        elif c2.button("🗑️ Discard", key=f"discard_{job_id}"):
+            discard_checkpoint(job_id)
+            st.rerun()
+
+if scan_job is not None:
+    done, total = scan_job.progress()
+    st.progress(done / max(total, 1))
+    st.text(f"Scanned {done}/{total}")
+
+    results_table = []
+    zone_counts = {"Supply": 0, "Demand": 0}
+    charts = {}
+    failed = []
+    for (stock, tf), (state, payload) in scan_job.ordered_results():
+        if state == "error":
+            failed.append((stock, tf, payload))
+            continue
+        if state != "ok" or not payload[0]:
+            continue
+        zones, key = payload
+        for z in zones:
+            ztype, entry, sl, tgt, zh, zl = z
+            zone_counts[ztype] += 1
+            results_table.append({
+                "Stock": stock.replace(".NS",""),
+                "TF": tf,
+                "Type": ztype,
+                "Entry": round(entry,2),
+                "SL": round(sl,2),
+                "Target": round(tgt,2),
+                "RR": round(abs(tgt-entry)/abs(entry-sl),2)
+            })
+        charts[(stock.replace(".NS",""), tf)] = (stock, key, zones)
 
-            zones = detect_zones(df, tf)
-            debug_info["zones_found"] += len(zones)
-
-
-            if zones:
-                for z in zones:
-                    ztype, entry, sl, tgt, zh, zl = z
-                    results_table.append({
-                        "Stock": stock.replace(".NS",""),
-                        "TF": tf,
-                        "Type": ztype,
-                        "Entry": round(entry,2),
-                        "SL": round(sl,2),
-                        "Target": round(tgt,2),
-                        "RR": round(abs(tgt-entry)/abs(entry-sl),2)
-                    })
-
-                st.subheader(f"{stock} | {tf}")
-                st.plotly_chart(
-                    plot_chart(df.tail(200), zones, stock, tf),
-                    use_container_width=True
-                )
+    st.subheader("📋 Trade Setups")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Scanned", f"{done}/{total}")
+    c2.metric("Fresh zones", len(results_table))
+    c3.metric("Demand", zone_counts["Demand"])
+    c4.metric("Supply", zone_counts["Supply"])
+    if scan_job.running:
+        if results_table:
+            st.dataframe(pd.DataFrame(results_table))
+        if st.button("⛔ Cancel scan"):
+            scan_job.cancel()
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+
+    if scan_job.status == "cancelled":
+        st.warning(f"⚠️ Scan cancelled after {done}/{total}; it can be resumed above.")
+    elif scan_job.status == "failed":
+        st.error(f"❌ Scan failed: {scan_job.error}")
+    for stock, tf, error in failed:
+        st.warning(f"⚠️ Failed to scan {stock} | {tf}: {error[:50]}")
+
+    if results_table:
+        # Charts are built only for the setups selected here and cached by zone id
+        setups_df = pd.DataFrame(results_table)
+        grid_builder = GridOptionsBuilder.from_dataframe(setups_df)
+        grid_builder.configure_selection("multiple", use_checkbox=True)
+        grid_builder.configure_pagination(paginationAutoPageSize=False, paginationPageSize=20)
+        grid = AgGrid(setups_df, gridOptions=grid_builder.build(),
+                      update_mode=GridUpdateMode.SELECTION_CHANGED, key=f"setups_{scan_job.job_id}")
+        opened = list(dict.fromkeys((row["Stock"], row["TF"]) for row in grid_selection(grid)))
+        chart_zoom = st.radio("Chart range", [ZOOM_RECENT, ZOOM_FULL], horizontal=True)
+        if not opened:
+            st.caption("Select setups in the table to open their charts.")
+        for key in opened:
+            stock, series_key, zones = charts[key]
+            st.subheader(f"{stock} | {key[1]}")
+            df = get_series_store().get(series_key)
+            if df is None:
+                st.caption("Chart data is no longer available; rescan to view it.")
+                continue
+            st.plotly_chart(
+                setup_chart(df, zones, stock, key[1], chart_zoom),
+                use_container_width=True
+            )
     st.info(f"""
     **Scan Summary:**
-    - Stocks scanned: {debug_info['stocks_scanned']}
-    - Timeframes checked: {debug_info['timeframes_checked']}
-    - Zones found: {debug_info['zones_found']}
+    - Stocks scanned: {len(scan_job.spec['stocks'])}
+    - Timeframes checked: {done}
     - Setups displayed: {len(results_table)}
-    """)    
-
-# ---------------- RESULT TABLE ---------------- #
-if results_table:
-    st.subheader("📋 Trade Setups")
-    st.dataframe(pd.DataFrame(results_table))
+    """)
+
+# ---------------- AUTO RESCAN ---------------- #
+# Only the (stock, timeframe) pairs whose NSE candle just closed are scanned
+# again; the others keep their results until their own candle closes.
+if scan_job is not None and scan_job.status == "done":
+    if st.checkbox("🔁 Rescan each timeframe when its candle closes", key="auto_rescan"):
+        job_scheduler = st.session_state.get("candle_scheduler")
+        if job_scheduler is None or job_scheduler[0] != scan_job.job_id:
+            job_scheduler = (scan_job.job_id, CandleScheduler(scan_job.spec["selected_tf"], pd.Timestamp(scan_job.started, unit="s", tz="UTC"),
+                                                             get_nse_holidays()))
+        scheduler = job_scheduler[1]
+        closed = scheduler.due()
+        if closed:
+            fetch, detect, pipeline_kwargs = scan_stages(scan_job.spec)
+            scan_job = rescan_job(scan_job, due_tasks(scan_job.tasks, lambda task: task[1], closed), fetch, detect, **pipeline_kwargs)
+            st.session_state["scan_job_id"] = scan_job.job_id
+            st.session_state["candle_scheduler"] = (scan_job.job_id, scheduler)
+            st.rerun()
+        st.session_state["candle_scheduler"] = (scan_job.job_id, scheduler)
+        next_run, next_tfs = scheduler.next_due()
+        st.caption(f"Next rescan {next_run:%a %d %b %H:%M} IST for {', '.join(next_tfs)}")
+        time.sleep(min(max((next_run - pd.Timestamp.now(tz=next_run.tz)).total_seconds(), 1), RESCAN_POLL_SECONDS))
+        st.rerun()
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Live per-(symbol, timeframe) bar series for the streaming / incremental
+# scanners. Each series keeps its newest `capacity` bars in preallocated
+# arrays (int64 UTC nanoseconds for the time, float64 per column) of twice
+# that length: bars are written one after another, and only when the write
+# position reaches the end are the live bars moved to a fresh buffer. An
+# append is therefore O(1) amortised, and the live bars are always one
+# contiguous slice, so detection kernels get plain views instead of copies.
+# Bars that fall out of the window are appended to a per-series file of
+# fixed-size records, which history() maps back without loading it.
+
+BAR_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+DEFAULT_CAPACITY = 5000
+SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bar_history")
+
+
+def _time_ns(when):
+    if isinstance(when, (int, np.integer)):
+        return int(when)
+    return pd.Timestamp(when).value
+
+
+class BarRing:
+    def __init__(self, capacity=DEFAULT_CAPACITY, columns=BAR_COLUMNS, spill_path=None, tz=None):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self.spill_path = spill_path
+        self.tz = tz
+        self.record_dtype = np.dtype([("time", "i8")] + [(name, "f8") for name in self.columns])
+        self._times, self._values = self._buffers()
+        self._start = 0  # first live bar
+        self._end = 0  # one past the newest bar
+        self._evicted = 0  # first bar that left the window but is not on disk yet
+        self.spilled = 0
+        self.dropped = 0  # bars that left the window with no history file to go to
+        self._lock = threading.Lock()
+        if spill_path is not None and os.path.exists(spill_path):
+            os.remove(spill_path)  # history of an earlier run of this series
+
+    def _buffers(self):
+        size = 2 * self.capacity
+        return np.empty(size, dtype=np.int64), {name: np.empty(size) for name in self.columns}
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def total(self):
+        # Bars ever appended, including the ones no longer in memory
+        return self.spilled + self.dropped + (self._end - self._evicted)
+
+    # ---------------- APPEND ---------------- #
+    def append(self, when, *values):
+        # One bar: time, then one value per column
+        if self.tz is None and getattr(when, "tzinfo", None) is not None:
+            self.tz = pd.Timestamp(when).tz
+        with self._lock:
+            if self._end == len(self._times):
+                self._compact()
+            end = self._end
+            self._times[end] = _time_ns(when)
+            for name, value in zip(self.columns, values):
+                self._values[name][end] = value
+            self._end = end + 1
+            if self._end - self._start > self.capacity:
+                self._start += 1
+
+    def extend(self, frame):
+        # Bulk append of a DataFrame with these columns and a DatetimeIndex
+        if self.tz is None and getattr(frame.index, "tz", None) is not None:
+            self.tz = str(frame.index.tz)
+        times = frame.index.as_unit("ns").asi8
+        values = {name: frame[name].to_numpy(dtype=float) for name in self.columns}
+        with self._lock:
+            done = 0
+            while done < len(times):
+                if self._end == len(self._times):
+                    self._compact()
+                end = self._end
+                count = min(len(times) - done, len(self._times) - end)
+                self._times[end:end + count] = times[done:done + count]
+                for name in self.columns:
+                    self._values[name][end:end + count] = values[name][done:done + count]
+                self._end = end + count
+                self._start = max(self._start, self._end - self.capacity)
+                done += count
+
+    def _compact(self):
+        # Move the live bars to the front of a fresh buffer; views handed out
+        # earlier keep pointing at the old one and stay valid
+        self._spill(self._evicted, self._start)
+        times, values = self._buffers()
+        size = self._end - self._start
+        times[:size] = self._times[self._start:self._end]
+        for name in self.columns:
+            values[name][:size] = self._values[name][self._start:self._end]
+        self._times, self._values = times, values
+        self._start, self._end, self._evicted = 0, size, 0
+
+    def _spill(self, first, last):
+        # Write bars [first, last) of the buffer to the history file
+        if last <= first:
+            return
+        if self.spill_path is not None:
+            records = np.empty(last - first, dtype=self.record_dtype)
+            records["time"] = self._times[first:last]
+            for name in self.columns:
+                records[name] = self._values[name][first:last]
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "ab") as f:
+                records.tofile(f)
+            self.spilled += last - first
+        else:
+            self.dropped += last - first
+        self._evicted = last
+
+    def flush(self):
+        # Put the bars that left the window on disk now rather than at the
+        # next compaction
+        with self._lock:
+            self._spill(self._evicted, self._start)
+
+    # ---------------- READ ---------------- #
+    def times(self):
+        with self._lock:
+            return self._times[self._start:self._end]
+
+    def view(self, name):
+        # Contiguous float64 view of one column over the live bars
+        with self._lock:
+            return self._values[name][self._start:self._end]
+
+    def views(self):
+        # {column: view}, all over the same bars
+        with self._lock:
+            return {name: values[self._start:self._end] for name, values in self._values.items()}
+
+    def history(self):
+        # Records (time + columns) of the bars spilled to disk, memory-mapped
+        self.flush()
+        if self.spilled == 0:
+            return np.empty(0, dtype=self.record_dtype)
+        return np.memmap(self.spill_path, dtype=self.record_dtype, mode="r", shape=(self.spilled,))
+
+    def frame(self, include_history=False):
+        # DataFrame copy of the live bars (optionally preceded by the history)
+        with self._lock:
+            times = self._times[self._start:self._end].copy()
+            data = {name: values[self._start:self._end].copy() for name, values in self._values.items()}
+        if include_history:
+            older = self.history()
+            times = np.concatenate([older["time"], times])
+            data = {name: np.concatenate([older[name], data[name]]) for name in self.columns}
+        # Times of a tz-aware series are kept as UTC; a naive one stays naive
+        index = pd.DatetimeIndex(times.view("datetime64[ns]"))
+        if self.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        return pd.DataFrame(data, index=index)
+
+
+class BarStore:
+    # One BarRing per (symbol, timeframe), created on first use
+    def __init__(self, capacity=DEFAULT_CAPACITY, columns=BAR_COLUMNS, spill_dir=SPILL_DIR):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self.spill_dir = spill_dir
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def _spill_path(self, symbol, timeframe):
+        if self.spill_dir is None:
+            return None
+        name = hashlib.blake2b(f"{symbol}|{timeframe}".encode(), digest_size=16).hexdigest()
+        return os.path.join(self.spill_dir, name + ".bars")
+
+    def ring(self, symbol, timeframe, tz=None):
+        with self._lock:
+            ring = self._rings.get((symbol, timeframe))
+            if ring is None:
+                ring = BarRing(self.capacity, self.columns, self._spill_path(symbol, timeframe), tz)
+                self._rings[(symbol, timeframe)] = ring
+            return ring
+
+    def append(self, symbol, timeframe, when, *values):
+        self.ring(symbol, timeframe).append(when, *values)
+
+    def series(self):
+        with self._lock:
+            return list(self._rings)
+
+    def flush(self):
+        with self._lock:
+            rings = list(self._rings.values())
+        for ring in rings:
+            ring.flush()
@@ -0,0 +1,129 @@
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from candle_scheduler import CandleScheduler, nse_holidays
+from market_data import TIMEFRAMES, fetch_task, load_universe
+from scan_pipeline import run_pipeline
+from zone_kernel import ZONE_COLUMNS, detect_zones_universe
+
+# Headless scan of a universe file: no Streamlit, no plotly. Meant for
+# scheduled (e.g. pre-market) runs, e.g.
+#   python batch_scan.py --timeframes Daily 60m --output zones.csv
+# With --watch it keeps running and rescans each timeframe when its NSE
+# candle closes, rewriting the output every time.
+
+OUTPUT_COLUMNS = ["Timeframe"] + ZONE_COLUMNS + ["RR"]
+
+
+def detect_batch(batch):
+    # One kernel pass per timeframe; each task gets its own rows of the table
+    tables = {}
+    for tf in {task[1] for task, _ in batch}:
+        frames = {task[0]: df for task, df in batch if task[1] == tf}
+        tables[tf] = detect_zones_universe(frames, tf)
+    return [tables[tf][tables[tf]["Symbol"] == stock] for (stock, tf), _ in batch]
+
+
+def scan_universe(symbols, timeframes, fetch_workers=8, batch_size=32, on_result=None):
+    tasks = [(stock, tf) for tf in timeframes for stock in symbols]
+    found, failed = [], []
+    for n, (task, df, zones, error) in enumerate(run_pipeline(tasks, fetch_task, detect_batch,
+                                                              fetch_workers=fetch_workers,
+                                                              batch_size=batch_size)):
+        if error is not None:
+            failed.append((task, str(error)))
+        elif zones is not None and not zones.empty:
+            found.append(zones.assign(Timeframe=task[1]))
+        if on_result is not None:
+            on_result(n + 1, len(tasks), task, error)
+
+    if not found:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS), failed
+    table = pd.concat(found, ignore_index=True)
+    table["RR"] = ((table["Target"] - table["Entry"]).abs() / (table["Entry"] - table["SL"]).abs()).round(2)
+    for column in ("Entry", "SL", "Target", "ZoneHigh", "ZoneLow"):
+        table[column] = table[column].round(2)
+    return sort_results(table[OUTPUT_COLUMNS], timeframes), failed
+
+
+def sort_results(table, timeframes):
+    # Keep the scan order stable regardless of completion order
+    order = {tf: n for n, tf in enumerate(timeframes)}
+    table = table.sort_values(["Timeframe", "Symbol", "Bar"], key=lambda c: c.map(order) if c.name == "Timeframe" else c)
+    return table.reset_index(drop=True)
+
+
+def watch(symbols, timeframes, table, since, on_table, fetch_workers=8, on_result=None, holidays=()):
+    # Rescan only the timeframes whose candle closed since `since` (epoch
+    # seconds of the last full scan), until interrupted
+    scheduler = CandleScheduler(timeframes, pd.Timestamp(since, unit="s", tz="UTC"), holidays)
+    while True:
+        next_run, _ = scheduler.next_due()
+        time.sleep(max((next_run - pd.Timestamp.now(tz=next_run.tz)).total_seconds(), 0))
+        closed = scheduler.due()
+        if not closed:
+            continue
+        fresh, failed = scan_universe(symbols, closed, fetch_workers=fetch_workers, on_result=on_result)
+        kept = table[~table["Timeframe"].isin(closed)]
+        table = sort_results(pd.concat([kept, fresh], ignore_index=True) if len(fresh) else kept, timeframes)
+        on_table(table, closed, failed)
+
+
+def write_results(table, path):
+    if path.endswith(".json"):
+        table.to_json(path, orient="records", date_format="iso", indent=1)
+    elif path.endswith(".parquet"):
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a stock universe for fresh demand / supply zones.")
+    parser.add_argument("--universe", default="ind_nifty500list.csv", help="CSV with a Symbol column")
+    parser.add_argument("--suffix", default=".NS", help="exchange suffix appended to every symbol")
+    parser.add_argument("--limit", type=int, default=None, help="scan only the first N symbols")
+    parser.add_argument("--timeframes", nargs="+", default=["15m", "30m", "60m", "240m", "Daily"],
+                        choices=list(TIMEFRAMES), metavar="TF", help=", ".join(TIMEFRAMES))
+    parser.add_argument("--output", default="zones.csv", help=".csv, .json or .parquet")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--quiet", action="store_true")
+    parser.add_argument("--watch", action="store_true", help="keep rescanning each timeframe as its candle closes")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    symbols = load_universe(args.universe, args.suffix, args.limit)
+
+    def report(done, total, task, error):
+        if error is not None:
+            print(f"Failed to scan {task[0]} | {task[1]}: {str(error)[:80]}", file=sys.stderr)
+        elif not args.quiet and (done % 50 == 0 or done == total):
+            print(f"Scanned {done}/{total}", file=sys.stderr)
+
+    table, failed = scan_universe(symbols, args.timeframes, fetch_workers=args.workers, on_result=report)
+    write_results(table, args.output)
+    print(f"{len(table)} zones from {len(symbols)} symbols x {len(args.timeframes)} timeframes "
+          f"written to {args.output} in {time.time() - started:.1f}s ({len(failed)} failed)")
+    if args.watch:
+        import pandas_market_calendars as mcal
+
+        holidays = nse_holidays(mcal.get_calendar('NSE'))
+
+        def rewrite(table, closed, failed):
+            write_results(table, args.output)
+            print(f"{time.strftime('%H:%M:%S')} rescanned {', '.join(closed)}: {len(table)} zones "
+                  f"written to {args.output} ({len(failed)} failed)")
+
+        try:
+            watch(symbols, args.timeframes, table, started, rewrite, fetch_workers=args.workers, on_result=report,
+                  holidays=holidays)
+        except KeyboardInterrupt:
+            return 0
+    return 1 if failed and len(failed) == len(symbols) * len(args.timeframes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# When does each timeframe's candle close on NSE? Intraday candles are cut
+# from the session open (09:15 IST) and the last one of the day is cut short
+# by the close (15:30), e.g. 75m closes at 10:30 .. 15:30 and 125m at 11:20,
+# 13:25 and 15:30. Daily, weekly and monthly candles close with the last
+# session of their day / week / month. A rescan of a (symbol, timeframe) pair
+# is only worth a fetch once one of its candles has closed, so the scheduler
+# below hands out just the timeframes that closed since the last check.
+
+NSE_TZ = "Asia/Kolkata"
+NSE_EXCHANGES = ("NSE", "BSE")
+SESSION_OPEN = datetime.time(9, 15)
+SESSION_CLOSE = datetime.time(15, 30)
+
+# Providers publish the closed candle a little after the boundary
+PUBLISH_DELAY = pd.Timedelta(seconds=30)
+
+DAY, WEEK, MONTH = "D", "W", "M"
+
+# Candle length in minutes, or the calendar period a candle spans, for the
+# market_data.TIMEFRAMES keys and old_app's interval_options keys
+CANDLE_SPANS = {
+    "15m": 15, "30m": 30, "60m": 60, "75m": 75, "120m": 120, "125m": 125, "240m": 240,
+    "Daily": DAY, "Weekly": WEEK, "Monthly": MONTH,
+
+    "1 Minute": 1, "3 Minutes": 3, "5 Minutes": 5, "10 Minutes": 10, "15 Minutes": 15,
+    "30 Minutes": 30, "45 Minutes": 45, "1 Hour": 60, "75 Minutes": 75, "2 Hours": 120,
+    "125 Minutes": 125, "3 Hours": 180, "4 Hours": 240,
+    "1 Day": DAY, "1 Week": WEEK, "1 Month": MONTH,
+}
+
+
+def nse_time(timestamp):
+    # Naive times are taken as IST
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize(NSE_TZ) if timestamp.tzinfo is None else timestamp.tz_convert(NSE_TZ)
+
+
+def is_session_day(day, holidays=()):
+    return day.weekday() < 5 and day not in holidays
+
+
+def next_session_day(day, holidays=()):
+    day += datetime.timedelta(days=1)
+    while not is_session_day(day, holidays):
+        day += datetime.timedelta(days=1)
+    return day
+
+
+def session_bounds(day):
+    return (pd.Timestamp.combine(day, SESSION_OPEN).tz_localize(NSE_TZ),
+            pd.Timestamp.combine(day, SESSION_CLOSE).tz_localize(NSE_TZ))
+
+
+def candle_closes(timeframe, day, holidays=()):
+    # Close times of the timeframe's candles during one session day
+    if not is_session_day(day, holidays):
+        return []
+    session_open, session_close = session_bounds(day)
+    span = CANDLE_SPANS[timeframe]
+    if span in (WEEK, MONTH):
+        following = next_session_day(day, holidays)
+        if span == WEEK:
+            same_period = following.isocalendar()[:2] == day.isocalendar()[:2]
+        else:
+            same_period = (following.year, following.month) == (day.year, day.month)
+        return [] if same_period else [session_close]
+    if span == DAY:
+        return [session_close]
+    step = pd.Timedelta(minutes=span)
+    closes = []
+    close = session_open + step
+    while close < session_close:
+        closes.append(close)
+        close += step
+    closes.append(session_close)
+    return closes
+
+
+def candle_close(timeframe, timestamp, holidays=()):
+    # First close of the timeframe after timestamp: for a bar stamped with its
+    # open time, the moment that bar is final
+    timestamp = nse_time(timestamp)
+    day = timestamp.date()
+    while True:
+        for close in candle_closes(timeframe, day, holidays):
+            if close > timestamp:
+                return close
+        day += datetime.timedelta(days=1)
+
+
+def session_buckets(index, minutes):
+    # Session-anchored bucket start of each bar in an intraday IST index, for
+    # resampling smaller bars into e.g. 75m / 125m candles
+    index = pd.DatetimeIndex(index).tz_convert(NSE_TZ)
+    session_open = index.normalize() + pd.Timedelta(hours=SESSION_OPEN.hour, minutes=SESSION_OPEN.minute)
+    step = pd.Timedelta(minutes=minutes)
+    return session_open + np.maximum((index - session_open) // step, 0) * step
+
+
+def nse_holidays(calendar):
+    # Holiday dates from a pandas_market_calendars calendar (e.g. 'NSE')
+    return frozenset(pd.Timestamp(day).date() for day in calendar.holidays().holidays)
+
+
+class CandleScheduler:
+    def __init__(self, timeframes, since, holidays=(), delay=PUBLISH_DELAY):
+        # since: when the current results were fetched; candles that closed
+        # within `delay` before it may not have been published yet
+        self.timeframes = list(dict.fromkeys(timeframes))
+        self.holidays = frozenset(holidays)
+        self.delay = delay
+        self.checked = nse_time(since) - delay
+
+    def next_due(self):
+        # (time, timeframes) of the next candle close worth rescanning for
+        closes = {tf: candle_close(tf, self.checked, self.holidays) for tf in self.timeframes}
+        if not closes:
+            return None, []
+        when = min(closes.values())
+        return when + self.delay, [tf for tf, close in closes.items() if close == when]
+
+    def due(self, now=None):
+        # Timeframes with a candle closed (and published) since the last call
+        now = nse_time(now if now is not None else pd.Timestamp.now(tz=NSE_TZ))
+        cutoff = now - self.delay
+        closed = [tf for tf in self.timeframes if candle_close(tf, self.checked, self.holidays) <= cutoff]
+        self.checked = max(self.checked, cutoff)
+        return closed
+
+
+def due_tasks(tasks, timeframe_of, timeframes):
+    # The scan tasks of the timeframes that just closed
+    closed = set(timeframes)
+    return [task for task in tasks if timeframe_of(task) in closed]
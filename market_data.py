@@ -0,0 +1,58 @@
+import logging
+
+import pandas as pd
+
+# Market data for the scanners, free of Streamlit and plotting. Provider
+# clients are imported on first use so the engine and CLI start quickly.
+
+TIMEFRAMES = {
+    "15m": "15m", "30m": "30m", "60m": "60m", "75m": "75m",
+    "120m": "120m", "125m": "125m", "240m": "240m",
+    "Daily": "1d", "Weekly": "1wk", "Monthly": "1mo"
+}
+
+# Bar length per timeframe, used to tell when a cached scan can be stale
+TIMEFRAME_DURATIONS = {
+    "15m": pd.Timedelta(minutes=15), "30m": pd.Timedelta(minutes=30),
+    "60m": pd.Timedelta(minutes=60), "75m": pd.Timedelta(minutes=75),
+    "120m": pd.Timedelta(minutes=120), "125m": pd.Timedelta(minutes=125),
+    "240m": pd.Timedelta(minutes=240), "Daily": pd.Timedelta(days=1),
+    "Weekly": pd.Timedelta(weeks=1), "Monthly": pd.DateOffset(months=1)
+}
+
+MIN_BARS = 60
+
+
+def load_universe(path="ind_nifty500list.csv", suffix=".NS", limit=None):
+    df = pd.read_csv(path)  # column: Symbol
+    symbols = [s + suffix for s in df["Symbol"].tolist()]
+    return symbols[:limit] if limit else symbols
+
+
+def fetch_data(symbol, interval, period="1y"):
+    # Ticker.history keeps no module-level state (unlike yf.download), so the
+    # scan pipeline can call it from several threads at once
+    import yfinance as yf
+
+    logging.getLogger('yfinance').setLevel(logging.CRITICAL)
+    try:
+        data = yf.Ticker(symbol).history(
+            period=period,
+            interval=interval,
+            auto_adjust=False,
+            actions=False,
+            timeout=10  # Add explicit timeout
+        )
+        result = data if not data.empty else pd.DataFrame()
+    except Exception:
+        result = pd.DataFrame()
+
+    return result
+
+
+def fetch_task(task):
+    stock, tf = task
+    df = fetch_data(stock, TIMEFRAMES[tf])
+    if df.empty or len(df) < MIN_BARS:
+        return None
+    return df
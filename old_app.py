@@ -1,14 +1,26 @@
 from collections import OrderedDict
+from contextlib import contextmanager
+import queue
 import pandas_market_calendars as mcal
 import math
 import pandas as pd
 from datetime import timedelta 
 import time
+import pickle
 from datetime import datetime
-import plotly.graph_objects as go
 import streamlit as st
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from tvDatafeed import TvDatafeed, Interval 
-import pytz
+
+from candle_scheduler import NSE_EXCHANGES, CANDLE_SPANS, CandleScheduler, candle_close, due_tasks, nse_holidays, session_buckets
+from scan_cache import ScanCache, cache_key, cached_stages, next_candle_close
+from single_flight import SingleFlight, shared_stages
+from scan_jobs import discard_checkpoint, get_job, list_checkpoints, rescan_job, resume_job, start_job
+from scan_pool import DetectionPool
+from series_store import SeriesStore, series_id
+from zone_charts import ZOOM_FULL, ZOOM_ZONE, grid_selection, zone_chart
+from zone_engine import ENGINE_VERSION, calculate_atr, find_patterns
+from zone_records import RECORD_VERSION, ZoneBatch, encode_zones, merge_overlapping, status_counts, with_flag, zones_frame
 
 st.set_page_config( 
     page_title="Demand And Supply daily zone scan engine For Indian Stock Market",  # Meta title
@@ -35,7 +47,8 @@ st.markdown(
 def fetch_stock_data_and_resample(symbol, exchange, n_bars, htf_interval, interval, interval_key,fut_contract):
     try:        
         # Fetch historical data using tvDatafeed
-        stock_data = tv.get_hist(symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars,fut_contract=fut_contract)
+        with tradingview_session() as tv:
+            stock_data = tv.get_hist(symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars,fut_contract=fut_contract)
         
         # Check if stock_data is None or empty
         if stock_data is not None and not stock_data.empty:  
@@ -75,15 +88,22 @@ def fetch_stock_data_and_resample(symbol, exchange, n_bars, htf_interval, interv
                 print(f"Warning: No resample rule found for key '{interval_key}'.")
                 return None  # Exit if no valid rule is found
 
-            df = df.resample(rule=rule, closed='left', label='left', origin=df.index.min()).agg(
-                OrderedDict([
-                    ('Open', 'first'),
-                    ('High', 'max'),
-                    ('Low', 'min'),
-                    ('Close', 'last'),
-                    ('Volume', 'sum')
-                ])
-            ).dropna()
+            ohlcv_rules = OrderedDict([
+                ('Open', 'first'),
+                ('High', 'max'),
+                ('Low', 'min'),
+                ('Close', 'last'),
+                ('Volume', 'sum')
+            ])
+            if exchange in NSE_EXCHANGES and isinstance(CANDLE_SPANS.get(interval_key), int):
+                # Cut candles from each session's open, so they close where the
+                # candle scheduler expects them to. Of the resampled keys this
+                # covers 10 / 75 / 125 Minutes and 4 Hours (cut 09:15-13:15,
+                # 13:15-15:30); the 5-12 Hours keys have no CANDLE_SPANS entry
+                # and keep the resample from the first fetched bar
+                df = df.groupby(session_buckets(df.index, CANDLE_SPANS[interval_key])).agg(ohlcv_rules).dropna()
+            else:
+                df = df.resample(rule=rule, closed='left', label='left', origin=df.index.min()).agg(ohlcv_rules).dropna()
 
             stock_data = df.round(2)
 
@@ -102,7 +122,8 @@ def fetch_stock_data(symbol, exchange, n_bars, htf_interval, interval,fut_contra
         #st.write(f"Fetching data for {symbol} on {exchange} with n_bars={n_bars}, htf_interval={htf_interval}, interval={interval}")
 
         # Fetch historical data using tvDatafeed
-        stock_data = tv.get_hist(symbol=f"{symbol}", exchange=f"{exchange}", interval=interval , n_bars=n_bars,fut_contract=fut_contract)  # Use parameters correctly
+        with tradingview_session() as tv:
+            stock_data = tv.get_hist(symbol=f"{symbol}", exchange=f"{exchange}", interval=interval , n_bars=n_bars,fut_contract=fut_contract)  # Use parameters correctly
 
         # Check if stock_data is None
         if stock_data is not None and not stock_data.empty:  # Added check for empty DataFrame
@@ -121,845 +142,33 @@ def fetch_stock_data(symbol, exchange, n_bars, htf_interval, interval,fut_contra
         return None  # Return None in case of an error
 
 
-def calculate_atr(stock_data, length=14):
-    stock_data['previous_close'] = stock_data['Close'].shift(1)
-    stock_data['tr1'] = abs(stock_data['High'] - stock_data['Low'])
-    stock_data['tr2'] = abs(stock_data['High'] - stock_data['previous_close'])
-    stock_data['tr3'] = abs(stock_data['Low'] - stock_data['previous_close'])
-    stock_data['TR'] = stock_data[['tr1', 'tr2', 'tr3']].max(axis=1)
-
-    def rma(series, length):
-        alpha = 1 / length
-        return series.ewm(alpha=alpha, adjust=False).mean()
-
-    stock_data['ATR'] = rma(stock_data['TR'], length)
-    stock_data['Candle_Range'] = stock_data['High'] - stock_data['Low']
-    stock_data['Candle_Body'] = abs(stock_data['Close'] - stock_data['Open'])
-    return stock_data
-
-def capture_ohlc_data(stock_data, exit_index, i):
-    start_index = max(0, i - 12)
-    end_index = min(len(stock_data), exit_index + 12 if exit_index is not None else (i + 12))
-    
-    # Get the raw OHLC data
-    ohlc_data = stock_data.iloc[start_index:end_index]
-
-    return ohlc_data
-
-    
-def check_golden_crossover(stock_data_htf, pulse_check_start_date):
-    is_pulse_positive = ""  # Initialize an empty string to store the is_pulse_positive
-    isCandleGreen = ""
-    is_trend_up = ""  # Initialize is_trend_up
-    try:
-        # Calculate EMA20 and EMA50
-        stock_data_htf['EMA20'] = stock_data_htf['Close'].ewm(span=20, adjust=False).mean().round(2)
-        stock_data_htf['EMA50'] = stock_data_htf['Close'].ewm(span=50, adjust=False).mean().round(2)
-
-        # Drop rows with NaN values in EMA columns
-        stock_data_htf.dropna(subset=['EMA20', 'EMA50'], inplace=True)
-
-        # Identify crossover points
-        crossover_up = stock_data_htf['EMA20'] > stock_data_htf['EMA50']
-        crossover_down = stock_data_htf['EMA20'] < stock_data_htf['EMA50']
-
-        # Localize pulse_check_start_date to 'Asia/Kolkata'
-        # Check if pulse_check_start_date is timezone-aware
-        if pulse_check_start_date.tzinfo is None:
-             # Localize if it's naive
-             pulse_check_start_date = pulse_check_start_date.tz_localize('Asia/Kolkata')
-        else:
-             # Convert to 'Asia/Kolkata' timezone if it's already aware
-             pulse_check_start_date = pulse_check_start_date.tz_convert('Asia/Kolkata')
-        # Find the last index before the target date
-        last_index_before_staring_check = stock_data_htf.index[stock_data_htf.index < pulse_check_start_date]
-
-        if not last_index_before_staring_check.empty:
-            last_index_before_staring_check = last_index_before_staring_check[-1]
-
-            # Check crossover conditions just before the target date
-            if crossover_up.loc[last_index_before_staring_check]:
-                # Check if the crossover candle is bullish or bearish
-                if stock_data_htf['Close'].loc[last_index_before_staring_check] > stock_data_htf['Open'].loc[last_index_before_staring_check]:
-                    is_pulse_positive = "True"
-                    isCandleGreen = "True"
-                    
-                else:
-                    is_pulse_positive = "True"
-                    isCandleGreen = "False"
-            elif crossover_down.loc[last_index_before_staring_check]:
-                # Check if the crossover candle is bullish or bearish
-                if stock_data_htf['Close'].loc[last_index_before_staring_check] > stock_data_htf['Open'].loc[last_index_before_staring_check]:
-                    is_pulse_positive = "False"
-                    isCandleGreen = "True"
-                    
-                else:
-                    is_pulse_positive = "False "
-                    isCandleGreen = "False"
-                    
-            else:
-                is_pulse_positive = "invalid pulse"
-                isCandleGreen = "invalid closing"
-
-            # New logic for trend label
-            latest_candle_close = stock_data_htf['Close'].iloc[-1]
-            latest_candle_low = stock_data_htf['Low'].iloc[-1]
-            latest_candle_high = stock_data_htf['High'].iloc[-1]
-            latest_closing_price = round(stock_data_htf['Close'].iloc[-1], 2)
-            ema20 = stock_data_htf['EMA20']
-
-            if (latest_candle_close == ema20.iloc[-1] or 
-                (latest_candle_low <= ema20.iloc[-1] and latest_candle_high >= ema20.iloc[-1])):
-                is_trend_up = "None"
-            elif (latest_candle_close > ema20.iloc[-8] and latest_candle_close > ema20.iloc[-1]):
-                is_trend_up = "True"
-            elif (latest_candle_close < ema20.iloc[-8] and latest_candle_close < ema20.iloc[-1]):
-                is_trend_up = "False"
+# Initialize TvDatafeed with your TradingView credentials.
+# Each TvDatafeed holds a single websocket, so every fetch thread borrows its
+# own logged-in session; the sessions are kept across reruns.
+TV_FETCH_WORKERS = 4
+JOB_POLL_SECONDS = 1.0
+RESCAN_POLL_SECONDS = 30  # longest wait between checks for a closed candle
+CHECKPOINT_VERSION = (ENGINE_VERSION, RECORD_VERSION)  # saved scans of other versions are discarded
+CHART_PAGE_SIZE = 5
+LIVE_COLUMNS = ['Symbol', 'timeFrame', 'zoneStatus', 'zoneType', 'entryPrice', 'stopLoss', 'Target', 'zoneDistance', 'legoutDate']
 
-        else:
-            is_pulse_positive = "No data"
+@st.cache_resource
+def get_tv_sessions():
+    return queue.Queue()
 
-    except Exception as e:
-        is_pulse_positive = f"({e})"
-
-    return is_pulse_positive, isCandleGreen, is_trend_up  # Return the is_pulse_positive string and trend label
-
-def is_overlap_less_than_50(stock_data, legin_candle_index):
-
-    legin_candle_body = stock_data['Candle_Body'].iloc[legin_candle_index]
-    previous_candle_body = stock_data['Candle_Body'].iloc[legin_candle_index-1] 
-    return (previous_candle_body < legin_candle_body * 0.50)
-    
-from datetime import datetime, timedelta
-import pytz
-
-def validate_time_condition(legoutDate, entry_date, interval_key):
-    time_delay = {
-        '1 Minute': timedelta(minutes=15),
-        '3 Minutes': timedelta(minutes=75),
-        '5 Minutes': timedelta(minutes=75),
-        '10 Minutes': timedelta(days=1),
-        '15 Minutes': timedelta(days=1),
-        '125 Minutes': timedelta(hours=12),
-        '4 Hours': timedelta(days=3)
-    }
-    
-    # Get the required time delay for the given interval key
-    require_time_delay = time_delay.get(interval_key, timedelta(days=7))  # Default to 7 days if not found
-
-    ist = pytz.timezone('Asia/Kolkata')
-    current_time = datetime.now(ist)
-
-    # Convert legoutDate to datetime if it's a string
-    if isinstance(legoutDate, str):
-        legoutDate = datetime.fromisoformat(legoutDate)  # Adjust format as necessary
-    legout_date_formatting = legoutDate.tz_localize(ist) if legoutDate.tzinfo is None else legoutDate.astimezone(ist)
-
-    if entry_date is not None:
-        # Convert entry_date to datetime if it's a string
-        if isinstance(entry_date, str):
-            entry_date = datetime.fromisoformat(entry_date)  # Adjust format as necessary
-        entry_date_formatting = entry_date.tz_localize(ist) if entry_date.tzinfo is None else entry_date.astimezone(ist)
-        return entry_date_formatting > legout_date_formatting + require_time_delay
-    else:
-        return current_time > legout_date_formatting + require_time_delay
-        
-def check_legout_covered(it_is_demand_zone, stock_data, i, entry_index, total_risk, reward_value, first_legout_candle_range, entry_price):
-    first_legout_half = first_legout_candle_range * 0.50
-    legout_covered_limit = (total_risk * reward_value if reward_value == 3 else 5) + entry_price if it_is_demand_zone else (total_risk * reward_value if reward_value == 3 else 5) - entry_price
-    
-    if entry_index is not None:
-        if it_is_demand_zone:
-            highest_high = stock_data['High'].iloc[i:entry_index + 1].max()
-            return highest_high > legout_covered_limit
-        else:
-            lowest_low = stock_data['Low'].iloc[i:entry_index + 1].min()
-            return lowest_low < legout_covered_limit
-    else:
-        crossed = False
-        for n in range(i, len(stock_data)):
-            if not crossed:
-                if (it_is_demand_zone and stock_data['Low'].iloc[n] <= first_legout_half) or \
-                   (not it_is_demand_zone and stock_data['High'].iloc[n] >= first_legout_half):
-                    crossed = True
-            else:
-                if (it_is_demand_zone and stock_data['High'].iloc[n] > legout_covered_limit) or \
-                   (not it_is_demand_zone and stock_data['Low'].iloc[n] < legout_covered_limit):
-                    return True
-        return False
+tv_sessions = get_tv_sessions()
 
-
-def find_patterns(symbol, stock_data, interval_key, max_base_candles, scan_demand_zone_allowed, scan_supply_zone_allowed,reward_value,fresh_zone_allowed,target_zone_allowed,stoploss_zone_allowed,candle_behinde_legin_check_allowed , whitearea_check_allowed,legout_formation_check_allowed, wick_in_legin_allowed, time_validation_allowed,legin_tr_atr_check_allowed, one_legout_count_allowed,three_legout_count_allowed,legout_covered_check_allowed,one_two_ka_four_check_allowed,htf_interval,user_input_zone_distance):
+@contextmanager
+def tradingview_session():
     try:
-        patterns = []
-        last_legout_high = []  # Initialize here to avoid error
-        last_legout_low = [ ] # Intiialize here to avoid error
-        
-        if len(stock_data) < 3:
-            print(f"Not enough stock_data for {symbol}")
-            return []
-
-        for i in range(len(stock_data) - 1, 2, -1):
-            if scan_demand_zone_allowed and (stock_data['Close'].iloc[i] > stock_data['Open'].iloc[i] and 
-                stock_data['TR'].iloc[i] > stock_data['ATR'].iloc[i]):
-                if whitearea_check_allowed:
-                    white_area_condition = (stock_data['Open'].iloc[i] >= stock_data['Close'].iloc[i - 1] 
-                                            if stock_data['Close'].iloc[i - 1] > stock_data['Open'].iloc[i - 1] 
-                                            else stock_data['Open'].iloc[i] >= stock_data['Open'].iloc[i - 1])
-                else:
-                    white_area_condition = True  # If not allowed, treat as true
-
-                # Execute logic only if the white area condition is met
-                if white_area_condition:
-                   first_legout_open = stock_data['Open'].iloc[i] 
-                   first_legout_candle_body = abs(stock_data['Close'].iloc[i] - stock_data['Open'].iloc[i])
-                   first_legout_candle_range = (stock_data['High'].iloc[i] - stock_data['Low'].iloc[i])
-
-                   if first_legout_candle_body >= 0.6 * first_legout_candle_range:
-                       high_prices = []
-                       low_prices = []
-                       for base_candles_count in range(1, max_base_candles + 1):
-                           base_candles_found = 0
-                        
-                           legin_candle_index = i - (base_candles_count + 1)
-                           legin_candle_body = stock_data['Candle_Body'].iloc[legin_candle_index]
-                           legin_candle_range = stock_data['Candle_Range'].iloc[legin_candle_index]
-                        
-                           for k in range(1, base_candles_count + 1):
-                               if ((stock_data['ATR'].iloc[i - k] > stock_data['TR'].iloc[i - k]) and 
-                                   (legin_candle_body >= 0.60 * legin_candle_range) and (stock_data['TR'].iloc[legin_candle_index] > 0.8 * stock_data['ATR'].iloc[legin_candle_index])  ):
-                                
-                                   base_candles_found += 1
-                                   high_prices.append(stock_data['High'].iloc[i - k])
-                                   low_prices.append(stock_data['Low'].iloc[i - k])
-                                
-                               max_high_price = max(high_prices) if high_prices else None
-                               min_low_price = min(low_prices) if low_prices else None
-                            
-                               if  max_high_price is not None and min_low_price is not None:
-                                   actual_base_candle_range = max_high_price - min_low_price
-                               actual_legout_candle_range = None
-                               first_legout_candle_range_for_one_two_ka_four = (stock_data['High'].iloc[i] - stock_data['Close'].iloc[i-1])    
-                               condition_met = False  # Flag to check if any condition was met
-                               opposite_color_exist = ((stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index] and 
-                                                stock_data['Close'].iloc[legin_candle_index - 1] < stock_data['Open'].iloc[legin_candle_index - 1]) or
-                                                (stock_data['Close'].iloc[legin_candle_index] < stock_data['Open'].iloc[legin_candle_index] and 
-                                                stock_data['Close'].iloc[legin_candle_index - 1] > stock_data['Open'].iloc[legin_candle_index - 1]))
-
-                               # Check for candle overlap if allowed
-                               if candle_behinde_legin_check_allowed:
-                                    if opposite_color_exist:
-                                       overlap_condition = is_overlap_less_than_50(stock_data, legin_candle_index)
-                                    else:
-                                        overlap_condition = True
-                               else:
-                                    overlap_condition = True  # If not allowed, treat as true
-                                   
-                               if legout_formation_check_allowed:
-                                   legout_formation_condition = (first_legout_open <= stock_data['Close'].iloc[legin_candle_index] + legin_candle_body)
-                               else:
-                                   legout_formation_condition = True
-
-                               if wick_in_legin_allowed:
-                                   wick_in_legin_condition = ((stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index]) and (stock_data['High'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index])) or ((stock_data['Open'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index]) and (stock_data['Low'].iloc[legin_candle_index] < stock_data['Close'].iloc[legin_candle_index]))
-                               else:
-                                    wick_in_legin_condition = True 
-                               
-                               if time_validation_allowed:
-                                   time_validation_condition = validate_time_condition(stock_data.index[i], None ,interval_key)                               
-                               else :
-                                   time_validation_condition = True 
-
-
-                               if legin_tr_atr_check_allowed:
-                                   legin_tr_atr_check_conditon =  (stock_data['TR'].iloc[legin_candle_index] > stock_data['ATR'].iloc[legin_candle_index])
-                               else:
-                                   legin_tr_atr_check_conditon = True
-                                   
-                               if base_candles_found == base_candles_count:                                   
-                                   if not one_legout_count_allowed and not three_legout_count_allowed:
-                                      if ( 
-                                          (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and
-                                          (first_legout_candle_range_for_one_two_ka_four >= 2 * legin_candle_range) and 
-                                          (stock_data['Low'].iloc[i] >= stock_data['Low'].iloc[legin_candle_index]) and 
-                                       
-                                          overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon):
-                                          condition_met = True  # Set flag if this condition is met
-                                          legoutCount = 1    
-
-                                      else:  # This is the else part for the if statement above
-                                          last_legout_high = []
-                                          j = i + 1
-                                          while j in range(i + 1, min(i + 3, len(stock_data))) and stock_data['Close'].iloc[j] > stock_data['Open'].iloc[j]:
-                                           # Check if j == i + 1
-                                              if j == i + 1:
-                                                  if (stock_data['Open'].iloc[j] >= 0.10* stock_data['Close'].iloc[i] and 
-                                                      stock_data['Low'].iloc[j] >= 0.50 * stock_data['Candle_Range'].iloc[i]):
-                                                      last_legout_high.append(stock_data['High'].iloc[j])
-        
-                                              # Check if j == i + 2
-                                              elif j == i + 2:
-                                                  if stock_data['Low'].iloc[j] >= stock_data['Low'].iloc[i + 1]:
-                                                      last_legout_high.append(stock_data['High'].iloc[j])
-              
-                                              j += 1
-
-                                          last_legout_high_value = max(last_legout_high) if last_legout_high else None
-
-                                          if last_legout_high_value is not None:
-                                              actual_legout_candle_range = last_legout_high_value - stock_data['Close'].iloc[i - 1]
-
-                                              if (
-                                                  (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and 
-                                                  (actual_legout_candle_range >= 2 * legin_candle_range) and
-                                                  (stock_data['Low'].iloc[i] >= stock_data['Low'].iloc[legin_candle_index]) and 
-                                                  overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon):
-                      
-                                                  condition_met = True  # Set flag if this condition is met
-                                                  legoutCount = (j-i)+1    
-                                                      
-                                   else:
-                                       # If the one_legout_count_allowed checkbox is checked
-                                       if one_legout_count_allowed:
-                                           if (
-                                               (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and
-                                               (first_legout_candle_range_for_one_two_ka_four >= 2 * legin_candle_range) and 
-                                               (stock_data['Low'].iloc[i] >= stock_data['Low'].iloc[legin_candle_index]) and 
-                                               overlap_condition and legout_formation_condition and 
-                                               wick_in_legin_condition and time_validation_condition and 
-                                               legin_tr_atr_check_conditon):
-                                               condition_met = True  # Set flag if this condition is met
-                                               legoutCount = 1    
-
-                                       # If the three_legout_count_allowed checkbox is checked
-                                       if three_legout_count_allowed and not condition_met:
-                                           last_legout_high = []
-                                           j = i + 1
-                                           while j in range(i + 1, min(i + 3, len(stock_data))) and stock_data['Close'].iloc[j] > stock_data['Open'].iloc[j]:
-                                               # Check if j == i + 1
-                                               if j == i + 2:
-                                                   if (stock_data['Open'].iloc[i+1] >= 0.10 * stock_data['Close'].iloc[i] and 
-                                                       stock_data['Low'].iloc[i+1] >= 0.50 * stock_data['Candle_Range'].iloc[i] and
-                                                       stock_data['Low'].iloc[j] >= stock_data['Low'].iloc[i + 1] ):
-                                                       last_legout_high.append(stock_data['High'].iloc[j])
-                                               j += 1
-                                           last_legout_high_value = max(last_legout_high) if last_legout_high else None
- 
-                                           if last_legout_high_value is not None:
-                                               actual_legout_candle_range = last_legout_high_value - stock_data['Close'].iloc[i - 1]
- 
-                                               if (
-                                                   (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range ) and 
-                                                   (actual_legout_candle_range >= 2 * legin_candle_range) and
-                                                   (stock_data['Low'].iloc[i] >= stock_data['Low'].iloc[legin_candle_index]) and 
-                                                   overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon):
-                       
-                                                   condition_met = True  # Set flag if this condition is met      
-                                                   legoutCount = 3   
-                             
-                               if condition_met:
-                                   if interval_key in ('1 Day','1 Week','1 Month'):
-                                       leginDate = stock_data.index[legin_candle_index].strftime('%Y-%m-%d')
-                                       legoutDate = stock_data.index[i].strftime('%Y-%m-%d')
-                                   else:
-                                       leginDate = stock_data.index[legin_candle_index].strftime('%Y-%m-%d %H:%M:%S')
-                                       legoutDate = stock_data.index[i].strftime('%Y-%m-%d %H:%M:%S')
-                                
-                                   if actual_legout_candle_range is not None:
-                                       legout_candle_range = actual_legout_candle_range
-                                   else:
-                                       legout_candle_range = first_legout_candle_range_for_one_two_ka_four
-                                       
-                                   entry_occurred = False
-                                   target_hit = False
-                                   stop_loss_hit = False
-                                   entry_date = None
-                                   entry_index = None
-                                   exit_date = None
-                                   exit_index = None
-                                   zoneStatus = None
-                                   total_risk = max_high_price - min_low_price
-                                   minimum_target = (total_risk * reward_value) + max_high_price                  
-                                   start_index = j+1 if last_legout_high else i + 1
-
-
-                                   for m in range(start_index, len(stock_data)):
-                                       if not entry_occurred:
-                                           # Check if the entry condition is met
-                                           if stock_data['Low'].iloc[m] <= max_high_price:
-                                               entry_occurred = True
-                                               entry_index = m
-                                               entry_date = stock_data.index[m]
-   
-                                               # Check if the low and high of the current candle exceed the limits
-                                               if stock_data['Low'].iloc[m] < min_low_price:
-                                                   stop_loss_hit = True
-                                                   exit_index = m
-                                                   exit_date = stock_data.index[m]
-                                                   zoneStatus = 'Stop loss'
-                                                   break  # Exit the loop after stop-loss is hit
-                                               elif stock_data['High'].iloc[m] >= minimum_target:
-                                                   target_hit = True
-                                                   exit_index = m
-                                                   exit_date = stock_data.index[m]
-                                                   zoneStatus = 'Target'
-                                                   break  # Exit the loop after target is hit
-                                           elif min(stock_data['Low'].iloc[start_index:]) > max_high_price:
-                                                zoneStatus = 'Fresh'
-                                       
-                                       else:
-                                           # After entry, check if price hits stop-loss or minimum target
-                                           if stock_data['Low'].iloc[m] < min_low_price:
-                                               stop_loss_hit = True
-                                               exit_index = m
-                                               exit_date = stock_data.index[m]
-                                               zoneStatus = 'Stop loss'
-                                               break  # Exit the loop after stop-loss is hit
-                                           elif stock_data['High'].iloc[m] >= minimum_target:
-                                               target_hit = True
-                                               exit_index = m
-                                               exit_date = stock_data.index[m]
-                                               zoneStatus = 'Target'
-                                               break  # Exit the loop after target is hit
-                                   if  legout_covered_check_allowed :
-                                       it_is_demand_zone = True
-                                       legout_covered_check_condition = check_legout_covered(it_is_demand_zone, stock_data, i, entry_index, total_risk, reward_value, first_legout_candle_range, max_high_price)       
-                                   else:
-                                       legout_covered_check_condition = True
-                                       
-                                   if time_validation_allowed and entry_date is not None:
-                                       time_validation_condition = validate_time_condition(stock_data.index[i], entry_date, interval_key)
-                                   else :
-                                       time_validation_condition = True                                 
-                                   # time_in_exit = exit_index - entry_index                                
-                                   latest_closing_price = round(stock_data['Close'].iloc[-1], 2)
-                                   zone_distance = (math.floor(latest_closing_price) - max(high_prices)) / max(high_prices) * 100
-                                                                   
-                                   if ((fresh_zone_allowed and zoneStatus == 'Fresh') or \
-                                      (target_zone_allowed and zoneStatus == 'Target') or \
-                                      (stoploss_zone_allowed and zoneStatus == 'Stop loss')) and time_validation_condition and legout_covered_check_condition and zone_distance <= user_input_zone_distance:
-                                      
-                                      Pattern_name_is = 'DZ(DBR)' if stock_data['Open'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index] else 'DZ(RBR)'
-                                      legin_base_legout_ranges = f"{round(legin_candle_range)}:{round(actual_base_candle_range)}:{round(legout_candle_range)}"
-                                      ohlc_data = capture_ohlc_data(stock_data, exit_index, i)                                   
-                                      #pulse_check_start_date = pd.Timestamp(entry_date) if entry_date is not None else pd.Timestamp.now()
-                                      #is_pulse_positive,isCandleGreen,is_trend_up = check_golden_crossover(stock_data_htf, pulse_check_start_date)   
-                                      
-                                      white_area_condition = (stock_data['Open'].iloc[i] >= stock_data['Close'].iloc[i - 1] 
-                                            if stock_data['Close'].iloc[i - 1] > stock_data['Open'].iloc[i - 1] 
-                                            else stock_data['Open'].iloc[i] >= stock_data['Open'].iloc[i - 1])
-
-                                      if white_area_condition:
-                                          white_area = 'True'
-                                      else:
-                                          white_area = 'False'
-                                          
-                                      if opposite_color_exist :
-                                          if is_overlap_less_than_50(stock_data, legin_candle_index): 
-                                             legoutNotCovered = 'True'
-                                          else:
-                                              legoutNotCovered = 'False'
-                                      else:
-                                          legoutNotCovered = 'True'
-                                          
-                                      if (first_legout_open <= stock_data['Close'].iloc[legin_candle_index] + legin_candle_body):
-                                          legout_formation = 'True'
-                                      else: 
-                                          legout_formation = 'False' 
-                                      if ((stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index]) and (stock_data['High'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index])) or ((stock_data['Open'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index]) and (stock_data['Low'].iloc[legin_candle_index] < stock_data['Close'].iloc[legin_candle_index])):
-                                          wick_in_legin = 'True'
-                                      else:
-                                          wick_in_legin = 'False'
-                                      if validate_time_condition(stock_data.index[i], None ,interval_key): 
-                                          time_validated_pass = 'True'
-                                      else:    
-                                          time_validated_pass = 'False'
-
-                                      if (stock_data['TR'].iloc[legin_candle_index] > stock_data['ATR'].iloc[legin_candle_index]):
-                                         legin_tr_check = 'True'
-                                      else:
-                                          legin_tr_check = 'False'
-
-                                      if check_legout_covered(True, stock_data, i, entry_index, total_risk, reward_value, first_legout_candle_range, max_high_price):    
-                                         legout_covered = 'True'
-                                      else:
-                                          legout_covered = 'False'
-                                      if (legin_candle_range >= 2 * actual_base_candle_range) : 
-                                          one_two_ka_four = 'True'    
-                                      else:
-                                          one_two_ka_four = 'False'
-                                      patterns.append({
-                                           'Symbol': symbol, 
-                                           'timeFrame': interval_key,
-                                           'zoneStatus':zoneStatus,
-                                           'zoneType' : Pattern_name_is,
-                                           'entryPrice':max_high_price,
-                                           'stopLoss': min_low_price,
-                                           'Target': minimum_target,
-                                          
-                                           'isWhiteArea': white_area,
-                                           'legoutNotCovered':legoutNotCovered,
-                                           'isLegoutFormation':legout_formation,
-                                           'isWickInLegin':wick_in_legin,
-                                           'isTimeValidationPass':time_validated_pass,
-                                           'isLeginTrPass':legin_tr_check,
-                                           'isLegoutCovered':legout_covered,
-                                           'legoutCount' : legoutCount,
-                                           'isOneTwoKaFour' : one_two_ka_four,
-                                          
-                                           'entryDate':entry_date,
-                                           'exitDate':exit_date,
-                                           'exitIndex' :exit_index ,  
-                                           'entryIndex' :entry_index ,  
-                                           'zoneDistance': zone_distance.round(2),
-                                           'leginDate': leginDate,
-                                           'baseCount': base_candles_found,
-                                           'legoutDate': legoutDate,
-                                           'leginBaseLegoutRanges': legin_base_legout_ranges,
-                                           'ohlcData': ohlc_data,
-                                           'closePrice': latest_closing_price
-                                       })
-
-            if scan_supply_zone_allowed and (stock_data['Open'].iloc[i] > stock_data['Close'].iloc[i] and 
-                                              stock_data['TR'].iloc[i] > stock_data['ATR'].iloc[i]):
-                #st.write("scan zone zone allowed pass")
-
-                # Check for white area condition if allowed
-                if whitearea_check_allowed:
-                    white_area_condition_supply = (stock_data['Open'].iloc[i] <= stock_data['Close'].iloc[i - 1] 
-                                                    if stock_data['Close'].iloc[i - 1] < stock_data['Open'].iloc[i - 1] 
-                                                    else stock_data['Open'].iloc[i] <= stock_data['Open'].iloc[i - 1])
-                else:
-                    white_area_condition_supply = True  # If not allowed, treat as true
-                #st.write(" white area condition pass")
-
-                if white_area_condition_supply:
-                    first_legout_open = stock_data['Open'].iloc[i]
-                    first_legout_candle_body = abs(stock_data['Close'].iloc[i] - stock_data['Open'].iloc[i])
-                    first_legout_candle_range = (stock_data['High'].iloc[i] - stock_data['Low'].iloc[i])
-                    
-                    if first_legout_candle_body >= 0.6 * first_legout_candle_range:
-                        #st.write(" fist legout body greater than 50 % pass")
-                        high_prices = []
-                        low_prices = []
-                        for base_candles_count in range(1, max_base_candles + 1):
-                            base_candles_found = 0
-                        
-                            legin_candle_index = i - (base_candles_count + 1)
-                            legin_candle_body = stock_data['Candle_Body'].iloc[legin_candle_index]
-                            legin_candle_range = stock_data['Candle_Range'].iloc[legin_candle_index]
-                            
-                            for k in range(1, base_candles_count + 1):
-                                if ((stock_data['ATR'].iloc[i - k] > stock_data['TR'].iloc[i - k]) and 
-                                    (legin_candle_body >= 0.60 * legin_candle_range)  and (stock_data['TR'].iloc[legin_candle_index] > 0.8 * stock_data['ATR'].iloc[legin_candle_index])):
-                                
-                                    base_candles_found += 1
-                                    high_prices.append(stock_data['High'].iloc[i - k])
-                                    low_prices.append(stock_data['Low'].iloc[i - k])
-                                #st.write(f"Base candle found at index {i-k}: High {stock_data['High'].iloc[i - k]}, Low {stock_data['Low'].iloc[i - k]}")
-                                
-                                max_high_price = max(high_prices) if high_prices else None
-                                min_low_price = min(low_prices) if low_prices else None
-                            
-                                if max_high_price is not None and min_low_price is not None:
-                                    actual_base_candle_range = max_high_price - min_low_price
-                                actual_legout_candle_range = None
-                                first_legout_candle_range_for_one_two_ka_four = (stock_data['Close'].iloc[i-1] - stock_data['Low'].iloc[i])    
-                                condition_met = False  # Flag to check if any condition was met
-
-                                opposite_color_exist = ((stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index] and 
-                                                stock_data['Close'].iloc[legin_candle_index - 1] < stock_data['Open'].iloc[legin_candle_index - 1]) or
-                                                (stock_data['Close'].iloc[legin_candle_index] < stock_data['Open'].iloc[legin_candle_index] and 
-                                                stock_data['Close'].iloc[legin_candle_index - 1] > stock_data['Open'].iloc[legin_candle_index - 1]))
-                                
-                                if candle_behinde_legin_check_allowed:
-                                    if opposite_color_exist:
-                                       overlap_condition = is_overlap_less_than_50(stock_data, legin_candle_index)
-                                    else:
-                                        overlap_condition = True
-                                else:
-                                    overlap_condition = True  # If not allowed, treat as true
-                                    
-                                if legout_formation_check_allowed:
-                                   legout_formation_condition = (first_legout_open >= stock_data['Close'].iloc[legin_candle_index] - legin_candle_body)
-                                else:
-                                   legout_formation_condition = True  
-                                   
-                                if wick_in_legin_allowed:
-                                   wick_in_legin_condition = ((stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index]) and (stock_data['High'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index])) or ((stock_data['Open'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index]) and (stock_data['Low'].iloc[legin_candle_index] < stock_data['Close'].iloc[legin_candle_index]))
-                                else :
-                                   wick_in_legin_condition = True 
-                                    
-                                if time_validation_allowed:
-                                   time_validation_condition = validate_time_condition(stock_data.index[i], None, interval_key)
-                                else:
-                                   time_validation_condition = True 
-                                    
-                                if legin_tr_atr_check_allowed:
-                                   legin_tr_atr_check_conditon =  (stock_data['TR'].iloc[legin_candle_index] > stock_data['ATR'].iloc[legin_candle_index])
-                                else:
-                                   legin_tr_atr_check_conditon = True
-                                   
-                                if base_candles_found == base_candles_count:
-                                   #st.write("base count equal to base found executed")
-                                   if not one_legout_count_allowed and not three_legout_count_allowed:
-                                    #st.write(f"{overlap_condition}, {legout_formation_condition} ,{wick_in_legin_condition} ,time_validation_allowed:{time_validation_condition}, {legin_tr_atr_check_conditon}")   
-                                    # Define each condition separately
-                                                                          
-                                     if (
-                                         (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and
-                                        (first_legout_candle_range_for_one_two_ka_four >= 2 * legin_candle_range) and 
-                                        (stock_data['High'].iloc[i] <= stock_data['High'].iloc[legin_candle_index]) and
-                                        overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon):
-                                        condition_met = True  # Set flag if this condition is met
-                                        legoutCount = 1    
-                                     else:  # This is the else part for the if statement above
-                                        last_legout_low = []
-                                        j = i + 1
-                                        while j in range(i + 1, min(i + 3, len(stock_data))) and stock_data['Open'].iloc[j] > stock_data['Close'].iloc[j]:
-                                            # Check if j == i + 1
-                                            if j == i + 1:
-                                                if (stock_data['Open'].iloc[j] <= 0.10* stock_data['Close'].iloc[i] and 
-                                                    stock_data['High'].iloc[j] <= 0.50 * stock_data['Candle_Range'].iloc[i]):
-                                                    last_legout_low.append(stock_data['Low'].iloc[j])
-            
-                                                # Check if j == i + 2
-                                                elif j == i + 2:
-                                                    if stock_data['High'].iloc[j] <= stock_data['High'].iloc[i + 1]:
-                                                        last_legout_low.append(stock_data['Low'].iloc[j])
-            
-                                            j += 1
-
-                                        last_legout_low_value = min(last_legout_low) if last_legout_low else None
-
-                                        if last_legout_low_value is not None:
-                                            actual_legout_candle_range = abs(last_legout_low_value - stock_data['Close'].iloc[i - 1])
-
-                                            if (
-                                                (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and 
-                                                (actual_legout_candle_range >= 2 * legin_candle_range) and
-                                                (stock_data['High'].iloc[i] <= stock_data['High'].iloc[legin_candle_index]) and 
-                                                overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon ):
-                
-                                                condition_met = True  # Set flag if this condition is met
-                                                legoutCount = (j-i)+1    
-    
-                                   else:
-                                       # If the one_legout_count_allowed checkbox is checked
-                                       if one_legout_count_allowed:
-                                          if (
-                                             (legin_candle_range >= (2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and
-                                             (first_legout_candle_range_for_one_two_ka_four >= 2 * legin_candle_range) and 
-                                             (stock_data['High'].iloc[i] <= stock_data['High'].iloc[legin_candle_index]) and
-                                             overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon):
-                                        
-                                             condition_met = True  # Set flag if this condition is met
-                                             legoutCount = 1    
-
-                                       
-                                       if three_legout_count_allowed and not condition_met :
-                                           last_legout_low = []
-                                           j = i + 1
-                                           while j in range(i + 1, min(i + 3, len(stock_data))) and stock_data['Open'].iloc[j] > stock_data['Close'].iloc[j]:
-                                               # Check if j == i + 1
-                                               if j == i + 2:
-                                                   if (
-                                                       (stock_data['Open'].iloc[j] <= 0.10* stock_data['Close'].iloc[i]) and 
-                                                       (stock_data['High'].iloc[j] <= 0.50 * stock_data['Candle_Range'].iloc[i]) and 
-                                                       (stock_data['High'].iloc[j] <= stock_data['High'].iloc[i + 1])
-                                                        ) :
-                                                       last_legout_low.append(stock_data['Low'].iloc[j])
-            
-                                               j += 1
-
-                                           last_legout_low_value = min(last_legout_low) if last_legout_low else None
-
-                                           if last_legout_low_value is not None:
-                                               actual_legout_candle_range = abs(last_legout_low_value - stock_data['Close'].iloc[i - 1])
-                                               if (
-                                                   (legin_candle_range >= ( 2 if one_two_ka_four_check_allowed else 1.5) * actual_base_candle_range) and 
-                                                   (actual_legout_candle_range >= 2 * legin_candle_range) and
-                                                   (stock_data['High'].iloc[i] <= stock_data['High'].iloc[legin_candle_index]) and 
-                                                   overlap_condition and legout_formation_condition and wick_in_legin_condition and time_validation_condition and legin_tr_atr_check_conditon ):
-                
-                                                   condition_met = True  # Set flag if this condition is met
-                                                   legoutCount = 3   
-    
-                                           
-                                # Code block to execute if any condition was met
-                                if condition_met:
-                                    if interval_key in ('1 Day','1 Week','1 Month'):
-                                        leginDate = stock_data.index[legin_candle_index].strftime('%Y-%m-%d')
-                                        legoutDate = stock_data.index[i].strftime('%Y-%m-%d')
-                                    else:
-                                        leginDate = stock_data.index[legin_candle_index].strftime('%Y-%m-%d %H:%M:%S')
-                                        legoutDate = stock_data.index[i].strftime('%Y-%m-%d %H:%M:%S')
-                                     
-                                
-                                    if actual_legout_candle_range is not None:
-                                        legout_candle_range = actual_legout_candle_range
-                                    else:
-                                        legout_candle_range = first_legout_candle_range_for_one_two_ka_four
-
-                                    entry_occurred = False
-                                    target_hit = False
-                                    stop_loss_hit = False
-                                    entry_date = None
-                                    entry_index = None
-                                    exit_date = None
-                                    exit_index = None
-                                    zoneStatus = None
-                                    total_risk = max_high_price - min_low_price
-                                    minimum_target = min_low_price - (total_risk * reward_value)                   
-                                    start_index = j+1 if last_legout_low else i + 1
-
-                                    for m in range(start_index, len(stock_data)):
-                                        if not entry_occurred:
-                                            # Check if the entry condition is met
-                                            if stock_data['High'].iloc[m] >= min_low_price:
-                                                entry_occurred = True
-                                                entry_index = m
-                                                entry_date = stock_data.index[m]
-
-                                                # Check if the low and high of the current candle exceed the limits
-                                                if stock_data['High'].iloc[m] > max_high_price:
-                                                    stop_loss_hit = True
-                                                    exit_index = m
-                                                    exit_date = stock_data.index[m]
-                                                    zoneStatus = 'Stop loss'
-                                                    break  # Exit the loop after stop-loss is hit
-                                                elif stock_data['Low'].iloc[m] <= minimum_target:
-                                                    target_hit = True
-                                                    exit_index = m
-                                                    exit_date = stock_data.index[m]
-                                                    zoneStatus = 'Target'
-                                                    break  # Exit the loop after target is hit
-                                            elif max(stock_data['High'].iloc[start_index:]) < min_low_price:
-                                                 zoneStatus = 'Fresh'
-                                        else:
-                                            # After entry, check if price hits stop-loss or minimum target
-                                            if stock_data['High'].iloc[m] > max_high_price:
-                                                stop_loss_hit = True
-                                                exit_index = m
-                                                exit_date = stock_data.index[m]
-                                                zoneStatus = 'Stop loss'
-                                                break  # Exit the loop after stop-loss is hit
-                                            elif stock_data['Low'].iloc[m] <= minimum_target:
-                                                target_hit = True
-                                                exit_index = m
-                                                exit_date = stock_data.index[m]
-                                                zoneStatus = 'Target'
-                                                break  # Exit the loop after target is hit
-                                               
-                                    if  legout_covered_check_allowed :
-                                        it_is_demand_zone = False
-                                        legout_covered_check_condition = check_legout_covered(it_is_demand_zone, stock_data, i, entry_index, total_risk, reward_value, first_legout_candle_range, min_low_price)       
-                                    else:
-                                        legout_covered_check_condition = True
-                                    
-                                    if time_validation_allowed and entry_date is not None:
-                                       time_validation_condition = validate_time_condition(stock_data.index[i], entry_date, interval_key)
-                                    else :
-                                       time_validation_condition = True     
-                                    latest_closing_price = round(stock_data['Close'].iloc[-1], 2)
-                                    zone_distance = (min(low_prices) - math.floor(latest_closing_price)) / min(low_prices) * 100
-                                                                    
-                                    if ((fresh_zone_allowed and zoneStatus == 'Fresh') or \
-                                       (target_zone_allowed and zoneStatus == 'Target') or \
-                                       (stoploss_zone_allowed and zoneStatus == 'Stop loss')) and time_validation_condition and legout_covered_check_condition and zone_distance <= user_input_zone_distance:
-                                           
-                                       Pattern_name_is = 'SZ(RBD)' if stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index] else 'SZ(DBD)'
-                                       legin_base_legout_ranges = f"{round(legin_candle_range, 2)}:{round(actual_base_candle_range, 2)}:{round(legout_candle_range, 2)}"
-                                    
-                                       ohlc_data = capture_ohlc_data(stock_data, exit_index, i)
-                                    
-                                       #pulse_check_start_date = pd.Timestamp(entry_date) if entry_date is not None else pd.Timestamp.now()
-                                       #is_pulse_positive,isCandleGreen,is_trend_up = check_golden_crossover(stock_data_htf, pulse_check_start_date)
-
-                                       white_area_condition = (stock_data['Open'].iloc[i] <= stock_data['Close'].iloc[i - 1] 
-                                                    if stock_data['Close'].iloc[i - 1] < stock_data['Open'].iloc[i - 1] 
-                                                    else stock_data['Open'].iloc[i] <= stock_data['Open'].iloc[i - 1])
-                                       if white_area_condition:
-                                           white_area = 'True'
-                                       else:
-                                           white_area = 'False'
-                                       if opposite_color_exist :
-                                           if is_overlap_less_than_50(stock_data, legin_candle_index): 
-                                              legoutNotCovered = 'True'
-                                           else:
-                                               legoutNotCovered = 'False'
-                                       else:
-                                          legoutNotCovered = 'True'
-
-                                           
-                                       if (first_legout_open >= stock_data['Close'].iloc[legin_candle_index] - legin_candle_body):
-                                           legout_formation = 'True'
-                                       else: 
-                                           legout_formation = 'False' 
-                                       if ((stock_data['Close'].iloc[legin_candle_index] > stock_data['Open'].iloc[legin_candle_index]) and (stock_data['High'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index])) or ((stock_data['Open'].iloc[legin_candle_index] > stock_data['Close'].iloc[legin_candle_index]) and (stock_data['Low'].iloc[legin_candle_index] < stock_data['Close'].iloc[legin_candle_index])):
-                                           wick_in_legin = 'True'
-                                       else:
-                                           wick_in_legin = 'False'
-                                       if validate_time_condition(stock_data.index[i], None ,interval_key): 
-                                           time_validated_pass = 'True'
-                                       else:    
-                                           time_validated_pass = 'False'
-
-                                       if (stock_data['TR'].iloc[legin_candle_index] > stock_data['ATR'].iloc[legin_candle_index]):
-                                          legin_tr_check = 'True'
-                                       else:
-                                           legin_tr_check = 'False'
-
-                                       if check_legout_covered(False, stock_data, i, entry_index, total_risk, reward_value, first_legout_candle_range, min_low_price):
-                                           legout_covered = 'True'
-                                       else:
-                                           legout_covered = 'False'
-                                       if (legin_candle_range >= 2 * actual_base_candle_range) : 
-                                          one_two_ka_four = 'True'
-                                       else:
-                                           one_two_ka_four = 'False'
-                                           
-                                           
-                                       patterns.append({
-                                            'Symbol': symbol, 
-                                            'timeFrame':interval_key,                                                                         
-                                            'zoneStatus':zoneStatus,
-                                            'zoneType' : Pattern_name_is,
-                                            'entryPrice':max_high_price,
-                                            'stopLoss': min_low_price,
-                                            'Target': minimum_target,
-
-                                            'isWhiteArea': white_area,
-                                            'legoutNotCovered':legoutNotCovered,
-                                            'isLegoutFormation':legout_formation,
-                                            'isWickInLegin':wick_in_legin,
-                                            'isTimeValidationPass':time_validated_pass,
-                                            'isLeginTrPass':legin_tr_check,
-                                            'isLegoutCovered':legout_covered,
-                                            'legoutCount':legoutCount,
-                                            'isOneTwoKaFour' : one_two_ka_four,
-                                            
-                                           
-                                            'entryDate':entry_date,
-                                            'exitDate':exit_date,
-                                            'exitIndex' :exit_index ,  
-                                            'entryIndex' :entry_index ,                                                                            
-                                            'zoneDistance': zone_distance.round(2),
-                                            'leginDate': leginDate,
-                                            'baseCount': base_candles_found,
-                                            'legoutDate': legoutDate,
-                                            'leginBaseLegoutRanges': legin_base_legout_ranges,
-                                            'ohlcData': ohlc_data,
-                                            'closePrice': latest_closing_price
-                                        })
-                              
-        return patterns
-    except Exception as e:
-        print(f"Error processing {symbol}: {e}")
-        return []
+        tv = tv_sessions.get_nowait()
+    except queue.Empty:
+        tv = TvDatafeed('AKTradingWithSL', 'bulky@001122')
+    try:
+        yield tv
+    finally:
+        tv_sessions.put(tv)
 
-# Initialize TvDatafeed with your TradingView credentials
-tv = TvDatafeed('AKTradingWithSL', 'bulky@001122')
 interval_key = None  # initialize it
 
 st.markdown(
@@ -1084,6 +293,12 @@ with col1:
 with col2:
     user_input_zone_distance = st.number_input("Current price to zone entry price distance in %", min_value=1, value=10)
 
+col1, col2 = st.columns(2)
+with col1:
+    max_zones_per_scan = st.number_input("Max zones per symbol/timeframe (0 = no limit)", min_value=0, value=0, step=1)
+with col2:
+    max_lookback_bars = st.number_input("Max lookback bars (0 = full history)", min_value=0, value=0, step=1)
+
 # Time Interval Selection Popover
 col1, col2 = st.columns(2)
 with col1:
@@ -1202,6 +417,7 @@ reward_mapping = {
 }
  
 nse = mcal.get_calendar('NSE')
+nse_holiday_dates = nse_holidays(nse)
 
 # Get today's date
 end_date = datetime.now()
@@ -1234,7 +450,129 @@ candles_count = {
         '1 Month': 20,
     }
 
+# Bar length per time frame, used to tell when a cached scan can be stale
+interval_durations = {
+        '1 Minute': pd.Timedelta(minutes=1),
+        '3 Minutes': pd.Timedelta(minutes=3),
+        '5 Minutes': pd.Timedelta(minutes=5),
+        '10 Minutes': pd.Timedelta(minutes=10),
+        '15 Minutes': pd.Timedelta(minutes=15),
+        '30 Minutes': pd.Timedelta(minutes=30),
+        '45 Minutes': pd.Timedelta(minutes=45),
+        '1 Hour': pd.Timedelta(hours=1),
+        '75 Minutes': pd.Timedelta(minutes=75),
+        '2 Hours': pd.Timedelta(hours=2),
+        '125 Minutes': pd.Timedelta(minutes=125),
+        '3 Hours': pd.Timedelta(hours=3),
+        '4 Hours': pd.Timedelta(hours=4),
+        '1 Day': pd.Timedelta(days=1),
+        '1 Week': pd.Timedelta(weeks=1),
+        '1 Month': pd.DateOffset(months=1),
+    }
+
 include_chart = st.checkbox("Include chart ", value="include_chart")
+use_process_pool = st.checkbox("Use all CPU cores for zone detection", value=False)
+
+# One worker pool per server process, reused across reruns and sessions
+@st.cache_resource
+def get_detection_pool():
+    return DetectionPool()
+
+# Zone lists shared by every session until a new candle closes
+@st.cache_resource
+def get_result_cache():
+    return ScanCache()
+
+@st.cache_resource
+def get_series_store():
+    return SeriesStore()
+
+# Identical fetches / detections running in several sessions are done once
+@st.cache_resource
+def get_flights():
+    return SingleFlight()
+
+def make_scan_stages(spec):
+    # Everything the scan needs comes from the saved spec rather than the
+    # widgets, so a checkpointed job can be rebuilt after a restart
+    detection_pool = get_detection_pool() if spec['use_process_pool'] else None
+    series_store = get_series_store()
+    selected_intervals = spec['selected_intervals']
+    intervals = spec['intervals']
+    htf_intervals = spec['htf_intervals']
+    trading_days_count = spec['trading_days_count']
+    fut_contract = spec['fut_contract']
+
+    def fetch_scan_task(task):
+        exchange, symbol, idx = task
+        interval = intervals[idx]
+        interval_key = selected_intervals[idx]
+        # Get the number of candles for the selected interval
+        candles_in_selected_time_frame = candles_count[interval_key]
+
+        # Calculate the total number of candles
+        n_bars = trading_days_count * candles_in_selected_time_frame
+        htf_interval = htf_intervals[idx] if idx < len(htf_intervals) else None
+        multiple_of_n_bars = 5000
+        # Fetch stock data based on the selected intervals
+        if interval_key in ['10 Minutes', '75 Minutes', '125 Minutes']:
+            stock_data = fetch_stock_data_and_resample(symbol, exchange, multiple_of_n_bars, htf_interval, interval, interval_key,fut_contract)
+        else:
+            stock_data = fetch_stock_data(symbol, exchange, n_bars, htf_interval, interval,fut_contract)
+        if stock_data is None:
+            return None
+
+        # Calculate ATR and clean up the DataFrame
+        stock_data = calculate_atr(stock_data)
+        columns_to_remove = ['symbol', 'tr1', 'tr2', 'tr3', 'previous_close']
+        stock_data = stock_data.drop(columns=columns_to_remove, errors='ignore')
+        return stock_data.round(2)
+
+    def detect_scan_batch(batch):
+        results = []
+        for (exchange, symbol, idx), stock_data in batch:
+            interval_key = selected_intervals[idx]
+            htf_interval = htf_intervals[idx] if idx < len(htf_intervals) else None
+            params = dict(spec['pattern_params'], reward_value=reward_mapping.get(interval_key, 5), htf_interval=htf_interval)
+            # Patterns only reference their chart window in the stored series
+            params['series_id'] = series_id(f"{exchange}:{symbol}", interval_key, stock_data.index[-1])
+            if detection_pool is not None:
+                records = detection_pool.submit_zones(symbol, stock_data, interval_key, params).result()
+            else:
+                records = encode_zones(find_patterns(symbol, stock_data, interval_key, **params), stock_data)
+            if len(records):
+                series_store.put(params['series_id'], stock_data)
+            tz = stock_data.index.tz
+            results.append(ZoneBatch(symbol, interval_key, params['series_id'], records, str(tz) if tz is not None else None))
+        return results
+
+    def scan_key(task):
+        exchange, symbol, idx = task
+        interval_key = selected_intervals[idx]
+        params = dict(spec['pattern_params'], reward_value=reward_mapping.get(interval_key, 5),
+                      htf_interval=htf_intervals[idx] if idx < len(htf_intervals) else None,
+                      trading_days_count=trading_days_count, fut_contract=fut_contract)
+        return cache_key(f"{exchange}:{symbol}", interval_key, params, ENGINE_VERSION)
+
+    def fetch_key(task):
+        exchange, symbol, idx = task
+        return exchange, symbol, selected_intervals[idx], trading_days_count, fut_contract
+
+    fetch_scan_task, detect_scan_batch = shared_stages(
+        fetch_scan_task, detect_scan_batch, get_flights(), fetch_key,
+        lambda task, stock_data: (scan_key(task), stock_data.index[-1]))
+    def candle_close_for(task, last_bar_time):
+        exchange, symbol, idx = task
+        interval_key = selected_intervals[idx]
+        if exchange in NSE_EXCHANGES:
+            return candle_close(interval_key, last_bar_time, nse_holiday_dates)
+        return next_candle_close(last_bar_time, interval_durations[interval_key])
+
+    fetch_scan_task, detect_scan_batch = cached_stages(
+        fetch_scan_task, detect_scan_batch, get_result_cache(), scan_key, candle_close_for)
+    pipeline_kwargs = dict(fetch_workers=TV_FETCH_WORKERS,
+                           detect_workers=detection_pool.max_workers if detection_pool is not None else 1)
+    return fetch_scan_task, detect_scan_batch, pipeline_kwargs
 
 find_patterns_button = st.button(label='🔍 Scan Now')
 
@@ -1244,83 +582,119 @@ if selected_market != "Equity Market":
 else:
    fut_contract = None
 if find_patterns_button:
-    patterns_found_button_clicked = True
-    progress_bar = st.progress(0)
-    progress_text = st.empty()
-    progress_percent = 0
-    start_time = time.time()
-    patterns_found = []
-    any_patterns_found = False  # Initialize the flag
-
     # Create symbols list from user input
     symbols = user_symbols.split(", ")
 
-    for i, full_symbol in enumerate(symbols):
-        progress_percent = (i + 1) / len(symbols)
-        progress_bar.progress(progress_percent)
-        
+    pattern_params = dict(
+        max_base_candles=max_base_candles,
+        scan_demand_zone_allowed=scan_demand_zone_allowed,
+        scan_supply_zone_allowed=scan_supply_zone_allowed,
+        fresh_zone_allowed=fresh_zone_allowed,
+        target_zone_allowed=target_zone_allowed,
+        stoploss_zone_allowed=stoploss_zone_allowed,
+        candle_behinde_legin_check_allowed=candle_behinde_legin_check_allowed,
+        whitearea_check_allowed=whitearea_check_allowed,
+        legout_formation_check_allowed=legout_formation_check_allowed,
+        wick_in_legin_allowed=wick_in_legin_allowed,
+        time_validation_allowed=time_validation_allowed,
+        legin_tr_atr_check_allowed=legin_tr_atr_check_allowed,
+        one_legout_count_allowed=one_legout_count_allowed,
+        three_legout_count_allowed=three_legout_count_allowed,
+        legout_covered_check_allowed=legout_covered_check_allowed,
+        one_two_ka_four_check_allowed=one_two_ka_four_check_allowed,
+        user_input_zone_distance=user_input_zone_distance,
+        max_zones=max_zones_per_scan or None,
+        max_lookback_bars=max_lookback_bars or None,
+    )
+    scan_spec = dict(
+        pattern_params=pattern_params,
+        selected_intervals=list(selected_intervals),
+        intervals=intervals,
+        htf_intervals=htf_intervals,
+        trading_days_count=len(trading_days),
+        days_back=days_back,
+        fut_contract=fut_contract,
+        use_process_pool=use_process_pool,
+    )
+
+    tasks = []
+    for full_symbol in symbols:
         exchange, symbol = full_symbol.split(":")
-        exchange = f"{exchange}"
-        symbol = f"{symbol}"
-
-        progress_text.text(f"🔍 Scanning Zone for {symbol}: {i + 1} of {len(symbols)} Stocks Analyzed")
-
-        for idx, interval in enumerate(intervals):
-            try:
-                interval_key = selected_intervals[idx]
-                reward_value = reward_mapping.get(interval_key, 5)                
-                # Get the number of candles for the selected interval
-                candles_in_selected_time_frame = candles_count[selected_intervals[idx]]
-                
-                # Get the count of trading days
-                trading_days_count = len(trading_days)
-
-                # Calculate the total number of candles
-                n_bars = trading_days_count * candles_in_selected_time_frame
-                htf_interval = htf_intervals[idx] if idx < len(htf_intervals) else None
-                multiple_of_n_bars = 5000
-                # Fetch stock data based on the selected intervals
-                if selected_intervals[idx] in ['10 Minutes', '75 Minutes', '125 Minutes']:
-                    stock_data = fetch_stock_data_and_resample(symbol, exchange, multiple_of_n_bars, htf_interval, interval, interval_key,fut_contract)
-                else:
-                    #st.write(symbol, exchange, n_bars, htf_interval, interval,fut_contract)
-                    stock_data = fetch_stock_data(symbol, exchange, n_bars, htf_interval, interval,fut_contract)
-                
-                # Ensure stock_data is valid before proceeding
-                if stock_data is None:
-                    st.warning(f"No data returned for {symbol} with interval {interval}. Skipping...")
-                    continue
-
-                # Calculate ATR and clean up the DataFrame
-                stock_data = calculate_atr(stock_data)
-                columns_to_remove = ['symbol', 'tr1', 'tr2', 'tr3', 'previous_close']
-                stock_data = stock_data.drop(columns=columns_to_remove, errors='ignore')
-                stock_data = stock_data.round(2)
-
-                #st.write(candle_behinde_legin_check_allowed , whitearea_check_allowed)
-                patterns = find_patterns(symbol, stock_data, interval_key, max_base_candles, scan_demand_zone_allowed, scan_supply_zone_allowed,reward_value,fresh_zone_allowed,target_zone_allowed,stoploss_zone_allowed,candle_behinde_legin_check_allowed , whitearea_check_allowed, legout_formation_check_allowed,wick_in_legin_allowed,time_validation_allowed,legin_tr_atr_check_allowed,one_legout_count_allowed,three_legout_count_allowed,legout_covered_check_allowed,one_two_ka_four_check_allowed, htf_interval,user_input_zone_distance)
-
-                if patterns:
-                    any_patterns_found = True  # Set the flag if patterns are found
-                    patterns_found.extend(patterns)  # Collect found patterns
-
-            except Exception as e:
-                st.error(f"Error processing {symbol} with interval {interval}: {e}")
-                continue  # Handle exceptions as needed
-
-    progress_bar.progress(1.0)
+        tasks.extend((exchange, symbol, idx) for idx in range(len(intervals)))
+
+    # The scan runs as a background job; this script only polls it, so widget
+    # clicks no longer throw the scan away
+    fetch_scan_task, detect_scan_batch, pipeline_kwargs = make_scan_stages(scan_spec)
+    scan_job = start_job('old_app', scan_spec, tasks, fetch_scan_task, detect_scan_batch,
+                         version=CHECKPOINT_VERSION, **pipeline_kwargs)
+    st.session_state['scan_job_id'] = scan_job.job_id
+
+scan_job = get_job(st.session_state.get('scan_job_id'))
+
+# Scans interrupted by a cancel or a server restart can pick up where their
+# checkpoint stopped
+if scan_job is None or not scan_job.running:
+    for job_id, meta, done in list_checkpoints('old_app', CHECKPOINT_VERSION):
+        col1, col2 = st.columns([4, 1])
+        if col1.button(f"▶️ Resume scan {job_id} ({done}/{len(meta['tasks'])} scans done)", key=f"resume_{job_id}"):
+            scan_job = resume_job(job_id, make_scan_stages)
+            st.session_state['scan_job_id'] = scan_job.job_id
+        elif col2.button("🗑️ Discard", key=f"discard_{job_id}"):
+            discard_checkpoint(job_id)
+            st.rerun()
+
+if scan_job is not None and scan_job.running:
+    done, total = scan_job.progress()
+    st.progress(done / max(total, 1))
+    st.text(f"🔍 Scanning Zones: {done} of {total} scans analyzed")
+
+    # Live view while the job runs: running status counts plus a growing table
+    live_batches = [zones for task, (state, zones) in scan_job.ordered_results() if state == 'ok' and len(zones)]
+    live_counts = status_counts(live_batches)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Scanned", f"{done}/{total}")
+    c2.metric("Fresh", live_counts['Fresh'])
+    c3.metric("Target", live_counts['Target'])
+    c4.metric("Stop loss", live_counts['Stop loss'])
+    if live_batches:
+        st.dataframe(zones_frame(live_batches)[LIVE_COLUMNS])
+
+    if st.button("⛔ Cancel scan"):
+        scan_job.cancel()
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
+
+if scan_job is not None and not scan_job.running:
+    scan_spec = scan_job.spec
+    interval_key = scan_spec['selected_intervals'][-1] if scan_spec['selected_intervals'] else None
+    patterns_found = []
+    for (exchange, symbol, idx), (state, payload) in scan_job.ordered_results():
+        if state == 'error':
+            st.error(f"Error processing {symbol} with interval {scan_spec['intervals'][idx]}: {payload}")
+        elif state == 'no_data':
+            st.warning(f"No data returned for {symbol} with interval {scan_spec['intervals'][idx]}. Skipping...")
+        else:
+            patterns_found.append(payload)  # Collect found zones
+
+    if scan_job.status == 'cancelled':
+        done, total = scan_job.progress()
+        st.warning(f"Scan cancelled after {done} of {total} scans; it can be resumed above.")
+    elif scan_job.status == 'failed':
+        st.error(f"Scan failed: {scan_job.error}")
+
     if not interval_key:
         st.info("Please select atleast one time frame.")
-    elif patterns_found:
-        my_patterns_df = pd.DataFrame(patterns_found).drop_duplicates(subset=['entryPrice', 'stopLoss'], keep=False)
-        if wick_in_legin_allowed:
-           my_patterns_df = my_patterns_df[my_patterns_df['isWickInLegin'] != "False"]
+    elif any(len(zones) for zones in patterns_found):
+        if scan_spec['pattern_params']['wick_in_legin_allowed']:
+           patterns_found = with_flag(patterns_found, 'isWickInLegin')
+        # One zone per overlapping cluster (across base counts and timeframes)
+        merged_zones = merge_overlapping(patterns_found)
+        my_patterns_df = zones_frame(merged_zones)
         patterns_df = my_patterns_df.sort_values(by='zoneDistance', ascending=True).reset_index(drop=True)
 
         # Calculate and display elapsed time
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        st.success(f"🔍 Scanning completed in {elapsed_time:.2f} seconds for {days_back} calendar days, which have {trading_days_count} trading days.")
+        elapsed_time = scan_job.finished - scan_job.started
+        st.success(f"🔍 Scanning completed in {elapsed_time:.2f} seconds for {scan_spec['days_back']} calendar days, which have {scan_spec['trading_days_count']} trading days.")
 
 
         # Summary of zone counts
@@ -1344,7 +718,11 @@ if find_patterns_button:
         tab1, tab2 = st.tabs(["📁 Zone Data", "📈 Zone Chart"])
         with tab1:
             st.markdown("**Table View**")
-            st.dataframe(patterns_df.drop(columns=[ 'closePrice', 'exitIndex', 'entryIndex','ohlcData', 'Pulse_and_trend'], errors='ignore'))
+            table_df = patterns_df.drop(columns=[ 'closePrice', 'exitIndex', 'entryIndex', 'leginIndex', 'legoutIndex', 'ohlcRef', 'zoneId', 'flags', 'Pulse_and_trend'], errors='ignore')
+            st.dataframe(table_df)
+            # Input for the tick alert engine (python zone_alerts.py --zones zones.pkl)
+            st.download_button("Download zones for price alerts", pickle.dumps(merged_zones),
+                               file_name="zones.pkl", mime="application/octet-stream")
 
         
         with tab2:
@@ -1352,252 +730,62 @@ if find_patterns_button:
             st.markdown("**Chart View**")
 
             if not patterns_df.empty:
-                for index, row in patterns_df.iterrows():
-                    symbol_name = row['Symbol']
-                    ohlc_data = row['ohlcData']
-                    leginDate = row['leginDate']  # Ensure these fields exist in your DataFrame
-                    legoutDate = row['legoutDate']
-                    baseCount = row['baseCount']
-                    entryPrice = row['entryPrice']
-                    stopLoss = row['stopLoss']
-                    Minimum_target = round(row['Target'],2)
-                    ltf_time_frame = row['timeFrame']  # Make sure 'interval' is defined
-                    pattern_name = row['zoneType']  
-                    zoneStatus = row['zoneStatus']
-                    white_area = row  ['isWhiteArea']
-                    legin_covered = row['legoutNotCovered']
-                    legout_formation = row ['isLegoutFormation']
-                    wick_in_legin = row['isWickInLegin']
-                    time_validated_pass = row ['isTimeValidationPass']
-                    legin_tr_check = row ['isLeginTrPass']
-                    legout_covered = row['isLegoutCovered']
-                    
-                    # Filter out non-trading dates
-                    ohlc_data = ohlc_data.dropna(subset=['Open', 'High', 'Low', 'Close'])
-
-                    hover_text = [
-                        f"Open: {row['Open']}<br>" +
-                        f"High: {row['High']}<br>" +
-                        f"Low: {row['Low']}<br>" +
-                        f"Close: {row['Close']}<br>" +
-                        f"TR: {row['TR']}<br>" +
-                        f"ATR: {row['ATR']}<br>" +
-                        f"Body: {row['Candle_Body']}<br>" +
-                        f"Range: {row['Candle_Range']}"
-                        for _, row in ohlc_data.iterrows()
-                    ]
-
-                    # Create a candlestick chart
-                    fig = go.Figure(data=[go.Candlestick(
-                        x=ohlc_data.index,
-                        open=ohlc_data['Open'],
-                        high=ohlc_data['High'],
-                        low=ohlc_data['Low'],
-                        close=ohlc_data['Close'],
-                        name=symbol_name,
-                        increasing_line_color='#26a69a',  # Set increasing line color
-                        decreasing_line_color='#ef5350',  # Set decreasing line color
-                        increasing_fillcolor='#26a69a',   # Set increasing fill color
-                        decreasing_fillcolor='#ef5350',   # Set decreasing fill color
-                        line_width=1,  # Set line thickness
-                        hovertext=hover_text,  # Set custom hover text
-                        hoverinfo='text'  # Show only custom hover text
-                    )])
-                    try:
-                        legout_candle_index = ohlc_data.index.get_loc(legoutDate)
-                    except KeyError:
-                        legout_candle_index = None  # Handle the case where legoutDate is not found
-
-                    # Determine shape_start based on leginDate
-                    try:
-                        shape_start = ohlc_data.index[ohlc_data.index.get_loc(leginDate)]
-                    except KeyError:
-                        if legout_candle_index is not None:
-                            shape_start = legout_candle_index - baseCount
-                        else:
-                            shape_start = None  # Handle the case where both dates are not found
-
-                    shape_end = ohlc_data.index[-1]
-
-                    # Add the rectangle shape based on pattern type
-                    if pattern_name in ['DZ(RBR)', 'DZ(DBR)']:
-                        fill_color = "green"
-                    elif pattern_name in ['SZ(DBD)', 'SZ(RBD)']:
-                        fill_color = "red"
-
-                    # Add the rectangle shape if shape_start is valid
-                    if shape_start is not None:
-                        fig.add_shape(
-                            type="rect",
-                            xref="x",
-                            yref="y",
-                            x0=shape_start,
-                            y0=stopLoss,
-                            x1=shape_end,
-                            y1=entryPrice,
-                            fillcolor=fill_color,
-                            opacity=0.2,
-                            layer="below",
-                            line=dict(width=0),
-                        )                    
-                    # Add a horizontal line for Minimum_target
-                    fig.add_shape(
-                        type="line",
-                        x0=ohlc_data.index[0],  # Start at the first index of the OHLC data
-                        y0=Minimum_target,
-                        x1=shape_end,
-                        y1=Minimum_target,
-                        line=dict(color="lightgreen", width=2, dash="dash"),  # Set color to light green
-                    )
-                    # Add Target text label
-                    fig.add_annotation(
-                        x=shape_end,  # Position the label at shape_end
-                        y=Minimum_target,  # Align with the Minimum_target line
-                        text=f'Target: ₹ {Minimum_target}',  # Text for the label
-                        showarrow=True,
-                        arrowhead=2,
-                        ax=-10,  # Adjust x position
-                        ay=-10,  # Adjust y position
-                        font=dict(size=10, color='black'),
-                        bgcolor='white',
-                        bordercolor='lightgreen',
-                        borderwidth=1,
-                        borderpad=4
-                    )                    
-                    if pattern_name in ['SZ(RBD)', 'SZ(DBD)']:                    
-                       fixed_distance = 0.5  # Adjust this value as needed
-                       # Add text annotations for entryPrice and stopLoss
-                       fig.add_annotation(
-                           x=shape_end,
-                           y=stopLoss + fixed_distance,
-                           text=f'Stop Loss: ₹ {stopLoss}',
-                           showarrow=True,
-                           arrowhead=2,
-                           ax=10,
-                           ay=-10,
-                           font=dict(size=10, color='black'),
-                           bgcolor='white',
-                           bordercolor='red',  # Added border color for better contrast
-                           borderwidth=1,  # Added border width
-                           borderpad=4                        
-                       )
-
-                       fig.add_annotation(
-                           x=shape_end,
-                           y=entryPrice,
-                           text=f'Entry: ₹ {entryPrice}',
-                           showarrow=True,
-                           arrowhead=2,
-                           ax=10,
-                           ay=10,
-                           font=dict(size=10, color='black'),
-                           bgcolor='white',
-                           bordercolor='green',  # Added border color for better contrast
-                           borderwidth=1,  # Added border width
-                           borderpad=4                        
-                        
-                       )
-                    else:
-                       fixed_distance = 0.5  # Adjust this value as needed
-                       # Add text annotations for entryPrice and stopLoss
-                       fig.add_annotation(
-                           x=shape_end,
-                           y=entryPrice,
-                           text=f'Entry: ₹ {entryPrice}',
-                           showarrow=True,
-                           arrowhead=2,
-                           ax=10,
-                           ay=-10,
-                           font=dict(size=10, color='black'),
-                           bgcolor='white',
-                           bordercolor='green',  # Added border color for better contrast
-                           borderwidth=1,  # Added border width
-                           borderpad=4                        
-                       )
-
-                       fig.add_annotation(
-                           x=shape_end,
-                           y=stopLoss + fixed_distance,
-                           text=f'Stop Loss: ₹ {stopLoss}',
-                           showarrow=True,
-                           arrowhead=2,
-                           ax=10,
-                           ay=10,
-                           font=dict(size=10, color='black'),
-                           bgcolor='white',
-                           bordercolor='red',  # Added border color for better contrast
-                           borderwidth=1,  # Added border width
-                           borderpad=4                        
-                        
-                       )    
-                    
-                    # Update layout to remove datetime from x-axis and enhance the chart
-                    fig.update_layout(
-                        title = (
-                            f'Chart: {symbol_name} ⎜ '
-                            f'{ltf_time_frame} ⎜'                            
-                            f'<span>{pattern_name} ⎜</span> '
-                            f'<span>zoneStatus:{zoneStatus}</span>'
-                        ),
-                        title_x=0.5,  # Center the title
-                        title_xanchor='center',  # Anchor the title to the center
-                        yaxis_title='Price',
-                        xaxis_rangeslider_visible=False,  # Hide the range slider
-                        xaxis_showgrid=False,  # Disable grid for cleaner look
-                        margin=dict(l=0, r=0, t=100, b=40),  # Adjust margins
-                        height=600,  # Set height for better presentation
-                        width=800,   # Set width for better presentation
-                        xaxis=dict(
-                            type='category',  # Set x-axis to category to avoid gaps
-                            tickvals=[],  # Clear tick values to stop displaying dates
-                            ticktext=[],  # Clear tick text to stop displaying dates
-                            fixedrange=False,  # Disable zooming on x-axis
-                            range=[0, 24],
-                            autorange=True
-                        ),
-                        yaxis=dict(
-                            autorange=True,
-                            fixedrange=True  # Disable zooming on y-axis
-                        ),
-                        dragmode='pan'  # Enable panning mode                  
-                    )
-
-                    # Add styled header annotation with increased y position
-                    header_text = (
-                            f"<span style='padding-right: 20px;'><b> baseCount:</b> {baseCount}⎜</span>"
-                            f"<span style='padding-right: 20px;'><b> legoutDate:</b> {legoutDate}⎜</span>" 
-                            f"<span style='padding-right: 20px;'><b>isWhiteArea:</b>{white_area} ⎜</span> "
-                            f"<span style='padding-right: 20px;'><b> leginNotCovered:</b>{legin_covered}</span> <br>"
-                            f"<span style='padding-right: 20px;'><b> legoutFormation:</b>{legout_formation} ⎜</span> "
-                            f"<span style='padding-right: 20px;'><b>isWickInLegin:</b>{wick_in_legin} ⎜</span> "
-                            f"<span style='padding-right: 20px;'><b> leginTrCheck:</b>{legin_tr_check} ⎜</span> "
-                            f"<span style='padding-right: 20px;'><b>isLegoutCovered:</b>{legout_covered} ⎜</span> "
-                            f"<span style='padding-right: 20px;'><b>isTimeValidation:</b>{time_validated_pass}</span>    "                
-                    )
-
-                    fig.add_annotation(
-                        x=0.5,
-                        y=1.1,  # Increased y position for more space
-                        text=header_text,
-                        showarrow=False,
-                        align='center', 
-                        xref='paper',
-                        yref='paper',
-                        font=dict(size=14, color='black'),
-                        bgcolor='rgba(255, 255, 255, 0.8)',  # Light background for header
-                        borderpad=4,
-                        width=800,
-                        height=50,
-                        valign='middle'
-                    )
-                            
-                    # Display the chart in Streamlit 
-                    st.plotly_chart(fig)
-                    if (index + 1) % 5 == 0:
-                        time.sleep(5)  # Sleep for 5 seconds                    
+                # Charts are built only for the zones picked in the grid (or the
+                # page opened below) and are cached by zone id across reruns
+                grid_df = table_df.assign(rowId=range(len(patterns_df)))
+                grid_builder = GridOptionsBuilder.from_dataframe(grid_df)
+                grid_builder.configure_selection('multiple', use_checkbox=True)
+                grid_builder.configure_pagination(paginationAutoPageSize=False, paginationPageSize=CHART_PAGE_SIZE)
+                grid_builder.configure_column('rowId', hide=True)
+                grid = AgGrid(grid_df, gridOptions=grid_builder.build(),
+                              update_mode=GridUpdateMode.SELECTION_CHANGED, key=f"zone_grid_{scan_job.job_id}")
+
+                selected_rows = grid_selection(grid)
+                chart_zoom = st.radio("Chart range", [ZOOM_ZONE, ZOOM_FULL], horizontal=True)
+                if selected_rows:
+                    chart_rows = [int(selected['rowId']) for selected in selected_rows]
+                else:
+                    page_count = math.ceil(len(patterns_df) / CHART_PAGE_SIZE)
+                    chart_page = st.number_input(f"Chart page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+                    chart_rows = range((chart_page - 1) * CHART_PAGE_SIZE, min(chart_page * CHART_PAGE_SIZE, len(patterns_df)))
+
+                series_store = get_series_store()
+                for index in chart_rows:
+                    row = patterns_df.iloc[index]
+                    window = series_store.window(row['ohlcRef'])
+                    if window is None:
+                        st.warning(f"Chart data for {row['Symbol']} ({row['timeFrame']}) is no longer available; scan again to chart it.")
+                        continue
+                    series = series_store.get(row['ohlcRef'][0]) if chart_zoom == ZOOM_FULL else None
+                    # Display the chart in Streamlit
+                    st.plotly_chart(zone_chart(row, window, series, chart_zoom))
 
     else:
         st.info("No patterns found for the selected symbols and intervals.")
-            
-    progress_bar.empty()
-    progress_text.empty()   
+
+# ---------------- AUTO RESCAN ---------------- #
+# Nothing new can be found before a candle closes, so instead of rescanning
+# every timeframe on a timer, only the (symbol, timeframe) pairs whose candle
+# just closed are scanned again; the others keep their results.
+if scan_job is not None and scan_job.status == 'done':
+    nse_only = all(task[0] in NSE_EXCHANGES for task in scan_job.tasks)
+    auto_rescan = st.checkbox("🔁 Rescan each time frame when its candle closes", key="auto_rescan", disabled=not nse_only)
+    if auto_rescan and nse_only:
+        selected = scan_job.spec['selected_intervals']
+        job_scheduler = st.session_state.get('candle_scheduler')
+        if job_scheduler is None or job_scheduler[0] != scan_job.job_id:
+            job_scheduler = (scan_job.job_id, CandleScheduler(selected, pd.Timestamp(scan_job.started, unit='s', tz='UTC'), nse_holiday_dates))
+        scheduler = job_scheduler[1]
+        closed = scheduler.due()
+        if closed:
+            fetch_scan_task, detect_scan_batch, pipeline_kwargs = make_scan_stages(scan_job.spec)
+            due = due_tasks(scan_job.tasks, lambda task: selected[task[2]], closed)
+            scan_job = rescan_job(scan_job, due, fetch_scan_task, detect_scan_batch, **pipeline_kwargs)
+            st.session_state['scan_job_id'] = scan_job.job_id
+            st.session_state['candle_scheduler'] = (scan_job.job_id, scheduler)
+            st.rerun()
+        st.session_state['candle_scheduler'] = (scan_job.job_id, scheduler)
+        next_run, next_intervals = scheduler.next_due()
+        st.caption(f"Next rescan {next_run:%a %d %b %H:%M} IST for {', '.join(next_intervals)}")
+        time.sleep(min(max((next_run - pd.Timestamp.now(tz=next_run.tz)).total_seconds(), 1), RESCAN_POLL_SECONDS))
+        st.rerun()
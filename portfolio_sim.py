@@ -0,0 +1,206 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Portfolio view of zone_backtest's trades. Per-zone outcomes assume every
+# zone is traded with unlimited capital; here the entries and exits of all
+# symbols are replayed on one clock against one account:
+#   - each entry risks risk_fraction of the equity at that moment (the stop
+#     is the zone's far edge), capped by max_position_fraction of the equity
+#     and by the cash not already tied up in open positions;
+#   - no more than max_positions are open at once (and, by default, one per
+#     symbol); an entry that does not fit is skipped;
+#   - a Target / Stop loss exit returns the capital and books R x risk;
+#   - the trades table has no price path, so an open position is marked at
+#     its worst excursion (mae x risk) from entry until it exits. 'equity'
+#     is that marked equity (the drawdown is measured on it); sizing and
+#     'realizedEquity' only count closed trades.
+# Events are kept as parallel arrays (time, kind, trade) and ordered once;
+# the only per-event work is the account update itself.
+#   python zone_backtest.py --period 5y --trades trades.parquet
+#   python portfolio_sim.py trades.parquet --capital 1000000 --max-positions 10
+
+EXIT, ENTRY = 0, 1  # on the same bar, exits free their slot before new entries
+
+SKIP_REASONS = ('', 'maxPositions', 'symbolOpen', 'noCash', 'tooSmall')
+TAKEN, MAX_POSITIONS, SYMBOL_OPEN, NO_CASH, TOO_SMALL = range(len(SKIP_REASONS))
+
+EQUITY_COLUMNS = ['equity', 'realizedEquity', 'cash', 'openPositions']
+NAT = np.iinfo(np.int64).min  # NaT as int64 nanoseconds
+
+
+def _time_ns(values):
+    times = pd.DatetimeIndex(values)
+    if times.tz is not None:
+        times = times.tz_convert('UTC').tz_localize(None)
+    return times.as_unit('ns').asi8
+
+
+def trade_events(trades):
+    # (time, kind, trade) arrays over every entered trade, in processing order:
+    # by time, exits before entries, then in the order of the trades table.
+    # A trade that exits on its entry bar gets no exit event; it is settled
+    # as soon as it is entered.
+    entry_times = _time_ns(trades['entryTime'])
+    exit_times = _time_ns(trades['exitTime'])
+    entered = np.flatnonzero(entry_times != NAT)
+    entry_times, exit_times = entry_times[entered], exit_times[entered]
+    exits = (exit_times != NAT) & (exit_times != entry_times)
+
+    times = np.concatenate([entry_times, exit_times[exits]])
+    kinds = np.concatenate([np.full(len(entered), ENTRY, dtype=np.int8), np.full(int(exits.sum()), EXIT, dtype=np.int8)])
+    rows = np.concatenate([entered, entered[exits]])
+    order = np.lexsort((rows, kinds, times))
+    return times[order], kinds[order], rows[order]
+
+
+def simulate(trades, capital=1_000_000, risk_fraction=0.01, max_positions=10, max_position_fraction=0.2,
+             one_per_symbol=True, cost_fraction=0.0):
+    # trades: zone_backtest.zone_trades / backtest output. Returns the trades
+    # with the portfolio's decision per row (quantity, pnl, skipReason) and
+    # the equity curve after every event time.
+    trades = trades.reset_index(drop=True)
+    times, kinds, rows = trade_events(trades)
+
+    demand = trades['zoneType'].str.startswith('DZ').to_numpy()
+    top = trades['entryPrice'].to_numpy(dtype=float)
+    bottom = trades['stopLoss'].to_numpy(dtype=float)
+    fill = np.where(demand, top, bottom).tolist()  # demand buys the top, supply sells the bottom
+    risk = (top - bottom).tolist()
+    r_multiple = np.nan_to_num(trades['R'].to_numpy(dtype=float)).tolist()
+    worst = np.clip(np.nan_to_num(trades['mae'].to_numpy(dtype=float)), 0, None).tolist()
+    closes = (trades['exitTime'].notna() & (trades['exitTime'] == trades['entryTime'])).to_numpy().tolist()
+    symbols = pd.factorize(trades['Symbol'])[0].tolist()
+
+    quantity = [0] * len(trades)
+    pnl = [0.0] * len(trades)
+    skipped = [-1] * len(trades)  # -1: never entered
+    marks = [0.0] * len(trades)  # open loss an entered trade is marked at
+    curve_equity = np.empty(len(times))
+    curve_realized = np.empty(len(times))
+    curve_cash = np.empty(len(times))
+    curve_open = np.empty(len(times), dtype=np.int64)
+
+    equity = float(capital)
+    cash = float(capital)
+    holding = set()
+    open_count = 0
+    open_loss = 0.0
+    for n, (kind, row) in enumerate(zip(kinds.tolist(), rows.tolist())):
+        if kind == EXIT:
+            if skipped[row] == TAKEN:
+                notional = quantity[row] * fill[row]
+                gain = quantity[row] * risk[row] * r_multiple[row] - notional * cost_fraction
+                equity += gain
+                cash += notional + gain
+                pnl[row] += gain
+                open_count -= 1
+                open_loss = open_loss - marks[row] if open_count else 0.0
+                holding.discard(symbols[row])
+        else:
+            reason = TAKEN
+            size = 0
+            if open_count >= max_positions:
+                reason = MAX_POSITIONS
+            elif one_per_symbol and symbols[row] in holding:
+                reason = SYMBOL_OPEN
+            elif risk[row] > 0 and fill[row] > 0:
+                budget = min(equity * max_position_fraction, cash / (1 + cost_fraction))
+                size = int(min(equity * risk_fraction / risk[row], budget / fill[row]))
+                if size <= 0:
+                    reason = NO_CASH if cash < fill[row] else TOO_SMALL
+            else:
+                reason = TOO_SMALL
+            skipped[row] = reason
+            if reason == TAKEN:
+                quantity[row] = size
+                notional = size * fill[row]
+                fee = notional * cost_fraction
+                equity -= fee
+                cash -= notional + fee
+                pnl[row] = -fee
+                if closes[row]:  # exited on the entry bar
+                    gain = size * risk[row] * r_multiple[row] - notional * cost_fraction
+                    equity += gain
+                    cash += notional + gain
+                    pnl[row] += gain
+                else:
+                    open_count += 1
+                    marks[row] = size * risk[row] * worst[row]
+                    open_loss += marks[row]
+                    holding.add(symbols[row])
+        curve_equity[n] = equity - open_loss
+        curve_realized[n] = equity
+        curve_cash[n] = cash
+        curve_open[n] = open_count
+
+    result = trades.copy()
+    result['quantity'] = quantity
+    result['pnl'] = pnl
+    result['skipReason'] = [SKIP_REASONS[code] if code >= 0 else None for code in skipped]
+    index = pd.DatetimeIndex(times.view('datetime64[ns]'), name='time')
+    tz = pd.DatetimeIndex(trades['entryTime']).tz
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    curve = pd.DataFrame(dict(zip(EQUITY_COLUMNS, (curve_equity, curve_realized, curve_cash, curve_open))), index=index)
+    curve = curve[~curve.index.duplicated(keep='last')]
+    return result, curve
+
+
+def portfolio_stats(result, curve, capital=1_000_000):
+    taken = result[result['skipReason'] == SKIP_REASONS[TAKEN]]
+    closed = taken[taken['zoneStatus'].isin(['Target', 'Stop loss'])]
+    # equity marks open positions at their worst excursion; realized does not
+    equity = curve['equity'].to_numpy() if len(curve) else np.array([float(capital)])
+    realized = curve['realizedEquity'].to_numpy() if len(curve) else equity
+    peak = np.maximum.accumulate(np.maximum(equity, capital))
+    stats = {
+        'startEquity': float(capital),
+        'endEquity': float(equity[-1]),
+        'endRealizedEquity': float(realized[-1]),
+        'returnPct': (equity[-1] / capital - 1) * 100,
+        'maxDrawdownPct': float(((peak - equity) / peak).max() * 100),
+        'signals': int(result['skipReason'].notna().sum()),
+        'taken': len(taken),
+        'stillOpen': len(taken) - len(closed),
+        'winRate': (closed['zoneStatus'] == 'Target').mean() * 100 if len(closed) else np.nan,
+        'maxOpenPositions': int(curve['openPositions'].max()) if len(curve) else 0,
+    }
+    for reason in SKIP_REASONS[1:]:
+        stats[f'skipped_{reason}'] = int((result['skipReason'] == reason).sum())
+    return stats
+
+
+# ---------------- CLI ---------------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate one account trading zone_backtest's trades.")
+    parser.add_argument("trades", help="trades .csv / .parquet written by zone_backtest.py --trades")
+    parser.add_argument("--capital", type=float, default=1_000_000)
+    parser.add_argument("--risk", type=float, default=0.01, help="fraction of equity risked per trade")
+    parser.add_argument("--max-positions", type=int, default=10)
+    parser.add_argument("--max-position", type=float, default=0.2, help="largest position as a fraction of equity")
+    parser.add_argument("--allow-pyramiding", action="store_true", help="allow several open trades per symbol")
+    parser.add_argument("--cost", type=float, default=0.0, help="cost per side as a fraction of the notional")
+    parser.add_argument("--equity", default=None, help="write the equity curve to this .csv")
+    parser.add_argument("--output", default=None, help="write the trades with the portfolio's decisions to this .csv")
+    args = parser.parse_args(argv)
+
+    if args.trades.endswith(".parquet"):
+        trades = pd.read_parquet(args.trades)
+    else:
+        trades = pd.read_csv(args.trades, parse_dates=['legoutTime', 'entryTime', 'exitTime'])
+    result, curve = simulate(trades, args.capital, args.risk, args.max_positions, args.max_position,
+                             not args.allow_pyramiding, args.cost)
+    for name, value in portfolio_stats(result, curve, args.capital).items():
+        print(f"{name:>24}: {value:,.2f}" if isinstance(value, float) else f"{name:>24}: {value}")
+    if args.equity:
+        curve.to_csv(args.equity)
+    if args.output:
+        result.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Process-wide cache of per-symbol scan results. An entry is keyed by
+# (symbol, timeframe, parameter hash, engine version) and remembers the time of
+# the last bar it was computed from:
+#   - until that bar's candle closes, the entry is served without fetching
+#     anything;
+#   - after that the symbol is fetched again, and if the last bar time has not
+#     moved (market closed, provider lag) detection is still skipped, unless
+#     the entry was computed while that bar was still forming;
+#   - once the OHLCV tail advances the entry is recomputed and replaced.
+
+MAX_ENTRIES = 5000
+
+
+def params_hash(params):
+    text = repr(sorted(params.items()))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def cache_key(symbol, timeframe, params, engine_version):
+    return (symbol, timeframe, params_hash(params), engine_version)
+
+
+def next_candle_close(last_bar_time, bar_duration):
+    # Providers stamp bars with their open time and usually include the
+    # forming bar, so a newer candle can have closed once one duration passed
+    return last_bar_time + bar_duration
+
+
+def _now_like(timestamp):
+    return pd.Timestamp.now(tz=timestamp.tz)
+
+
+class CachedResult:
+    # Stands in for fetched data when the cache already has the answer
+    def __init__(self, result):
+        self.result = result
+
+
+class ScanCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (last_bar_time, expires, final, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def fresh(self, key):
+        # Result still valid by the clock alone, or None
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None and _now_like(entry[1]) < entry[1]:
+                self.hits += 1
+                return entry[3]
+        return None
+
+    def get(self, key, last_bar_time):
+        # Result computed from the same last bar, or None
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None and entry[0] == last_bar_time and (entry[2] or _now_like(entry[1]) < entry[1]):
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+        return None
+
+    def put(self, key, last_bar_time, expires, result, fetched_at=None):
+        # expires: when the last bar's candle closes (see next_candle_close);
+        # a result from data fetched after that is final for this last bar
+        final = (fetched_at if fetched_at is not None else _now_like(expires)) >= expires
+        with self._lock:
+            self._entries[key] = (last_bar_time, expires, final, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cached_stages(fetch, detect, cache, key_for, candle_close_for):
+    # Wrap a scan's fetch / detect stages (see scan_pipeline.run_pipeline) so
+    # that cached symbols skip the fetch, the detection, or both.
+    # key_for(task) -> cache key; candle_close_for(task, last_bar_time) -> the
+    # time that bar's candle closes
+    def cached_fetch(task):
+        result = cache.fresh(key_for(task))
+        if result is not None:
+            return CachedResult(result)
+        data = fetch(task)
+        if data is not None:
+            data.attrs['fetched_at'] = pd.Timestamp.now(tz='UTC')
+        return data
+
+    def cached_detect(batch):
+        results = [None] * len(batch)
+        pending = []
+        for n, (task, data) in enumerate(batch):
+            if isinstance(data, CachedResult):
+                results[n] = data.result
+                continue
+            result = cache.get(key_for(task), data.index[-1])
+            if result is not None:
+                results[n] = result
+            else:
+                pending.append(n)
+
+        if pending:
+            computed = detect([batch[n] for n in pending])
+            for n, result in zip(pending, computed):
+                task, data = batch[n]
+                cache.put(key_for(task), data.index[-1], candle_close_for(task, data.index[-1]), result,
+                          data.attrs.get('fetched_at'))
+                results[n] = result
+        return results
+
+    return cached_fetch, cached_detect
@@ -0,0 +1,199 @@
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+
+from scan_pipeline import run_pipeline
+
+# Background scan jobs. A job runs the scan pipeline on its own thread and is
+# kept in a process-wide registry, so Streamlit reruns (any widget click) only
+# poll it instead of killing it. Every finished task is appended to an on-disk
+# checkpoint, which lets an interrupted scan resume after a restart.
+# A job carries the version of its result format (e.g. the engine and
+# record versions); checkpoints written under another version are discarded
+# rather than offered for resume, since their results no longer fit.
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_checkpoints")
+FINISHED_JOB_TTL_SECONDS = 3600
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class ScanJob:
+    def __init__(self, job_id, kind, spec, tasks, completed=None, checkpoint_dir=CHECKPOINT_DIR, version=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.spec = spec
+        self.version = version
+        self.tasks = list(tasks)
+        self.results = dict(completed or {})  # task -> (state, payload)
+        self.status = "running"
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._path = os.path.join(checkpoint_dir, job_id)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    def progress(self):
+        with self._lock:
+            return len(self.results), len(self.tasks)
+
+    def ordered_results(self):
+        # Results in task order (not completion order) for stable output
+        with self._lock:
+            return [(task, self.results[task]) for task in self.tasks if task in self.results]
+
+    def cancel(self):
+        self._cancel.set()
+
+    # ---------------- CHECKPOINT ---------------- #
+    def _write_meta(self):
+        os.makedirs(self._path, exist_ok=True)
+        meta = {"job_id": self.job_id, "kind": self.kind, "spec": self.spec, "version": self.version,
+                "tasks": self.tasks, "status": self.status, "started": self.started}
+        tmp = os.path.join(self._path, "meta.pkl.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(meta, f)
+        os.replace(tmp, os.path.join(self._path, "meta.pkl"))
+
+    # ---------------- RUN ---------------- #
+    def _run(self, fetch, detect, keep, pipeline_kwargs):
+        remaining = [task for task in self.tasks if task not in self.results]
+        # The cancel event doubles as the pipeline's stop flag, so a cancel
+        # lands even while every worker is blocked on a slow fetch
+        scan = run_pipeline(remaining, fetch, detect, stop=self._cancel, **pipeline_kwargs)
+        try:
+            self._write_meta()
+            with open(os.path.join(self._path, "results.pkl"), "ab") as log:
+                for task, data, result, error in scan:
+                    if error is not None:
+                        entry = ("error", str(error))
+                    elif data is None:
+                        entry = ("no_data", None)
+                    else:
+                        entry = ("ok", keep(task, data, result))
+                    pickle.dump((task, entry), log)
+                    log.flush()
+                    with self._lock:
+                        self.results[task] = entry
+            self.status = "done" if len(self.results) == len(self.tasks) else "cancelled"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            scan.close()
+            self.finished = time.time()
+
+        if self.status == "done":
+            shutil.rmtree(self._path, ignore_errors=True)
+        else:
+            try:
+                self._write_meta()
+            except OSError:
+                pass
+
+
+def _keep_result(task, data, result):
+    return result
+
+
+# ---------------- REGISTRY ---------------- #
+def _prune():
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if not job.running and job.finished is not None and now - job.finished > FINISHED_JOB_TTL_SECONDS:
+            del _jobs[job_id]
+
+
+def start_job(kind, spec, tasks, fetch, detect, keep=_keep_result, job_id=None, completed=None, version=None,
+              **pipeline_kwargs):
+    # pipeline_kwargs go straight to run_pipeline (fetch_workers, batch_size, ...)
+    job = ScanJob(job_id or uuid.uuid4().hex[:12], kind, spec, tasks, completed, version=version)
+    with _jobs_lock:
+        _prune()
+        running = _jobs.get(job.job_id)
+        if running is not None and running.running:
+            return running
+        _jobs[job.job_id] = job
+    job._thread = threading.Thread(target=job._run, args=(fetch, detect, keep, pipeline_kwargs),
+                                   name=f"scan-job-{job.job_id}", daemon=True)
+    job._thread.start()
+    return job
+
+
+def rescan_job(job, tasks, fetch, detect, keep=_keep_result, **pipeline_kwargs):
+    # A new job over the same task list that recomputes only `tasks` (e.g. the
+    # timeframes whose candle just closed) and keeps job's other results
+    redo = set(tasks)
+    with job._lock:
+        completed = {task: entry for task, entry in job.results.items() if task not in redo}
+    return start_job(job.kind, job.spec, job.tasks, fetch, detect, keep=keep,
+                     completed=completed, version=job.version, **pipeline_kwargs)
+
+
+def get_job(job_id):
+    if job_id is None:
+        return None
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def load_checkpoint(job_id, checkpoint_dir=CHECKPOINT_DIR):
+    path = os.path.join(checkpoint_dir, job_id)
+    with open(os.path.join(path, "meta.pkl"), "rb") as f:
+        meta = pickle.load(f)
+    completed = {}
+    try:
+        with open(os.path.join(path, "results.pkl"), "rb") as log:
+            while True:
+                task, entry = pickle.load(log)
+                completed[task] = entry
+    except FileNotFoundError:
+        pass
+    except (EOFError, pickle.UnpicklingError):
+        pass  # end of log, or a record cut short by a crash
+    return meta, completed
+
+
+def list_checkpoints(kind, version=None, checkpoint_dir=CHECKPOINT_DIR):
+    # Unfinished scans on disk that are not running in this process; those
+    # of this kind written under another result version are discarded
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    found = []
+    for job_id in sorted(os.listdir(checkpoint_dir)):
+        job = get_job(job_id)
+        if job is not None and job.running:
+            continue
+        try:
+            meta, completed = load_checkpoint(job_id, checkpoint_dir)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            continue
+        if meta["kind"] != kind:
+            continue
+        if meta.get("version") != version:
+            discard_checkpoint(job_id, checkpoint_dir)
+            continue
+        found.append((job_id, meta, len(completed)))
+    return found
+
+
+def resume_job(job_id, make_stages, keep=_keep_result, checkpoint_dir=CHECKPOINT_DIR):
+    # make_stages(spec) rebuilds (fetch, detect, pipeline_kwargs) from the saved spec
+    meta, completed = load_checkpoint(job_id, checkpoint_dir)
+    fetch, detect, pipeline_kwargs = make_stages(meta["spec"])
+    return start_job(meta["kind"], meta["spec"], meta["tasks"], fetch, detect, keep=keep,
+                     job_id=job_id, completed=completed, version=meta.get("version"), **pipeline_kwargs)
+
+
+def discard_checkpoint(job_id, checkpoint_dir=CHECKPOINT_DIR):
+    shutil.rmtree(os.path.join(checkpoint_dir, job_id), ignore_errors=True)
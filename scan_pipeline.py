@@ -0,0 +1,121 @@
+import queue
+import threading
+
+# Staged scan: I/O threads fetch (and prepare indicators) into a bounded queue,
+# detection threads drain it, and finished results are handed to the caller
+# (the Streamlit script thread) as they complete. The bounded queues keep only
+# a handful of frames in memory no matter how large the universe is.
+
+_DONE = object()
+_POLL_SECONDS = 0.2
+
+
+def _put(q, item, stop):
+    # Blocking put that still notices a cancelled scan
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(tasks, fetch, detect, fetch_workers=4, detect_workers=1, queue_size=16, batch_size=1, stop=None):
+    # fetch(task) -> data (None to skip); detect(list of (task, data)) -> results in the same order.
+    # Yields (task, data, result, error) in completion order; closing the
+    # generator (or setting `stop` from another thread) cancels the remaining work.
+    tasks = iter(tasks)
+    task_lock = threading.Lock()
+    fetched = queue.Queue(maxsize=queue_size)
+    results = queue.Queue(maxsize=queue_size)
+    stop = stop if stop is not None else threading.Event()
+    fetchers_left = [fetch_workers]
+    detectors_left = [detect_workers]
+    count_lock = threading.Lock()
+
+    def next_task():
+        with task_lock:
+            return next(tasks, _DONE)
+
+    def fetch_loop():
+        try:
+            while not stop.is_set():
+                task = next_task()
+                if task is _DONE:
+                    break
+                try:
+                    data = fetch(task)
+                except Exception as e:
+                    _put(results, (task, None, None, e), stop)
+                    continue
+                if data is None:
+                    _put(results, (task, None, None, None), stop)
+                    continue
+                if not _put(fetched, (task, data), stop):
+                    break
+        finally:
+            with count_lock:
+                fetchers_left[0] -= 1
+                last = fetchers_left[0] == 0
+            if last:
+                for _ in range(detect_workers):
+                    _put(fetched, _DONE, stop)
+
+    def detect_loop():
+        try:
+            while not stop.is_set():
+                item = _get(fetched, stop)
+                if item is _DONE:
+                    break
+                batch = [item]
+                finished = False
+                while len(batch) < batch_size:
+                    try:
+                        extra = fetched.get_nowait()
+                    except queue.Empty:
+                        break
+                    if extra is _DONE:
+                        finished = True
+                        break
+                    batch.append(extra)
+
+                try:
+                    for (task, data), result in zip(batch, detect(batch)):
+                        _put(results, (task, data, result, None), stop)
+                except Exception as e:
+                    for task, data in batch:
+                        _put(results, (task, data, None, e), stop)
+                if finished:
+                    break
+        finally:
+            with count_lock:
+                detectors_left[0] -= 1
+                last = detectors_left[0] == 0
+            if last:
+                _put(results, _DONE, stop)
+
+    threads = [threading.Thread(target=fetch_loop, name=f"scan-fetch-{n}", daemon=True) for n in range(fetch_workers)]
+    threads += [threading.Thread(target=detect_loop, name=f"scan-detect-{n}", daemon=True) for n in range(detect_workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = _get(results, stop)
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
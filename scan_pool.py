@@ -0,0 +1,112 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Process-pool backend for find_patterns. Each prepared OHLCV frame is copied
+# once into shared memory, workers only receive a small descriptor, and they
+# send back the compact zone records (zone_records.ZONE_DTYPE) for the symbol
+# instead of pickled pattern dicts.
+
+
+# ---------------- SHARED MEMORY ---------------- #
+def share_frame(stock_data):
+    # Layout: int64 UTC nanoseconds for the index, then float64 rows x columns
+    rows, columns = len(stock_data), list(stock_data.columns)
+    size = max(rows * 8 * (1 + len(columns)), 1)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+
+    times = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((rows, len(columns)), dtype=np.float64, buffer=shm.buf, offset=rows * 8)
+    times[:] = stock_data.index.as_unit('ns').asi8
+    values[:] = stock_data.to_numpy(dtype=np.float64)
+
+    tz = getattr(stock_data.index, 'tz', None)
+    descriptor = {'name': shm.name, 'rows': rows, 'columns': columns, 'tz': str(tz) if tz is not None else None}
+    return shm, descriptor
+
+
+def attach_frame(descriptor):
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+    try:
+        rows, columns = descriptor['rows'], descriptor['columns']
+        times = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf).copy()
+        values = np.ndarray((rows, len(columns)), dtype=np.float64, buffer=shm.buf, offset=rows * 8).copy()
+    finally:
+        shm.close()
+
+    index = pd.DatetimeIndex(times.view('datetime64[ns]'))
+    if descriptor['tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(descriptor['tz'])
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def release(shm):
+    try:
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+# ---------------- WORKERS ---------------- #
+def _warm_up():
+    # Pay the pandas / engine import once per worker, not per task
+    import zone_records  # noqa: F401
+
+
+def _find_zones_task(descriptor, symbol, interval_key, params):
+    from zone_engine import find_patterns
+    from zone_records import encode_zones
+
+    stock_data = attach_frame(descriptor)
+    return encode_zones(find_patterns(symbol, stock_data, interval_key, **params), stock_data)
+
+
+class DetectionPool:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._executor = None
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=get_context('spawn'),
+                    initializer=_warm_up,
+                )
+            return self._executor
+
+    def _submit(self, *args):
+        try:
+            return self._get_executor().submit(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool and retry once
+            with self._lock:
+                self._executor = None
+            return self._get_executor().submit(*args)
+
+    def submit_zones(self, symbol, stock_data, interval_key, params):
+        # Future of the zone records find_patterns yields for this frame
+        shm, descriptor = share_frame(stock_data)
+        try:
+            future = self._submit(_find_zones_task, descriptor, symbol, interval_key, params)
+        except Exception:
+            release(shm)
+            raise
+        future.add_done_callback(lambda _: release(shm))
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
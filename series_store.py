@@ -0,0 +1,136 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Process-wide store of the full OHLCV series behind scan results. Patterns
+# only hold an ohlcRef = (series id, start, end) and the chart window is cut
+# from the stored series when it is actually needed, so result memory grows
+# with the number of zones rather than with candles x indicator columns.
+# The least recently used series are spilled to disk instead of dropped.
+# A series id carries its last bar time, so every rescan of a symbol /
+# timeframe makes a new one: the spill files of superseded ids are deleted,
+# superseded series are not spilled at all, and the directory keeps at most
+# max_spilled files (oldest first out, including those of earlier runs).
+
+MAX_SERIES = 500
+MAX_SPILLED = 2000
+SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "series_cache")
+
+
+def series_id(symbol, timeframe, last_bar_time):
+    return f"{symbol}|{timeframe}|{last_bar_time.isoformat()}"
+
+
+def series_prefix(key):
+    # The symbol / timeframe part of a series id
+    return key.rsplit("|", 1)[0]
+
+
+class SeriesStore:
+    def __init__(self, max_series=MAX_SERIES, spill_dir=SPILL_DIR, max_spilled=MAX_SPILLED):
+        self.max_series = max_series
+        self.spill_dir = spill_dir
+        self.max_spilled = max_spilled
+        self._series = OrderedDict()
+        self._latest = {}  # series prefix -> newest series id seen
+        self._spilled = OrderedDict()  # spill file paths, oldest first
+        self._lock = threading.Lock()
+        if spill_dir is not None and os.path.isdir(spill_dir):
+            paths = [os.path.join(spill_dir, name) for name in os.listdir(spill_dir) if name.endswith(".pkl")]
+            for path in sorted(paths, key=_mtime):
+                self._spilled[path] = None
+            self._trim_spilled()
+
+    def _spill_path(self, key):
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.spill_dir, name + ".pkl")
+
+    def _spill(self, key, df):
+        if self.spill_dir is None:
+            return
+        path = self._spill_path(key)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(path, "wb") as f:
+                pickle.dump(df, f)
+        except OSError:
+            return
+        with self._lock:
+            self._spilled[path] = None
+            self._spilled.move_to_end(path)
+            self._trim_spilled()
+
+    def _trim_spilled(self):
+        while len(self._spilled) > self.max_spilled:
+            _remove(self._spilled.popitem(last=False)[0])
+
+    def _discard_spilled(self, key):
+        if self.spill_dir is None:
+            return
+        path = self._spill_path(key)
+        with self._lock:
+            self._spilled.pop(path, None)
+        _remove(path)
+
+    def _superseded(self, key):
+        latest = self._latest.get(series_prefix(key))
+        return latest is not None and key < latest
+
+    def put(self, key, df):
+        prefix = series_prefix(key)
+        with self._lock:
+            previous = self._latest.get(prefix)
+            if previous is None or key > previous:
+                self._latest[prefix] = key
+            else:
+                previous = None
+            self._series[key] = df
+            self._series.move_to_end(key)
+            evicted = []
+            while len(self._series) > self.max_series:
+                evicted.append(self._series.popitem(last=False))
+        if previous is not None:
+            self._discard_spilled(previous)
+        for old_key, old_df in evicted:
+            if not self._superseded(old_key):
+                self._spill(old_key, old_df)
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            df = self._series.get(key)
+            if df is not None:
+                self._series.move_to_end(key)
+                return df
+        if self.spill_dir is None:
+            return None
+        try:
+            with open(self._spill_path(key), "rb") as f:
+                df = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        self.put(key, df)
+        return df
+
+    def window(self, ref):
+        # Materialise the candles an ohlcRef points at, or None if unknown
+        key, start, end = ref
+        df = self.get(key)
+        return df.iloc[start:end] if df is not None else None
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
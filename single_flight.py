@@ -0,0 +1,75 @@
+import threading
+from concurrent.futures import Future
+
+# Process-wide single-flight: while a fetch or detection for a key is running,
+# identical requests from other sessions wait for it and share its result
+# instead of starting their own. Nothing is kept once the call finishes; the
+# scan cache is what remembers results.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future
+        self.shared = 0
+
+    def claim(self, key):
+        # -> (future, leader). The leader must call finish(key, ...) exactly once
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        with self._lock:
+            future = self._calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args):
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+
+def shared_stages(fetch, detect, flights, fetch_key_for, detect_key_for):
+    # Wrap a scan's fetch / detect stages (see scan_pipeline.run_pipeline) so
+    # identical in-flight work is done once per process.
+    # fetch_key_for(task) and detect_key_for(task, data) name the work.
+    def shared_fetch(task):
+        return flights.do(("fetch", fetch_key_for(task)), fetch, task)
+
+    def shared_detect(batch):
+        keys = [("detect", detect_key_for(task, data)) for task, data in batch]
+        claims = [flights.claim(key) for key in keys]
+        leading = [n for n, (_, leader) in enumerate(claims) if leader]
+
+        # Run our own share of the batch first, so two sessions waiting on
+        # each other's halves can never block each other
+        if leading:
+            try:
+                computed = detect([batch[n] for n in leading])
+            except BaseException as e:
+                for n in leading:
+                    flights.finish(keys[n], error=e)
+                raise
+            for n, result in zip(leading, computed):
+                flights.finish(keys[n], result)
+
+        return [future.result() for future, _ in claims]
+
+    return shared_fetch, shared_detect
@@ -0,0 +1,285 @@
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+from scan_pool import attach_frame, release, share_frame
+from zone_backtest import TRADE_COLUMNS, series_setups, setup_trades, trade_stats
+
+# Walk-forward tuning of the scanner's parameters. History is cut into
+# rolling windows (train_months of training followed by test_months of
+# testing); in every window each parameter set is scored on the train part,
+# the best one is picked, and all of them are scored on the test part, so
+# the report shows both the out-of-sample result of every parameter set and
+# that of picking one the way a user would.
+#
+# The grid is cheap because its axes do not need new scans:
+#   - a setup found with max_base_candles=k is also found with any larger
+#     value (the base candles are tried 1, 2, ... in turn), so the series is
+#     scanned once with the largest value and filtered by baseCount;
+#   - one_two_ka_four_check_allowed only raises the leg-in / base ratio from
+#     1.5x to 2x, which every setup already reports as isOneTwoKaFour;
+#   - reward_value only moves the target, so the setups are reused and only
+#     the entry / exit walk is repeated per value.
+# Each series is therefore prepared (ATR) and scanned once, in a worker
+# process, for the whole grid. Starting the spawn pool costs more than a
+# small universe takes to scan, so below PARALLEL_MIN_SERIES series (and
+# with no explicit worker count) everything runs in this process.
+#   python walk_forward.py --timeframes Daily --period 10y --train-months 24 --test-months 6
+
+GRID = {
+    'max_base_candles': [1, 2, 3, 4, 5],
+    'reward_value': [2, 3, 5],
+    'one_two_ka_four_check_allowed': [False, True],
+}
+GRID_COLUMNS = list(GRID)
+PARALLEL_MIN_SERIES = 100
+
+
+def grid_points(grid=GRID):
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+# ---------------- TRADES ---------------- #
+def grid_trades(symbol, interval_key, stock_data, grid=GRID):
+    # The trades of every grid point for one series, tagged with rewardValue.
+    # Times come out in ns whatever the index unit, like the frames workers
+    # get back from attach_frame, so serial and pooled runs concatenate alike
+    stock_data = stock_data.set_axis(stock_data.index.as_unit('ns'))
+    bars, setups = series_setups(stock_data, {'max_base_candles': max(grid['max_base_candles']),
+                                              'one_two_ka_four_check_allowed': False})
+    tables = [setup_trades(symbol, interval_key, stock_data, bars, setups, reward_value).assign(rewardValue=reward_value)
+              for reward_value in grid['reward_value']]
+    return pd.concat(tables, ignore_index=True)
+
+
+def _grid_trades_task(descriptor, symbol, interval_key, grid):
+    return grid_trades(symbol, interval_key, attach_frame(descriptor), grid)
+
+
+def submit_grid_trades(executor, symbol, interval_key, stock_data, grid=GRID):
+    # Future of grid_trades run in a worker; the frame travels through shared
+    # memory. With no executor it runs here and the future is already done
+    if executor is None:
+        future = Future()
+        try:
+            future.set_result(grid_trades(symbol, interval_key, stock_data, grid))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    shm, descriptor = share_frame(stock_data)
+    try:
+        future = executor.submit(_grid_trades_task, descriptor, symbol, interval_key, grid)
+    except Exception:
+        release(shm)
+        raise
+    future.add_done_callback(lambda _: release(shm))
+    return future
+
+
+def use_pool(workers, series):
+    # workers None: all cores, once the universe is big enough to pay for the pool
+    if workers is None:
+        return series >= PARALLEL_MIN_SERIES
+    return workers > 1
+
+
+def grid_executor(workers=None):
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=get_context('spawn'))
+
+
+def universe_grid_trades(frames, interval_key, grid=GRID, workers=None):
+    # frames: {symbol: OHLC frame prepared like old_app's (see zone_backtest.prepare)}
+    if not use_pool(workers, len(frames)):
+        found = [grid_trades(symbol, interval_key, df, grid) for symbol, df in frames.items()]
+    else:
+        with grid_executor(workers) as executor:
+            futures = [submit_grid_trades(executor, symbol, interval_key, df, grid) for symbol, df in frames.items()]
+            found = [future.result() for future in futures]
+    found = [trades for trades in found if len(trades)]
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=TRADE_COLUMNS + ['rewardValue'])
+
+
+def point_trades(trades, point):
+    # The trades one grid point would have taken
+    pick = (trades['rewardValue'] == point['reward_value']) & (trades['baseCount'] <= point['max_base_candles'])
+    if point['one_two_ka_four_check_allowed']:
+        pick &= trades['isOneTwoKaFour']
+    return trades[pick]
+
+
+# ---------------- WINDOWS ---------------- #
+def rolling_windows(start, end, train_months, test_months, step_months=None):
+    # (train start, train end = test start, test end), stepping by the test
+    # length so that the test parts tile the history without overlapping
+    step = pd.DateOffset(months=step_months or test_months)
+    windows = []
+    train_start = pd.Timestamp(start)
+    while True:
+        train_end = train_start + pd.DateOffset(months=train_months)
+        test_end = train_end + pd.DateOffset(months=test_months)
+        if train_end >= end:
+            break
+        windows.append((train_start, train_end, min(test_end, end)))
+        train_start += step
+    return windows
+
+
+def window_trades(trades, window):
+    # Zones formed in the train part that were closed before it ended (the
+    # only outcomes known at that point), and every zone formed in the test part
+    train_start, train_end, test_end = window
+    formed = trades['legoutTime']
+    train = trades[(formed >= train_start) & (formed < train_end) & (trades['exitTime'] < train_end)]
+    test = trades[(formed >= train_end) & (formed < test_end)]
+    return train, test
+
+
+# ---------------- WALK FORWARD ---------------- #
+def _stat_names():
+    return list(trade_stats(pd.DataFrame(columns=TRADE_COLUMNS)))
+
+
+def walk_forward(trades, windows, grid=GRID, objective='expectancyR', min_trades=20):
+    # One row per (window, timeframe, grid point) with the train_* and test_*
+    # trade_stats; 'selected' marks the point with the best train objective
+    # among those with at least min_trades closed train trades
+    points = grid_points(grid)
+    rows = []
+    for n, window in enumerate(windows):
+        train, test = window_trades(trades, window)
+        for interval_key in sorted(trades['timeFrame'].unique()):
+            train_tf, test_tf = train[train['timeFrame'] == interval_key], test[test['timeFrame'] == interval_key]
+            for point in points:
+                row = {'window': n, 'trainStart': window[0], 'trainEnd': window[1], 'testEnd': window[2],
+                       'timeFrame': interval_key, **point}
+                row.update({f'train_{name}': value for name, value in trade_stats(point_trades(train_tf, point)).items()})
+                row.update({f'test_{name}': value for name, value in trade_stats(point_trades(test_tf, point)).items()})
+                rows.append(row)
+    stats = _stat_names()
+    columns = (['window', 'trainStart', 'trainEnd', 'testEnd', 'timeFrame'] + list(grid)
+               + [f'train_{name}' for name in stats] + [f'test_{name}' for name in stats])
+    results = pd.DataFrame(rows, columns=columns)
+    results['selected'] = False
+    if results.empty:
+        return results
+    eligible = results[(results['train_targets'] + results['train_stopLosses'] >= min_trades) &
+                       results[f'train_{objective}'].notna()]
+    if len(eligible):
+        results.loc[eligible.groupby(['window', 'timeFrame'])[f'train_{objective}'].idxmax(), 'selected'] = True
+    return results
+
+
+def out_of_sample(trades, results, windows):
+    # trade_stats over all test parts: per grid point, and for the points the
+    # walk forward selected (the 'selected' rows, one per window and timeframe)
+    tests = [window_trades(trades, window)[1] for window in windows]
+    rows = []
+    for (interval_key, *values), group in results.groupby(['timeFrame'] + GRID_COLUMNS, sort=True):
+        point = dict(zip(GRID_COLUMNS, values))
+        taken = [point_trades(test[test['timeFrame'] == interval_key], point) for test in tests]
+        rows.append({'timeFrame': interval_key, **point, **trade_stats(_concat(taken)),
+                     'timesSelected': int(group['selected'].sum())})
+    table = pd.DataFrame(rows, columns=['timeFrame'] + GRID_COLUMNS + _stat_names() + ['timesSelected'])
+
+    chosen = []
+    for _, row in results[results['selected']].iterrows():
+        test = tests[row['window']]
+        chosen.append(point_trades(test[test['timeFrame'] == row['timeFrame']], row))
+    selected = {'timeFrame': 'walk-forward', **trade_stats(_concat(chosen))}
+    return table, selected
+
+
+def _concat(tables):
+    tables = [table for table in tables if len(table)]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=TRADE_COLUMNS + ['rewardValue'])
+
+
+# ---------------- CLI ---------------- #
+def main(argv=None):
+    from market_data import TIMEFRAMES, fetch_data, load_universe
+    from scan_pipeline import run_pipeline
+    from zone_backtest import prepare
+
+    parser = argparse.ArgumentParser(description="Walk-forward optimisation of the zone scanner's parameters.")
+    parser.add_argument("--universe", default="ind_nifty500list.csv", help="CSV with a Symbol column")
+    parser.add_argument("--suffix", default=".NS", help="exchange suffix appended to every symbol")
+    parser.add_argument("--limit", type=int, default=None, help="use only the first N symbols")
+    parser.add_argument("--timeframes", nargs="+", default=["Daily"], choices=list(TIMEFRAMES), metavar="TF")
+    parser.add_argument("--period", default="10y", help="history to fetch (yfinance period)")
+    parser.add_argument("--train-months", type=int, default=24)
+    parser.add_argument("--test-months", type=int, default=6)
+    parser.add_argument("--max-base", type=int, nargs="+", default=GRID['max_base_candles'])
+    parser.add_argument("--reward", type=float, nargs="+", default=GRID['reward_value'])
+    parser.add_argument("--one-two-ka-four", choices=["both", "on", "off"], default="both")
+    parser.add_argument("--objective", default="expectancyR", choices=["expectancyR", "hitRate"])
+    parser.add_argument("--min-trades", type=int, default=20, help="closed train trades a point needs to be selected")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores, or 1 for a small universe)")
+    parser.add_argument("--output", default=None, help="write every window's results to this .csv")
+    args = parser.parse_args(argv)
+
+    grid = {
+        'max_base_candles': args.max_base,
+        'reward_value': args.reward,
+        'one_two_ka_four_check_allowed': {'both': [False, True], 'on': [True], 'off': [False]}[args.one_two_ka_four],
+    }
+    started = time.time()
+    symbols = load_universe(args.universe, args.suffix, args.limit)
+    tasks = [(symbol, tf) for tf in args.timeframes for symbol in symbols]
+
+    def fetch(task):
+        df = fetch_data(task[0], TIMEFRAMES[task[1]], args.period)
+        return prepare(df) if not df.empty else None
+
+    executor = grid_executor(args.workers) if use_pool(args.workers, len(tasks)) else None
+    try:
+        def detect(batch):
+            return [submit_grid_trades(executor, symbol, tf, df, grid) for (symbol, tf), df in batch]
+
+        futures = []
+        for task, df, future, error in run_pipeline(tasks, fetch, detect, fetch_workers=args.fetch_workers):
+            if error is not None:
+                print(f"Failed to fetch {task[0]} | {task[1]}: {str(error)[:80]}", file=sys.stderr)
+            elif future is not None:
+                futures.append((task, future))
+        found = []
+        for task, future in futures:
+            try:
+                found.append(future.result())
+            except Exception as e:
+                print(f"Failed to backtest {task[0]} | {task[1]}: {str(e)[:80]}", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    trades = _concat(found)
+    if trades.empty:
+        print("No zones found", file=sys.stderr)
+        return 1
+
+    formed = trades['legoutTime']
+    windows = rolling_windows(formed.min().normalize(), formed.max(), args.train_months, args.test_months)
+    if not windows:
+        print(f"History ({formed.min():%Y-%m-%d} to {formed.max():%Y-%m-%d}) is shorter than "
+              f"train + test ({args.train_months} + {args.test_months} months)", file=sys.stderr)
+        return 1
+    results = walk_forward(trades, windows, grid, args.objective, args.min_trades)
+    table, selected = out_of_sample(trades, results, windows)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', 30, 'display.max_rows', 200):
+        print(table.round(2).to_string(index=False))
+        print(pd.DataFrame([selected]).round(2).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    print(f"{len(windows)} windows x {len(grid_points(grid))} parameter sets over {len(trades)} trades "
+          f"in {time.time() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
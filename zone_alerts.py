@@ -0,0 +1,174 @@
+import argparse
+import csv
+import pickle
+import sys
+import time
+from bisect import insort
+
+from zone_index import ZoneIndex, is_demand, zone_bounds
+from zone_leaderboard import Leaderboard
+
+# Price-tick alerts over the active zones of a scan. Every zone arms one-sided
+# price triggers per symbol (e.g. "fires when price falls to the zone top"),
+# kept in sorted lists so a tick only pops the triggers it crosses. Statuses
+# follow find_patterns: a Fresh zone is Entered when price trades into it
+# (demand: at or below the top, supply: at or above the bottom), then ends on
+# Stop loss (beyond the far side) or Target (reward_value x risk away).
+#
+# Ticks come from a feed of (time, symbol, price) rows; the stand-in here
+# replays a CSV file (or stdin), e.g.
+#   python zone_alerts.py --zones zones.pkl --ticks ticks.csv
+
+FRESH = 'Fresh'
+ENTERED = 'Entered'
+STOP_LOSS = 'Stop loss'
+TARGET = 'Target'
+
+# Trigger kinds and the status each one leads to
+ENTRY_EVENT = 'entry'
+STOP_EVENT = 'stop_loss'
+TARGET_EVENT = 'target'
+EVENT_STATUS = {ENTRY_EVENT: ENTERED, STOP_EVENT: STOP_LOSS, TARGET_EVENT: TARGET}
+
+
+def _fires(triggers, price):
+    # Triggers are sorted so the ones a price crosses are always at the end:
+    # (level, inclusive) fires on price <= level (strict: <) for falling
+    # triggers; rising ones are stored with the level and price negated
+    if not triggers:
+        return False
+    level, inclusive = triggers[-1][0], triggers[-1][1]
+    return level > price or (level == price and inclusive)
+
+
+class AlertEngine:
+    def __init__(self, index):
+        self.index = index
+        self._zones = {}  # zone_id -> [symbol, timeframe, record, status]
+        self._falls = {}  # symbol -> sorted [(level, inclusive, zone_id, kind)]
+        self._rises = {}  # symbol -> sorted [(-level, inclusive, zone_id, kind)]
+        for symbol in index.symbols():
+            for zone_id in index.zones_of(symbol):
+                symbol, timeframe, record = index.zone(zone_id)
+                self._zones[zone_id] = [symbol, timeframe, record, FRESH]
+                low, high = zone_bounds(record)
+                if is_demand(record):
+                    self._arm(symbol, zone_id, ENTRY_EVENT, high, rising=False, inclusive=True)
+                else:
+                    self._arm(symbol, zone_id, ENTRY_EVENT, low, rising=True, inclusive=True)
+
+    def _arm(self, symbol, zone_id, kind, level, rising, inclusive):
+        if rising:
+            insort(self._rises.setdefault(symbol, []), (-level, inclusive, zone_id, kind))
+        else:
+            insort(self._falls.setdefault(symbol, []), (level, inclusive, zone_id, kind))
+
+    def _arm_exits(self, symbol, zone_id, record):
+        # Same comparisons as find_patterns: stop loss is strictly beyond the
+        # zone, the target is hit on touch
+        low, high = zone_bounds(record)
+        target = float(record['Target'])
+        if is_demand(record):
+            self._arm(symbol, zone_id, STOP_EVENT, low, rising=False, inclusive=False)
+            self._arm(symbol, zone_id, TARGET_EVENT, target, rising=True, inclusive=True)
+        else:
+            self._arm(symbol, zone_id, STOP_EVENT, high, rising=True, inclusive=False)
+            self._arm(symbol, zone_id, TARGET_EVENT, target, rising=False, inclusive=True)
+
+    def status(self, zone_id):
+        zone = self._zones.get(zone_id)
+        return zone[3] if zone is not None else None
+
+    def on_tick(self, symbol, price, when=None):
+        # Returns the events this tick caused, as
+        # (when, symbol, timeframe, zone_id, event, price, new status)
+        falls, rises = self._falls.get(symbol), self._rises.get(symbol)
+        if not falls and not rises:
+            return []
+        events = []
+        while True:
+            if _fires(falls, price):
+                _, _, zone_id, kind = falls.pop()
+            elif _fires(rises, -price):
+                _, _, zone_id, kind = rises.pop()
+            else:
+                break
+            zone = self._zones[zone_id]
+            # The other exit of a closed zone is left behind and skipped here
+            if zone[3] != (FRESH if kind == ENTRY_EVENT else ENTERED):
+                continue
+            zone[3] = EVENT_STATUS[kind]
+            if kind == ENTRY_EVENT:
+                self.index.remove(zone_id)
+                self._arm_exits(symbol, zone_id, zone[2])
+                # A gap through the whole zone enters and exits on one tick
+                falls, rises = self._falls.get(symbol), self._rises.get(symbol)
+            events.append((when, symbol, zone[1], zone_id, kind, price, zone[3]))
+        return events
+
+
+# ---------------- FEED ---------------- #
+def csv_ticks(path):
+    # Feed stand-in: rows of time,symbol,price ('-' reads stdin, so a live
+    # feed can be piped in)
+    f = sys.stdin if path == "-" else open(path, newline="")
+    try:
+        for row in csv.DictReader(f):
+            yield row["time"], row["symbol"], float(row["price"])
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run(engine, ticks, on_event=None, board=None):
+    # Drives the engine (and optionally a closest-zone leaderboard over the
+    # same index) from a feed; returns (ticks, events, per-tick seconds)
+    latencies, count = [], 0
+    for when, symbol, price in ticks:
+        started = time.perf_counter()
+        events = engine.on_tick(symbol, price, when)
+        if board is not None:
+            board.update(symbol, price)
+        latencies.append(time.perf_counter() - started)
+        count += len(events)
+        if on_event is not None:
+            for event in events:
+                on_event(event)
+    return len(latencies), count, latencies
+
+
+def load_zones(path):
+    # ZoneBatch list as saved from the old_app results table
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alert on price ticks entering or leaving scanned zones.")
+    parser.add_argument("--zones", required=True, help="zones .pkl downloaded from the scanner")
+    parser.add_argument("--ticks", default="-", help="CSV with time,symbol,price columns ('-' for stdin)")
+    parser.add_argument("--top", type=int, default=0, help="print the N closest fresh zones at the end")
+    args = parser.parse_args(argv)
+
+    engine = AlertEngine(ZoneIndex(load_zones(args.zones)))
+    board = Leaderboard(engine.index) if args.top else None
+    print(f"Watching {len(engine.index)} fresh zones on {len(engine.index.symbols())} symbols", file=sys.stderr)
+
+    def report(event):
+        when, symbol, timeframe, zone_id, kind, price, status = event
+        print(f"{when} {symbol} [{timeframe}] zone {zone_id:016x}: {kind} at {price} -> {status}", flush=True)
+
+    ticks, events, latencies = run(engine, csv_ticks(args.ticks), report, board)
+    if latencies:
+        latencies.sort()
+        print(f"{ticks} ticks, {events} events, mean {sum(latencies) / ticks * 1e6:.1f}us, "
+              f"p99 {latencies[min(ticks - 1, int(ticks * 0.99))] * 1e6:.1f}us per tick", file=sys.stderr)
+    if board is not None:
+        for distance, symbol, zone_id in board.top(args.top):
+            timeframe = engine.index.zone(zone_id)[1]
+            print(f"{symbol} [{timeframe}] zone {zone_id:016x}: {distance:.2f}% away")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
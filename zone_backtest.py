@@ -0,0 +1,255 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from zone_engine import ZoneOutcome, calculate_atr, pattern_bars, pattern_rules, zone_setups
+
+# Historical performance of old_app's zones. Every zone find_patterns can
+# form over the whole history is traded from its zone edge: demand zones are
+# bought at the top with the stop at the bottom, supply zones sold at the
+# bottom with the stop at the top, and the target is reward_value x risk
+# away, exactly as find_patterns scores them (so a Target is +reward_value R
+# and a Stop loss -1 R). The optional checks are off by default so that the
+# validation flags can be compared instead of filtered, e.g.
+#   python zone_backtest.py --timeframes Daily --period 5y --output summary.csv
+
+BACKTEST_PARAMS = dict(
+    max_base_candles=3,
+    scan_demand_zone_allowed=True,
+    scan_supply_zone_allowed=True,
+    fresh_zone_allowed=True,
+    target_zone_allowed=True,
+    stoploss_zone_allowed=True,
+    candle_behinde_legin_check_allowed=False,
+    whitearea_check_allowed=False,
+    legout_formation_check_allowed=False,
+    wick_in_legin_allowed=False,
+    time_validation_allowed=False,
+    legin_tr_atr_check_allowed=False,
+    one_legout_count_allowed=False,
+    three_legout_count_allowed=False,
+    legout_covered_check_allowed=False,
+    one_two_ka_four_check_allowed=False,
+    user_input_zone_distance=float('inf'),
+)
+
+FLAG_COLUMNS = ['isWhiteArea', 'legoutNotCovered', 'isLegoutFormation', 'isWickInLegin',
+                'isLeginTrPass', 'isOneTwoKaFour', 'isLegoutCovered']
+ENTERED = 'Entered'  # entered, still open at the end of the data
+
+TRADE_COLUMNS = ['Symbol', 'timeFrame', 'zoneType', 'baseCount', 'zoneStatus', 'entryPrice', 'stopLoss', 'Target',
+                 'legoutTime', 'entryTime', 'exitTime', 'barsToEntry', 'barsToExit', 'R', 'mae'] + FLAG_COLUMNS
+
+
+# ---------------- RANGE QUERIES ---------------- #
+def _sparse_table(values, op):
+    # levels[j][i] = op over values[i:i + 2**j]
+    levels = [values]
+    width = 1
+    while 2 * width <= len(values):
+        previous = levels[-1]
+        levels.append(op(previous[:-width], previous[width:]))
+        width *= 2
+    return levels
+
+
+def _range_reduce(levels, op, first, last):
+    # op over values[first[k]:last[k] + 1] for every k at once
+    out = np.empty(len(first))
+    level = np.floor(np.log2(last - first + 1)).astype(int)
+    for j in np.unique(level):
+        pick = level == j
+        out[pick] = op(levels[j][first[pick]], levels[j][last[pick] - (1 << j) + 1])
+    return out
+
+
+# ---------------- TRADES ---------------- #
+def series_setups(stock_data, params=None):
+    # (pattern bars, setups) of every zone the series forms; setups do not
+    # depend on reward_value, so one pass serves any number of targets
+    rules = pattern_rules(**dict(BACKTEST_PARAMS, **(params or {})))
+    bars = pattern_bars(stock_data)
+    n = len(stock_data)
+    if n < 4:
+        return bars, []
+
+    # Only a strong candle can be a leg-out: skip everything else up front
+    O, C, TR, ATR = bars['Open'], bars['Close'], bars['TR'], bars['ATR']
+    candidates = (TR > ATR) & (((C > O) & rules['scan_demand_zone_allowed']) |
+                               ((O > C) & rules['scan_supply_zone_allowed']))
+    candidates[:3] = False
+    return bars, [setup for i in np.flatnonzero(candidates) for setup in zone_setups(bars, n, int(i), rules)]
+
+
+def zone_trades(symbol, interval_key, stock_data, reward_value=5, params=None):
+    # One row per zone of the series, traded to its Target / Stop loss
+    bars, setups = series_setups(stock_data, params)
+    return setup_trades(symbol, interval_key, stock_data, bars, setups, reward_value)
+
+
+def setup_trades(symbol, interval_key, stock_data, bars, setups, reward_value=5):
+    # zone_trades for setups already found by series_setups
+    n = len(stock_data)
+    outcomes = []
+    for setup in setups:
+        outcome = ZoneOutcome(setup, reward_value)
+        outcome.settle(bars, n)
+        outcomes.append(outcome)
+    if not outcomes:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+
+    demand = np.array([s['demand'] for s in setups])
+    top = np.array([s['entryPrice'] for s in setups])
+    bottom = np.array([s['stopLoss'] for s in setups])
+    legout = np.array([s['legoutIndex'] for s in setups])
+    entry = np.array([-1 if o.entry_index is None else o.entry_index for o in outcomes])
+    exit_ = np.array([-1 if o.exit_index is None else o.exit_index for o in outcomes])
+    status = np.array([o.status or (ENTERED if o.entry_index is not None else 'Fresh') for o in outcomes], dtype=object)
+
+    risk = top - bottom
+    r_multiple = np.where(status == 'Target', float(reward_value), np.where(status == 'Stop loss', -1.0, np.nan))
+
+    # Worst excursion against the trade between entry and exit (or the last
+    # bar), in R; the stop closes the trade, so it is capped at 1
+    mae = np.full(len(outcomes), np.nan)
+    entered = entry >= 0
+    if entered.any():
+        first = entry[entered]
+        last = np.where(exit_[entered] >= 0, exit_[entered], n - 1)
+        lowest = _range_reduce(_sparse_table(bars['Low'], np.minimum), np.minimum, first, last)
+        highest = _range_reduce(_sparse_table(bars['High'], np.maximum), np.maximum, first, last)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mae[entered] = np.minimum(np.where(demand[entered], top[entered] - lowest, highest - bottom[entered]) / risk[entered], 1)
+
+    times = stock_data.index
+    trades = pd.DataFrame({
+        'Symbol': symbol,
+        'timeFrame': interval_key,
+        'zoneType': [s['zoneType'] for s in setups],
+        'baseCount': [s['baseCount'] for s in setups],
+        'zoneStatus': status,
+        'entryPrice': top,
+        'stopLoss': bottom,
+        'Target': np.array([o.target for o in outcomes]),
+        'legoutTime': times[legout],
+        'entryTime': times[np.maximum(entry, 0)].where(entered),
+        'exitTime': times[np.maximum(exit_, 0)].where(exit_ >= 0),
+        'barsToEntry': np.where(entered, entry - legout, -1),
+        'barsToExit': np.where(exit_ >= 0, exit_ - entry, -1),
+        'R': r_multiple,
+        'mae': mae,
+    })
+    for flag in FLAG_COLUMNS[:-1]:
+        trades[flag] = [bool(s[flag]) for s in setups]
+    trades['isLegoutCovered'] = [bool(o.legout_covered()) for o in outcomes]
+    return trades
+
+
+def backtest(frames, interval_key, reward_value=5, params=None):
+    # frames: {symbol: OHLC frame prepared like old_app's (calculate_atr + round(2))}
+    found = [zone_trades(symbol, interval_key, df, reward_value, params) for symbol, df in frames.items()]
+    found = [trades for trades in found if len(trades)]
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=TRADE_COLUMNS)
+
+
+# ---------------- SUMMARY ---------------- #
+def trade_stats(trades):
+    closed = trades[trades['zoneStatus'].isin(['Target', 'Stop loss'])]
+    targets = closed[closed['zoneStatus'] == 'Target']
+    # Drawdown of the cumulative R curve, trades taken in exit order
+    curve = closed.sort_values('exitTime')['R'].cumsum().to_numpy()
+    drawdown = float((np.maximum.accumulate(np.maximum(curve, 0)) - curve).max()) if len(curve) else np.nan
+    return {
+        'zones': len(trades),
+        'entered': int((trades['barsToEntry'] >= 0).sum()),
+        'targets': len(targets),
+        'stopLosses': len(closed) - len(targets),
+        'hitRate': len(targets) / len(closed) * 100 if len(closed) else np.nan,
+        'expectancyR': closed['R'].mean() if len(closed) else np.nan,
+        'avgBarsToTarget': targets['barsToExit'].mean() if len(targets) else np.nan,
+        'medianBarsToTarget': targets['barsToExit'].median() if len(targets) else np.nan,
+        'avgMaeR': closed['mae'].mean() if len(closed) else np.nan,
+        'maxDrawdownR': drawdown,
+    }
+
+
+def summarize(trades, by=('timeFrame', 'zoneType')):
+    # trade_stats per group, e.g. per timeframe and zone type
+    rows = [dict(zip(by, key if isinstance(key, tuple) else (key,)), **trade_stats(group))
+            for key, group in trades.groupby(list(by), sort=True)]
+    return pd.DataFrame(rows)
+
+
+def flag_summary(trades, by=('timeFrame',)):
+    # trade_stats with and without each validation flag
+    tables = []
+    for flag in FLAG_COLUMNS:
+        table = summarize(trades, tuple(by) + (flag,)).rename(columns={flag: 'value'})
+        table.insert(len(by), 'flag', flag)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+# ---------------- CLI ---------------- #
+def prepare(df):
+    # Same candles old_app scans: ATR on the raw data, then rounded
+    return calculate_atr(df[['Open', 'High', 'Low', 'Close']].copy()).round(2)
+
+
+def main(argv=None):
+    from market_data import TIMEFRAMES, fetch_data, load_universe
+    from scan_pipeline import run_pipeline
+
+    parser = argparse.ArgumentParser(description="Backtest demand / supply zones over a stock universe.")
+    parser.add_argument("--universe", default="ind_nifty500list.csv", help="CSV with a Symbol column")
+    parser.add_argument("--suffix", default=".NS", help="exchange suffix appended to every symbol")
+    parser.add_argument("--limit", type=int, default=None, help="backtest only the first N symbols")
+    parser.add_argument("--timeframes", nargs="+", default=["Daily"], choices=list(TIMEFRAMES), metavar="TF")
+    parser.add_argument("--period", default="5y", help="history to fetch (yfinance period)")
+    parser.add_argument("--reward", type=float, default=5, help="reward_value (target in multiples of risk)")
+    parser.add_argument("--max-base", type=int, default=BACKTEST_PARAMS['max_base_candles'])
+    parser.add_argument("--by", nargs="+", default=["timeFrame", "zoneType"], help="summary grouping columns")
+    parser.add_argument("--flags", action="store_true", help="also compare trades with / without each flag")
+    parser.add_argument("--trades", default=None, help="write every trade to this .csv / .parquet")
+    parser.add_argument("--output", default=None, help="write the summary to this .csv")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    symbols = load_universe(args.universe, args.suffix, args.limit)
+    tasks = [(symbol, tf) for tf in args.timeframes for symbol in symbols]
+    params = {'max_base_candles': args.max_base}
+
+    def fetch(task):
+        df = fetch_data(task[0], TIMEFRAMES[task[1]], args.period)
+        return prepare(df) if not df.empty else None
+
+    def detect(batch):
+        return [zone_trades(symbol, tf, df, args.reward, params) for (symbol, tf), df in batch]
+
+    found = []
+    for task, df, trades, error in run_pipeline(tasks, fetch, detect, fetch_workers=args.workers):
+        if error is not None:
+            print(f"Failed to backtest {task[0]} | {task[1]}: {str(error)[:80]}", file=sys.stderr)
+        elif trades is not None and len(trades):
+            found.append(trades)
+    trades = pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=TRADE_COLUMNS)
+
+    summary = summarize(trades, tuple(args.by))
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(summary.round(2).to_string(index=False))
+        if args.flags:
+            print(flag_summary(trades).round(2).to_string(index=False))
+    if args.output:
+        summary.to_csv(args.output, index=False)
+    if args.trades:
+        trades.to_parquet(args.trades, index=False) if args.trades.endswith(".parquet") else trades.to_csv(args.trades, index=False)
+    print(f"{len(trades)} zones from {len(tasks)} series in {time.time() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
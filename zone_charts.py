@@ -0,0 +1,317 @@
+from collections import OrderedDict
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Zone charts, built only when a zone is actually opened in the UI and kept
+# by zone id so reruns and re-selections reuse the finished figure.
+
+FIGURE_CACHE_SIZE = 256
+SERIES_CACHE_SIZE = 64
+MAX_CHART_POINTS = 1500  # candles sent to the browser per chart
+RECENT_BARS = 200
+
+ZOOM_ZONE = "Zone"
+ZOOM_RECENT = "Recent"
+ZOOM_FULL = "Full history"
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+_series = OrderedDict()
+_series_lock = threading.Lock()
+
+
+def zone_chart_id(row):
+    # Identifies the zone and the candles its chart shows (the series id in
+    # ohlcRef carries the series' last bar time)
+    return (row['Symbol'], row['timeFrame'], row['zoneType'], row['leginDate'], row['legoutDate'],
+            float(row['entryPrice']), float(row['stopLoss']), row['zoneStatus'], tuple(row['ohlcRef']))
+
+
+def cached_figure(key, build, *args):
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+    fig = build(*args)
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return fig
+
+
+def grid_selection(grid):
+    # st_aggrid returns a list of dicts in older releases and a DataFrame in newer ones
+    selected = grid['selected_rows']
+    if selected is None:
+        return []
+    if hasattr(selected, 'to_dict'):
+        return selected.to_dict('records')
+    return list(selected)
+
+
+# ---------------- DECIMATION ---------------- #
+def decimate_ohlc(df, max_points=MAX_CHART_POINTS, keep=None):
+    # Merge runs of consecutive candles into one OHLC candle (first open, max
+    # high, min low, last close) so at most ~max_points remain. Rows between
+    # the keep=(start, end) timestamps stay at full resolution.
+    n = len(df)
+    if n <= max_points:
+        return df
+
+    if keep is None:
+        keep_start = keep_end = n
+    else:
+        keep_start = int(df.index.searchsorted(keep[0], side='left'))
+        keep_end = int(df.index.searchsorted(keep[1], side='right'))
+    left, right = keep_start, n - keep_end
+    budget = max(max_points - (keep_end - keep_start), 2)
+    left_points = max(1, round(budget * left / (left + right))) if left else 0
+    right_points = max(1, budget - left_points) if right else 0
+
+    starts = np.r_[
+        np.arange(0, left, math.ceil(left / left_points)) if left else [],
+        np.arange(keep_start, keep_end),
+        np.arange(keep_end, n, math.ceil(right / right_points)) if right else [],
+    ].astype(np.int64)
+    ends = np.r_[starts[1:] - 1, n - 1]
+
+    columns = {}
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if column == 'High' or column == 'TR':
+            columns[column] = np.maximum.reduceat(values, starts)
+        elif column == 'Low':
+            columns[column] = np.minimum.reduceat(values, starts)
+        elif column == 'Volume':
+            columns[column] = np.add.reduceat(values, starts)
+        elif column == 'Open':
+            columns[column] = values[starts]
+        else:
+            columns[column] = values[ends]
+    out = pd.DataFrame(columns, index=df.index[starts], columns=df.columns)
+    if 'Candle_Range' in out:
+        out['Candle_Range'] = out['High'] - out['Low']
+    if 'Candle_Body' in out:
+        out['Candle_Body'] = (out['Close'] - out['Open']).abs()
+    return out
+
+
+def decimated_series(key, df, max_points=MAX_CHART_POINTS, keep=None):
+    # Cached per series (symbol / timeframe / last bar) and zoom window
+    key = (key, max_points, keep)
+    with _series_lock:
+        out = _series.get(key)
+        if out is not None:
+            _series.move_to_end(key)
+            return out
+    out = decimate_ohlc(df.dropna(subset=['Open', 'High', 'Low', 'Close']), max_points, keep)
+    with _series_lock:
+        _series[key] = out
+        while len(_series) > SERIES_CACHE_SIZE:
+            _series.popitem(last=False)
+    return out
+
+
+# ---------------- BUILDING BLOCKS ---------------- #
+# Shapes and annotations are collected as plain dicts and handed to the
+# figure in one layout, instead of one validated add_shape / add_hline /
+# add_annotation call each.
+HOVER_FIELDS = (('Open', 'Open'), ('High', 'High'), ('Low', 'Low'), ('Close', 'Close'),
+                ('TR', 'TR'), ('ATR', 'ATR'), ('Body', 'Candle_Body'), ('Range', 'Candle_Range'))
+
+
+def hover_text(ohlc_data):
+    # Column-wise string concatenation rather than a Python loop over rows
+    text = None
+    for label, column in HOVER_FIELDS:
+        part = f"{label}: " + ohlc_data[column].astype(str)
+        text = part if text is None else text + "<br>" + part
+    return text.to_numpy()
+
+
+def hline(y, color, dash, width=None):
+    # Same shape fig.add_hline creates: spans the whole x domain
+    line = dict(color=color, dash=dash)
+    if width is not None:
+        line['width'] = width
+    return dict(type="line", xref="x domain", x0=0, x1=1, yref="y", y0=y, y1=y, line=line)
+
+
+def price_label(x, y, text, border_color, ax, ay):
+    return dict(x=x, y=y, text=text, showarrow=True, arrowhead=2, ax=ax, ay=ay,
+                font=dict(size=10, color='black'), bgcolor='white',
+                bordercolor=border_color, borderwidth=1, borderpad=4)
+
+
+# ---------------- SETUP CHART (app.py) ---------------- #
+def build_setup_chart(df, zones, symbol, tf):
+    shapes = []
+    for z in zones:
+        ztype, entry, sl, tgt, zh, zl = z
+        color = "red" if ztype == "Supply" else "green"
+        shapes.append(dict(type="rect", x0=df.index[0], x1=df.index[-1],
+                           y0=zl, y1=zh, fillcolor=color, opacity=0.25, line_width=0))
+        shapes.append(hline(entry, "blue", "dot"))
+        shapes.append(hline(sl, "red", "dash"))
+        shapes.append(hline(tgt, "green", "dash"))
+
+    candles = go.Candlestick(x=df.index, open=df["Open"], high=df["High"],
+                             low=df["Low"], close=df["Close"])
+    return go.Figure(data=[candles], layout=dict(
+        title=f"{symbol} | {tf}", xaxis_rangeslider_visible=False, shapes=shapes))
+
+
+def setup_chart(df, zones, symbol, tf, zoom=ZOOM_RECENT):
+    # Recent: the last RECENT_BARS candles. Full history: everything, decimated
+    # except for those last candles.
+    if zoom == ZOOM_FULL:
+        candles = decimated_series((symbol, tf, df.index[-1]), df,
+                                   keep=(df.index[-min(RECENT_BARS, len(df))], df.index[-1]))
+    else:
+        candles = df.tail(RECENT_BARS)
+    key = ("setup", zoom, symbol, tf, df.index[-1], tuple(tuple(z) for z in zones))
+    return cached_figure(key, build_setup_chart, candles, zones, symbol, tf)
+
+
+# ---------------- PATTERN CHART (old_app.py) ---------------- #
+def build_zone_chart(row, ohlc_data):
+    symbol_name = row['Symbol']
+    leginDate = row['leginDate']
+    legoutDate = row['legoutDate']
+    baseCount = row['baseCount']
+    entryPrice = row['entryPrice']
+    stopLoss = row['stopLoss']
+    Minimum_target = round(row['Target'],2)
+    pattern_name = row['zoneType']
+
+    # Filter out non-trading dates
+    ohlc_data = ohlc_data.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    index = ohlc_data.index
+
+    candles = go.Candlestick(
+        x=index,
+        open=ohlc_data['Open'],
+        high=ohlc_data['High'],
+        low=ohlc_data['Low'],
+        close=ohlc_data['Close'],
+        name=symbol_name,
+        increasing_line_color='#26a69a',  # Set increasing line color
+        decreasing_line_color='#ef5350',  # Set decreasing line color
+        increasing_fillcolor='#26a69a',   # Set increasing fill color
+        decreasing_fillcolor='#ef5350',   # Set decreasing fill color
+        line_width=1,  # Set line thickness
+        hovertext=hover_text(ohlc_data),  # Set custom hover text
+        hoverinfo='text'  # Show only custom hover text
+    )
+
+    try:
+        legout_candle_index = index.get_loc(legoutDate)
+    except KeyError:
+        legout_candle_index = None  # Handle the case where legoutDate is not found
+
+    # Determine shape_start based on leginDate
+    try:
+        shape_start = index[index.get_loc(leginDate)]
+    except KeyError:
+        if legout_candle_index is not None:
+            shape_start = legout_candle_index - baseCount
+        else:
+            shape_start = None  # Handle the case where both dates are not found
+
+    shape_end = index[-1]
+    fill_color = "green" if pattern_name in ['DZ(RBR)', 'DZ(DBR)'] else "red"
+
+    shapes = []
+    if shape_start is not None:
+        shapes.append(dict(type="rect", xref="x", yref="y", x0=shape_start, y0=stopLoss,
+                           x1=shape_end, y1=entryPrice, fillcolor=fill_color, opacity=0.2,
+                           layer="below", line=dict(width=0)))
+    # Minimum target line from the first candle to shape_end
+    shapes.append(dict(type="line", x0=index[0], y0=Minimum_target, x1=shape_end, y1=Minimum_target,
+                       line=dict(color="lightgreen", width=2, dash="dash")))
+
+    fixed_distance = 0.5
+    annotations = [price_label(shape_end, Minimum_target, f'Target: ₹ {Minimum_target}', 'lightgreen', -10, -10)]
+    if pattern_name in ['SZ(RBD)', 'SZ(DBD)']:
+        annotations.append(price_label(shape_end, stopLoss + fixed_distance, f'Stop Loss: ₹ {stopLoss}', 'red', 10, -10))
+        annotations.append(price_label(shape_end, entryPrice, f'Entry: ₹ {entryPrice}', 'green', 10, 10))
+    else:
+        annotations.append(price_label(shape_end, entryPrice, f'Entry: ₹ {entryPrice}', 'green', 10, -10))
+        annotations.append(price_label(shape_end, stopLoss + fixed_distance, f'Stop Loss: ₹ {stopLoss}', 'red', 10, 10))
+
+    # Styled header with the validation flags
+    header_text = (
+            f"<span style='padding-right: 20px;'><b> baseCount:</b> {baseCount}⎜</span>"
+            f"<span style='padding-right: 20px;'><b> legoutDate:</b> {legoutDate}⎜</span>"
+            f"<span style='padding-right: 20px;'><b>isWhiteArea:</b>{row['isWhiteArea']} ⎜</span> "
+            f"<span style='padding-right: 20px;'><b> leginNotCovered:</b>{row['legoutNotCovered']}</span> <br>"
+            f"<span style='padding-right: 20px;'><b> legoutFormation:</b>{row['isLegoutFormation']} ⎜</span> "
+            f"<span style='padding-right: 20px;'><b>isWickInLegin:</b>{row['isWickInLegin']} ⎜</span> "
+            f"<span style='padding-right: 20px;'><b> leginTrCheck:</b>{row['isLeginTrPass']} ⎜</span> "
+            f"<span style='padding-right: 20px;'><b>isLegoutCovered:</b>{row['isLegoutCovered']} ⎜</span> "
+            f"<span style='padding-right: 20px;'><b>isTimeValidation:</b>{row['isTimeValidationPass']}</span>    "
+    )
+    annotations.append(dict(
+        x=0.5,
+        y=1.1,  # Increased y position for more space
+        text=header_text,
+        showarrow=False,
+        align='center',
+        xref='paper',
+        yref='paper',
+        font=dict(size=14, color='black'),
+        bgcolor='rgba(255, 255, 255, 0.8)',  # Light background for header
+        borderpad=4,
+        width=800,
+        height=50,
+        valign='middle'
+    ))
+
+    # Whole layout in one go: no datetime x-axis, fixed size, pan mode
+    layout = dict(
+        title=(
+            f'Chart: {symbol_name} ⎜ '
+            f'{row["timeFrame"]} ⎜'
+            f'<span>{pattern_name} ⎜</span> '
+            f'<span>zoneStatus:{row["zoneStatus"]}</span>'
+        ),
+        title_x=0.5,  # Center the title
+        title_xanchor='center',  # Anchor the title to the center
+        yaxis_title='Price',
+        xaxis_rangeslider_visible=False,  # Hide the range slider
+        xaxis_showgrid=False,  # Disable grid for cleaner look
+        margin=dict(l=0, r=0, t=100, b=40),  # Adjust margins
+        height=600,  # Set height for better presentation
+        width=800,   # Set width for better presentation
+        xaxis=dict(
+            type='category',  # Set x-axis to category to avoid gaps
+            tickvals=[],  # Clear tick values to stop displaying dates
+            ticktext=[],  # Clear tick text to stop displaying dates
+            fixedrange=False,  # Disable zooming on x-axis
+            range=[0, 24],
+            autorange=True
+        ),
+        yaxis=dict(
+            autorange=True,
+            fixedrange=True  # Disable zooming on y-axis
+        ),
+        dragmode='pan',  # Enable panning mode
+        shapes=shapes,
+        annotations=annotations,
+    )
+    return go.Figure(data=[candles], layout=layout)
+
+
+def zone_chart(row, window, series=None, zoom=ZOOM_ZONE):
+    # Zone: the candles around the zone (the pattern's ohlcRef window). Full
+    # history: the whole series, decimated outside that window.
+    if zoom != ZOOM_FULL or series is None:
+        return cached_figure(("zone",) + zone_chart_id(row), build_zone_chart, row, window)
+    candles = decimated_series(row['ohlcRef'][0], series, keep=(window.index[0], window.index[-1]))
+    return cached_figure(("zone", zoom) + zone_chart_id(row), build_zone_chart, row, candles)
@@ -0,0 +1,640 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+# Detection engine shared by the Streamlit scanners, the process pool workers
+# and any other caller that must not pull in Streamlit or plotting.
+
+ENGINE_VERSION = 3  # bump whenever detection output changes; keys the scan cache
+
+# ---------------- ZONE RULES (app.py scanner) ---------------- #
+def is_explosive(c, avg):
+    return (c["High"] - c["Low"]) >= 2 * avg
+
+def is_one_touch(df, zh, zl, idx):
+    touches = 0
+    for _, r in df.iloc[idx+1:].iterrows():
+        if r["High"] >= zl and r["Low"] <= zh:
+            touches += 1
+        if touches > 1:
+            return False
+    return True
+
+def within_1_percent(price, zh, zl):
+    if price > zh:
+        d = (price - zh) / price * 100
+    elif price < zl:
+        d = (zl - price) / price * 100
+    else:
+        d = 0
+    return d <= 1
+
+def rr_ok(entry, sl, target):
+    risk = abs(entry - sl)
+    reward = abs(target - entry)
+    return risk > 0 and reward / risk >= 3
+
+# ---------------- ZONE DETECTION ---------------- #
+def detect_zones(df, tf):
+    results = []
+    avg_range = (df["High"] - df["Low"]).rolling(20).mean()
+    max_base = 3 if tf in ["15m","30m","60m","75m","120m","125m","240m"] else 6
+    price = df.iloc[-1]["Close"]
+
+    for i in range(len(df) - max_base - 2):
+        leg_in = df.iloc[i]
+        base = df.iloc[i+1:i+1+max_base]
+        leg_out = df.iloc[i+1+max_base]
+
+        if base.empty:
+            continue
+
+        zh, zl = base["High"].max(), base["Low"].min()
+
+        # -------- SUPPLY -------- #
+        if (
+            leg_in["Close"] > leg_in["Open"]
+            and leg_out["Close"] < leg_out["Open"]
+            and is_explosive(leg_in, avg_range.iloc[i])
+            and is_explosive(leg_out, avg_range.iloc[i])
+        ):
+            entry = zh
+            sl = zh * 1.002
+            target = entry - (entry - sl) * 3
+
+            if (
+                is_one_touch(df, zh, zl, i)
+                and within_1_percent(price, zh, zl)
+                and rr_ok(entry, sl, target)
+            ):
+                results.append(
+                    ("Supply", entry, sl, target, zh, zl)
+                )
+
+        # -------- DEMAND -------- #
+        if (
+            leg_in["Close"] < leg_in["Open"]
+            and leg_out["Close"] > leg_out["Open"]
+            and is_explosive(leg_in, avg_range.iloc[i])
+            and is_explosive(leg_out, avg_range.iloc[i])
+        ):
+            entry = zl
+            sl = zl * 0.998
+            target = entry + (entry - sl) * 3
+
+            if (
+                is_one_touch(df, zh, zl, i)
+                and within_1_percent(price, zh, zl)
+                and rr_ok(entry, sl, target)
+            ):
+                results.append(
+                    ("Demand", entry, sl, target, zh, zl)
+                )
+
+    return results
+
+
+# ---------------- PATTERN RULES (old_app.py scanner) ---------------- #
+def calculate_atr(stock_data, length=14):
+    stock_data['previous_close'] = stock_data['Close'].shift(1)
+    stock_data['tr1'] = abs(stock_data['High'] - stock_data['Low'])
+    stock_data['tr2'] = abs(stock_data['High'] - stock_data['previous_close'])
+    stock_data['tr3'] = abs(stock_data['Low'] - stock_data['previous_close'])
+    stock_data['TR'] = stock_data[['tr1', 'tr2', 'tr3']].max(axis=1)
+
+    def rma(series, length):
+        alpha = 1 / length
+        return series.ewm(alpha=alpha, adjust=False).mean()
+
+    stock_data['ATR'] = rma(stock_data['TR'], length)
+    stock_data['Candle_Range'] = stock_data['High'] - stock_data['Low']
+    stock_data['Candle_Body'] = abs(stock_data['Close'] - stock_data['Open'])
+    return stock_data
+
+def zone_date_format(interval_key):
+    return '%Y-%m-%d' if interval_key in ('1 Day','1 Week','1 Month') else '%Y-%m-%d %H:%M:%S'
+
+def ohlc_window(n_rows, exit_index, i):
+    # Row positions [start, end) of the candles charted around a zone
+    start_index = max(0, i - 12)
+    end_index = min(n_rows, exit_index + 12 if exit_index is not None else (i + 12))
+    return start_index, end_index
+
+
+    
+def check_golden_crossover(stock_data_htf, pulse_check_start_date):
+    is_pulse_positive = ""  # Initialize an empty string to store the is_pulse_positive
+    isCandleGreen = ""
+    is_trend_up = ""  # Initialize is_trend_up
+    try:
+        # Calculate EMA20 and EMA50
+        stock_data_htf['EMA20'] = stock_data_htf['Close'].ewm(span=20, adjust=False).mean().round(2)
+        stock_data_htf['EMA50'] = stock_data_htf['Close'].ewm(span=50, adjust=False).mean().round(2)
+
+        # Drop rows with NaN values in EMA columns
+        stock_data_htf.dropna(subset=['EMA20', 'EMA50'], inplace=True)
+
+        # Identify crossover points
+        crossover_up = stock_data_htf['EMA20'] > stock_data_htf['EMA50']
+        crossover_down = stock_data_htf['EMA20'] < stock_data_htf['EMA50']
+
+        # Localize pulse_check_start_date to 'Asia/Kolkata'
+        # Check if pulse_check_start_date is timezone-aware
+        if pulse_check_start_date.tzinfo is None:
+             # Localize if it's naive
+             pulse_check_start_date = pulse_check_start_date.tz_localize('Asia/Kolkata')
+        else:
+             # Convert to 'Asia/Kolkata' timezone if it's already aware
+             pulse_check_start_date = pulse_check_start_date.tz_convert('Asia/Kolkata')
+        # Find the last index before the target date
+        last_index_before_staring_check = stock_data_htf.index[stock_data_htf.index < pulse_check_start_date]
+
+        if not last_index_before_staring_check.empty:
+            last_index_before_staring_check = last_index_before_staring_check[-1]
+
+            # Check crossover conditions just before the target date
+            if crossover_up.loc[last_index_before_staring_check]:
+                # Check if the crossover candle is bullish or bearish
+                if stock_data_htf['Close'].loc[last_index_before_staring_check] > stock_data_htf['Open'].loc[last_index_before_staring_check]:
+                    is_pulse_positive = "True"
+                    isCandleGreen = "True"
+                    
+                else:
+                    is_pulse_positive = "True"
+                    isCandleGreen = "False"
+            elif crossover_down.loc[last_index_before_staring_check]:
+                # Check if the crossover candle is bullish or bearish
+                if stock_data_htf['Close'].loc[last_index_before_staring_check] > stock_data_htf['Open'].loc[last_index_before_staring_check]:
+                    is_pulse_positive = "False"
+                    isCandleGreen = "True"
+                    
+                else:
+                    is_pulse_positive = "False "
+                    isCandleGreen = "False"
+                    
+            else:
+                is_pulse_positive = "invalid pulse"
+                isCandleGreen = "invalid closing"
+
+            # New logic for trend label
+            latest_candle_close = stock_data_htf['Close'].iloc[-1]
+            latest_candle_low = stock_data_htf['Low'].iloc[-1]
+            latest_candle_high = stock_data_htf['High'].iloc[-1]
+            latest_closing_price = round(stock_data_htf['Close'].iloc[-1], 2)
+            ema20 = stock_data_htf['EMA20']
+
+            if (latest_candle_close == ema20.iloc[-1] or 
+                (latest_candle_low <= ema20.iloc[-1] and latest_candle_high >= ema20.iloc[-1])):
+                is_trend_up = "None"
+            elif (latest_candle_close > ema20.iloc[-8] and latest_candle_close > ema20.iloc[-1]):
+                is_trend_up = "True"
+            elif (latest_candle_close < ema20.iloc[-8] and latest_candle_close < ema20.iloc[-1]):
+                is_trend_up = "False"
+
+        else:
+            is_pulse_positive = "No data"
+
+    except Exception as e:
+        is_pulse_positive = f"({e})"
+
+    return is_pulse_positive, isCandleGreen, is_trend_up  # Return the is_pulse_positive string and trend label
+
+
+def validate_time_condition(legoutDate, entry_date, interval_key, current_time=None):
+    time_delay = {
+        '1 Minute': timedelta(minutes=15),
+        '3 Minutes': timedelta(minutes=75),
+        '5 Minutes': timedelta(minutes=75),
+        '10 Minutes': timedelta(days=1),
+        '15 Minutes': timedelta(days=1),
+        '125 Minutes': timedelta(hours=12),
+        '4 Hours': timedelta(days=3)
+    }
+    
+    # Get the required time delay for the given interval key
+    require_time_delay = time_delay.get(interval_key, timedelta(days=7))  # Default to 7 days if not found
+
+    ist = pytz.timezone('Asia/Kolkata')
+    # current_time: the moment the scan runs (a replay passes the bar's close)
+    if current_time is None:
+        current_time = datetime.now(ist)
+
+    # Convert legoutDate to datetime if it's a string
+    if isinstance(legoutDate, str):
+        legoutDate = datetime.fromisoformat(legoutDate)  # Adjust format as necessary
+    legout_date_formatting = legoutDate.tz_localize(ist) if legoutDate.tzinfo is None else legoutDate.astimezone(ist)
+
+    if entry_date is not None:
+        # Convert entry_date to datetime if it's a string
+        if isinstance(entry_date, str):
+            entry_date = datetime.fromisoformat(entry_date)  # Adjust format as necessary
+        entry_date_formatting = entry_date.tz_localize(ist) if entry_date.tzinfo is None else entry_date.astimezone(ist)
+        return entry_date_formatting > legout_date_formatting + require_time_delay
+    else:
+        return current_time > legout_date_formatting + require_time_delay
+
+
+# ---------------- PATTERN DETECTION (old_app.py scanner) ---------------- #
+# find_patterns is built from three pieces that the batch scan and the
+# streaming detector (zone_stream.py) share: zone_setups() finds the zones
+# whose leg-out is candle i, ZoneOutcome walks the candles after a zone to its
+# entry / exit, and pattern_dict() builds the result row for the current bar.
+
+PATTERN_BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'TR', 'ATR', 'Candle_Range', 'Candle_Body')
+
+
+def pattern_bars(stock_data):
+    # calculate_atr columns as plain arrays; the rules index them candle by candle
+    return {name: stock_data[name].to_numpy(dtype=float) for name in PATTERN_BAR_COLUMNS}
+
+
+def _rule_checks(rules, legout_not_covered, legout_formation, wick_in_legin, legin_tr):
+    # The optional leg-in checks switched on in the sidebar (time validation
+    # is applied by pattern_dict, as it depends on the clock)
+    return ((not rules['candle_behinde_legin_check_allowed'] or legout_not_covered) and
+            (not rules['legout_formation_check_allowed'] or legout_formation) and
+            (not rules['wick_in_legin_allowed'] or wick_in_legin) and
+            (not rules['legin_tr_atr_check_allowed'] or legin_tr))
+
+
+def _demand_legout(bars, n, i, rules, legin_range, one_candle_ok):
+    # (legoutCount, multi-candle leg-out range or None, first candle of the entry walk)
+    O, H, L, C, CR = bars['Open'], bars['High'], bars['Low'], bars['Close'], bars['Candle_Range']
+    one, three = rules['one_legout_count_allowed'], rules['three_legout_count_allowed']
+    if (one or not three) and one_candle_ok:
+        return 1, None, i + 1
+
+    last_legout_high = []
+    j = i + 1
+    if not one and not three:
+        while j in range(i + 1, min(i + 3, n)) and C[j] > O[j]:
+            if j == i + 1:
+                if O[j] >= 0.10 * C[i] and L[j] >= 0.50 * CR[i]:
+                    last_legout_high.append(H[j])
+            elif j == i + 2:
+                if L[j] >= L[i + 1]:
+                    last_legout_high.append(H[j])
+            j += 1
+        legout_count = (j - i) + 1
+    elif three:
+        while j in range(i + 1, min(i + 3, n)) and C[j] > O[j]:
+            if j == i + 2:
+                if O[i + 1] >= 0.10 * C[i] and L[i + 1] >= 0.50 * CR[i] and L[j] >= L[i + 1]:
+                    last_legout_high.append(H[j])
+            j += 1
+        legout_count = 3
+    else:
+        return None
+
+    if last_legout_high:
+        actual_legout_candle_range = max(last_legout_high) - C[i - 1]
+        if actual_legout_candle_range >= 2 * legin_range:
+            return legout_count, actual_legout_candle_range, j + 1
+    return None
+
+
+def _supply_legout(bars, n, i, rules, legin_range, one_candle_ok):
+    O, H, L, C, CR = bars['Open'], bars['High'], bars['Low'], bars['Close'], bars['Candle_Range']
+    one, three = rules['one_legout_count_allowed'], rules['three_legout_count_allowed']
+    if (one or not three) and one_candle_ok:
+        return 1, None, i + 1
+
+    last_legout_low = []
+    j = i + 1
+    if not one and not three:
+        # Only the first extra red candle can extend a supply leg-out
+        while j in range(i + 1, min(i + 3, n)) and O[j] > C[j]:
+            if j == i + 1:
+                if O[j] <= 0.10 * C[i] and H[j] <= 0.50 * CR[i]:
+                    last_legout_low.append(L[j])
+            j += 1
+        legout_count = (j - i) + 1
+    elif three:
+        while j in range(i + 1, min(i + 3, n)) and O[j] > C[j]:
+            if j == i + 2:
+                if O[j] <= 0.10 * C[i] and H[j] <= 0.50 * CR[i] and H[j] <= H[i + 1]:
+                    last_legout_low.append(L[j])
+            j += 1
+        legout_count = 3
+    else:
+        return None
+
+    if last_legout_low:
+        actual_legout_candle_range = abs(min(last_legout_low) - C[i - 1])
+        if actual_legout_candle_range >= 2 * legin_range:
+            return legout_count, actual_legout_candle_range, j + 1
+    return None
+
+
+def zone_setups(bars, n, i, rules):
+    # Zones whose leg-out is candle i, judged on the first n candles: demand
+    # then supply, one per base count that qualifies. Only candles up to
+    # i + 2 are read, so the result is final once n > i + 2.
+    O, H, L, C = bars['Open'], bars['High'], bars['Low'], bars['Close']
+    TR, ATR, CR, CB = bars['TR'], bars['ATR'], bars['Candle_Range'], bars['Candle_Body']
+    setups = []
+    for demand in (True, False):
+        if demand and not (rules['scan_demand_zone_allowed'] and C[i] > O[i] and TR[i] > ATR[i]):
+            continue
+        if not demand and not (rules['scan_supply_zone_allowed'] and O[i] > C[i] and TR[i] > ATR[i]):
+            continue
+        if demand:
+            white_area = O[i] >= C[i - 1] if C[i - 1] > O[i - 1] else O[i] >= O[i - 1]
+        else:
+            white_area = O[i] <= C[i - 1] if C[i - 1] < O[i - 1] else O[i] <= O[i - 1]
+        if rules['whitearea_check_allowed'] and not white_area:
+            continue
+        first_legout_candle_range = H[i] - L[i]
+        if not abs(C[i] - O[i]) >= 0.6 * first_legout_candle_range:
+            continue
+        first_legout_candle_range_for_one_two_ka_four = H[i] - C[i - 1] if demand else C[i - 1] - L[i]
+
+        for base_candles_count in range(1, rules['max_base_candles'] + 1):
+            legin = i - (base_candles_count + 1)
+            if legin < 1:
+                break  # the leg-in (and the candle behind it) must exist
+            legin_candle_body, legin_candle_range = CB[legin], CR[legin]
+            if not (legin_candle_body >= 0.60 * legin_candle_range and TR[legin] > 0.8 * ATR[legin]):
+                continue
+            if not all(ATR[i - k] > TR[i - k] for k in range(1, base_candles_count + 1)):
+                continue
+
+            max_high_price = H[i - base_candles_count:i].max()
+            min_low_price = L[i - base_candles_count:i].min()
+            actual_base_candle_range = max_high_price - min_low_price
+            opposite_color_exist = ((C[legin] > O[legin] and C[legin - 1] < O[legin - 1]) or
+                                    (C[legin] < O[legin] and C[legin - 1] > O[legin - 1]))
+            legout_not_covered = CB[legin - 1] < CB[legin] * 0.50 if opposite_color_exist else True
+            if demand:
+                legout_formation = O[i] <= C[legin] + legin_candle_body
+                legin_beyond_legout = L[i] >= L[legin]
+            else:
+                legout_formation = O[i] >= C[legin] - legin_candle_body
+                legin_beyond_legout = H[i] <= H[legin]
+            wick_in_legin = ((C[legin] > O[legin] and H[legin] > C[legin]) or
+                             (O[legin] > C[legin] and L[legin] < C[legin]))
+            legin_tr = TR[legin] > ATR[legin]
+
+            if not (legin_candle_range >= (2 if rules['one_two_ka_four_check_allowed'] else 1.5) * actual_base_candle_range and
+                    legin_beyond_legout and
+                    _rule_checks(rules, legout_not_covered, legout_formation, wick_in_legin, legin_tr)):
+                continue
+            legout = (_demand_legout if demand else _supply_legout)(
+                bars, n, i, rules, legin_candle_range,
+                first_legout_candle_range_for_one_two_ka_four >= 2 * legin_candle_range)
+            if legout is None:
+                continue
+            legout_count, actual_legout_candle_range, start_index = legout
+
+            if demand:
+                zone_type = 'DZ(DBR)' if O[legin] > C[legin] else 'DZ(RBR)'
+            else:
+                zone_type = 'SZ(RBD)' if C[legin] > O[legin] else 'SZ(DBD)'
+            setups.append({
+                'demand': demand,
+                'zoneType': zone_type,
+                'legoutIndex': i,
+                'leginIndex': legin,
+                'baseCount': base_candles_count,
+                'legoutCount': legout_count,
+                'entryPrice': max_high_price,
+                'stopLoss': min_low_price,
+                'startIndex': start_index,
+                'firstLegoutRange': first_legout_candle_range,
+                'ranges': (legin_candle_range, actual_base_candle_range,
+                           actual_legout_candle_range if actual_legout_candle_range is not None
+                           else first_legout_candle_range_for_one_two_ka_four),
+                'isWhiteArea': white_area,
+                'legoutNotCovered': legout_not_covered,
+                'isLegoutFormation': legout_formation,
+                'isWickInLegin': wick_in_legin,
+                'isLeginTrPass': legin_tr,
+                'isOneTwoKaFour': legin_candle_range >= 2 * actual_base_candle_range,
+            })
+    return setups
+
+
+class ZoneOutcome:
+    # Entry / exit of one setup plus its legout-covered state, advanced one
+    # candle at a time: step() from startIndex on, scan() from the leg-out on
+    __slots__ = ('setup', 'target', 'limit', 'half', 'entry_index', 'exit_index', 'status',
+                 'crossed', 'covered', 'beyond', 'entry_covered')
+
+    def __init__(self, setup, reward_value):
+        max_high_price, min_low_price = setup['entryPrice'], setup['stopLoss']
+        total_risk = max_high_price - min_low_price
+        self.setup = setup
+        if setup['demand']:
+            self.target = (total_risk * reward_value) + max_high_price
+        else:
+            self.target = min_low_price - (total_risk * reward_value)
+        # Same (odd) limit and half-range level the legout-covered check has always used
+        extra = total_risk * reward_value if reward_value == 3 else 5
+        self.limit = extra + max_high_price if setup['demand'] else extra - min_low_price
+        self.half = setup['firstLegoutRange'] * 0.50
+        self.entry_index = None
+        self.exit_index = None
+        self.status = None
+        self.crossed = False
+        self.covered = False
+        self.beyond = False  # some candle since the leg-out broke the limit
+        self.entry_covered = None
+
+    def step(self, bars, m):
+        # Candle m of the entry / exit walk; True once the zone has exited
+        s = self.setup
+        high, low = bars['High'][m], bars['Low'][m]
+        if self.entry_index is None:
+            if not (low <= s['entryPrice'] if s['demand'] else high >= s['stopLoss']):
+                return False
+            self.entry_index = m
+            if s['demand']:
+                self.entry_covered = self.beyond or high > self.limit
+            else:
+                self.entry_covered = self.beyond or low < self.limit
+        if s['demand']:
+            if low < s['stopLoss']:
+                self.status = 'Stop loss'
+            elif high >= self.target:
+                self.status = 'Target'
+        else:
+            if high > s['entryPrice']:
+                self.status = 'Stop loss'
+            elif low <= self.target:
+                self.status = 'Target'
+        if self.status is not None:
+            self.exit_index = m
+            return True
+        return False
+
+    def scan(self, bars, m):
+        # Candle m of the legout-covered walk, which only counts while the
+        # zone is not entered: cross the half-range level, then break the limit
+        if self.setup['demand']:
+            broke = bars['High'][m] > self.limit
+            if not self.crossed:
+                self.crossed = bars['Low'][m] <= self.half
+            elif broke:
+                self.covered = True
+        else:
+            broke = bars['Low'][m] < self.limit
+            if not self.crossed:
+                self.crossed = bars['High'][m] >= self.half
+            elif broke:
+                self.covered = True
+        self.beyond = self.beyond or broke
+
+    def settle(self, bars, n):
+        # step() / scan() over every candle up to n at once
+        s = self.setup
+        H, L = bars['High'], bars['Low']
+        start = s['startIndex']
+        touched = np.flatnonzero(L[start:n] <= s['entryPrice'] if s['demand'] else H[start:n] >= s['stopLoss'])
+        i = s['legoutIndex']
+        if touched.size:
+            m = start + int(touched[0])
+            self.beyond = bool((H[i:m] > self.limit).any() if s['demand'] else (L[i:m] < self.limit).any())
+            if not self.step(bars, m):
+                after = slice(m + 1, n)
+                if s['demand']:
+                    exits = (L[after] < s['stopLoss']) | (H[after] >= self.target)
+                else:
+                    exits = (H[after] > s['entryPrice']) | (L[after] <= self.target)
+                hit = np.flatnonzero(exits)
+                if hit.size:
+                    self.step(bars, m + 1 + int(hit[0]))
+            return
+        crossed = np.flatnonzero(L[i:n] <= self.half if s['demand'] else H[i:n] >= self.half)
+        if crossed.size:
+            c = i + int(crossed[0])
+            self.crossed = True
+            self.covered = bool((H[c + 1:n] > self.limit).any() if s['demand'] else (L[c + 1:n] < self.limit).any())
+        self.beyond = bool((H[i:n] > self.limit).any() if s['demand'] else (L[i:n] < self.limit).any())
+
+    def legout_covered(self):
+        return self.entry_covered if self.entry_index is not None else self.covered
+
+    def zone_status(self, n):
+        # None while entered but not exited, or before any candle after the zone
+        if self.status is not None or self.entry_index is not None:
+            return self.status
+        return 'Fresh' if self.setup['startIndex'] < n else None
+
+
+def _flag(value):
+    return 'True' if value else 'False'
+
+
+def pattern_dict(symbol, interval_key, outcome, bars, times, n, rules, series_id=None, as_of=None):
+    # find_patterns' row for a tracked zone as of candle n - 1, or None when
+    # the status / time / legout-covered / distance filters drop it; as_of is
+    # the clock the time validation compares against (default: now)
+    s = outcome.setup
+    i = s['legoutIndex']
+    zoneStatus = outcome.zone_status(n)
+    if not ((rules['fresh_zone_allowed'] and zoneStatus == 'Fresh') or
+            (rules['target_zone_allowed'] and zoneStatus == 'Target') or
+            (rules['stoploss_zone_allowed'] and zoneStatus == 'Stop loss')):
+        return None
+
+    entry_date = times[outcome.entry_index] if outcome.entry_index is not None else None
+    exit_date = times[outcome.exit_index] if outcome.exit_index is not None else None
+    time_validated_pass = validate_time_condition(times[i], None, interval_key, as_of)
+    if rules['time_validation_allowed']:
+        if not time_validated_pass:
+            return None
+        if entry_date is not None and not validate_time_condition(times[i], entry_date, interval_key):
+            return None
+    legout_covered = outcome.legout_covered()
+    if rules['legout_covered_check_allowed'] and not legout_covered:
+        return None
+
+    latest_closing_price = round(bars['Close'][n - 1], 2)
+    if s['demand']:
+        zone_distance = (math.floor(latest_closing_price) - s['entryPrice']) / s['entryPrice'] * 100
+        legin_base_legout_ranges = ":".join(str(round(value)) for value in s['ranges'])
+    else:
+        zone_distance = (s['stopLoss'] - math.floor(latest_closing_price)) / s['stopLoss'] * 100
+        legin_base_legout_ranges = ":".join(str(round(value, 2)) for value in s['ranges'])
+    if not zone_distance <= rules['user_input_zone_distance']:
+        return None
+
+    date_format = zone_date_format(interval_key)
+    return {
+        'Symbol': symbol,
+        'timeFrame': interval_key,
+        'zoneStatus': zoneStatus,
+        'zoneType': s['zoneType'],
+        'entryPrice': s['entryPrice'],
+        'stopLoss': s['stopLoss'],
+        'Target': outcome.target,
+
+        'isWhiteArea': _flag(s['isWhiteArea']),
+        'legoutNotCovered': _flag(s['legoutNotCovered']),
+        'isLegoutFormation': _flag(s['isLegoutFormation']),
+        'isWickInLegin': _flag(s['isWickInLegin']),
+        'isTimeValidationPass': _flag(time_validated_pass),
+        'isLeginTrPass': _flag(s['isLeginTrPass']),
+        'isLegoutCovered': _flag(legout_covered),
+        'legoutCount': s['legoutCount'],
+        'isOneTwoKaFour': _flag(s['isOneTwoKaFour']),
+
+        'entryDate': entry_date,
+        'exitDate': exit_date,
+        'exitIndex': outcome.exit_index,
+        'entryIndex': outcome.entry_index,
+        'zoneDistance': zone_distance.round(2),
+        'leginDate': times[s['leginIndex']].strftime(date_format),
+        'baseCount': s['baseCount'],
+        'legoutDate': times[i].strftime(date_format),
+        'leginIndex': s['leginIndex'],
+        'legoutIndex': i,
+        'leginBaseLegoutRanges': legin_base_legout_ranges,
+        'ohlcRef': (series_id,) + ohlc_window(n, outcome.exit_index, i),
+        'closePrice': latest_closing_price,
+    }
+
+
+def pattern_rules(**params):
+    # The find_patterns parameters the detection rules read
+    return {name: params[name] for name in RULE_NAMES}
+
+
+RULE_NAMES = ('max_base_candles', 'scan_demand_zone_allowed', 'scan_supply_zone_allowed',
+              'fresh_zone_allowed', 'target_zone_allowed', 'stoploss_zone_allowed',
+              'candle_behinde_legin_check_allowed', 'whitearea_check_allowed',
+              'legout_formation_check_allowed', 'wick_in_legin_allowed', 'time_validation_allowed',
+              'legin_tr_atr_check_allowed', 'one_legout_count_allowed', 'three_legout_count_allowed',
+              'legout_covered_check_allowed', 'one_two_ka_four_check_allowed', 'user_input_zone_distance')
+
+
+def find_patterns(symbol, stock_data, interval_key, max_base_candles, scan_demand_zone_allowed, scan_supply_zone_allowed,reward_value,fresh_zone_allowed,target_zone_allowed,stoploss_zone_allowed,candle_behinde_legin_check_allowed , whitearea_check_allowed,legout_formation_check_allowed, wick_in_legin_allowed, time_validation_allowed,legin_tr_atr_check_allowed, one_legout_count_allowed,three_legout_count_allowed,legout_covered_check_allowed,one_two_ka_four_check_allowed,htf_interval,user_input_zone_distance,max_zones=None,max_lookback_bars=None,series_id=None):
+    try:
+        if len(stock_data) < 3:
+            print(f"Not enough stock_data for {symbol}")
+            return []
+        rules = pattern_rules(**{name: value for name, value in locals().items() if name in RULE_NAMES})
+        bars = pattern_bars(stock_data)
+        times = stock_data.index
+        n = len(stock_data)
+
+        # Walk back from the newest bar; stop once enough fresh-most zones are found
+        # or the lookback window is exhausted, so the output is a prefix of the full scan
+        last_scanned_index = 2 if max_lookback_bars is None else max(2, n - 1 - max_lookback_bars)
+
+        patterns = []
+        for i in range(n - 1, last_scanned_index, -1):
+            if max_zones is not None and len(patterns) >= max_zones:
+                break
+            for setup in zone_setups(bars, n, i, rules):
+                outcome = ZoneOutcome(setup, reward_value)
+                outcome.settle(bars, n)
+                pattern = pattern_dict(symbol, interval_key, outcome, bars, times, n, rules, series_id)
+                if pattern is not None:
+                    patterns.append(pattern)
+        return patterns[:max_zones]
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+        return []
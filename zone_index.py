@@ -0,0 +1,184 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from zone_records import DEMAND_TYPES, ZONE_STATUSES
+
+# Per-symbol index of the active (Fresh) zones of a scan, keyed by their
+# [low, high] price range. Each symbol keeps its zone bounds in sorted lists,
+# so "which zones is price inside?" and "which zones are nearest?" are a
+# bisect plus the matches instead of a pass over the whole results table.
+# Zones leave the index as they are consumed (entered, target or stop loss):
+# a removed zone is only marked dead in its symbol's view and skipped by the
+# queries, and the view is rebuilt once the dead outnumber half the live
+# zones, so a burst of fills costs amortised O(1) rebuild work per zone.
+
+FRESH = ZONE_STATUSES.index('Fresh')
+
+
+def zone_bounds(record):
+    # (low, high) of a zone; find_patterns stores entry/stop the same way for
+    # both sides, so take the min / max rather than trusting the labels
+    entry, stop = float(record['entryPrice']), float(record['stopLoss'])
+    return min(entry, stop), max(entry, stop)
+
+
+def is_demand(record):
+    return int(record['zoneType']) < len(DEMAND_TYPES)
+
+
+class _SymbolZones:
+    # Sorted view of one symbol's zones; `dead` holds the ids removed since
+    # it was built, which every query skips
+    __slots__ = ('edges', 'at_edge', 'inside', 'lows', 'low_ids', 'highs', 'high_ids',
+                 'demand_tops', 'demand_ids', 'supply_bottoms', 'supply_ids', 'dead')
+
+    def __init__(self, bounds):
+        # bounds: {zone_id: (low, high, demand)}
+        self.dead = set()
+        by_low = sorted((low, zone_id) for zone_id, (low, high, _) in bounds.items())
+        by_high = sorted((high, zone_id) for zone_id, (low, high, _) in bounds.items())
+        self.lows = [low for low, _ in by_low]
+        self.low_ids = [zone_id for _, zone_id in by_low]
+        self.highs = [high for high, _ in by_high]
+        self.high_ids = [zone_id for _, zone_id in by_high]
+        tops = sorted((high, zone_id) for zone_id, (low, high, demand) in bounds.items() if demand)
+        bottoms = sorted((low, zone_id) for zone_id, (low, high, demand) in bounds.items() if not demand)
+        self.demand_tops = [top for top, _ in tops]
+        self.demand_ids = [zone_id for _, zone_id in tops]
+        self.supply_bottoms = [bottom for bottom, _ in bottoms]
+        self.supply_ids = [zone_id for _, zone_id in bottoms]
+
+        # Stabbing table over the distinct bounds: at_edge[j] holds the zones
+        # containing edges[j], inside[j] those covering (edges[j], edges[j + 1])
+        self.edges = sorted({value for low, high, _ in bounds.values() for value in (low, high)})
+        self.at_edge = [[] for _ in self.edges]
+        self.inside = [[] for _ in self.edges]
+        for zone_id, (low, high, _) in bounds.items():
+            a, b = bisect_left(self.edges, low), bisect_left(self.edges, high)
+            for j in range(a, b + 1):
+                self.at_edge[j].append(zone_id)
+            for j in range(a, b):
+                self.inside[j].append(zone_id)
+
+    def containing(self, price):
+        j = bisect_right(self.edges, price) - 1
+        if j < 0:
+            return []
+        return [zone_id for zone_id in (self.at_edge[j] if self.edges[j] == price else self.inside[j])
+                if zone_id not in self.dead]
+
+    def nearest(self, price, k):
+        # Zones at distance 0 first, then walk outwards from price: down the
+        # zones entirely below it (by high), up those entirely above (by low)
+        found = [(0.0, zone_id) for zone_id in self.containing(price)][:k]
+        below = bisect_left(self.highs, price) - 1
+        above = bisect_right(self.lows, price)
+        while len(found) < k and (below >= 0 or above < len(self.lows)):
+            down = price - self.highs[below] if below >= 0 else None
+            up = self.lows[above] - price if above < len(self.lows) else None
+            if up is None or (down is not None and down <= up):
+                if self.high_ids[below] not in self.dead:
+                    found.append((down, self.high_ids[below]))
+                below -= 1
+            else:
+                if self.low_ids[above] not in self.dead:
+                    found.append((up, self.low_ids[above]))
+                above += 1
+        return found
+
+    def closest(self, price):
+        # Nearest zone in zoneDistance terms (% above a demand top / below a
+        # supply bottom); zones price already trades into are not candidates
+        best = None
+        j = bisect_right(self.demand_tops, price) - 1
+        while j >= 0 and self.demand_ids[j] in self.dead:
+            j -= 1
+        if j >= 0:
+            top = self.demand_tops[j]
+            best = ((price - top) / top * 100, self.demand_ids[j])
+        j = bisect_left(self.supply_bottoms, price)
+        while j < len(self.supply_bottoms) and self.supply_ids[j] in self.dead:
+            j += 1
+        if j < len(self.supply_bottoms):
+            bottom = self.supply_bottoms[j]
+            distance = (bottom - price) / bottom * 100
+            if best is None or distance < best[0]:
+                best = (distance, self.supply_ids[j])
+        return best
+
+
+class ZoneIndex:
+    def __init__(self, batches=()):
+        self._zones = {}  # zone_id -> (symbol, timeframe, record)
+        self._bounds = {}  # symbol -> {zone_id: (low, high, demand)}
+        self._symbols = {}  # symbol -> _SymbolZones
+        self._lock = threading.Lock()
+        for batch in batches:
+            self.add(batch)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._zones)
+
+    def add(self, batch):
+        # Index the Fresh zones of one ZoneBatch
+        fresh = batch.records[batch.records['zoneStatus'] == FRESH]
+        if not len(fresh):
+            return
+        with self._lock:
+            bounds = self._bounds.setdefault(batch.symbol, {})
+            for record in fresh:
+                zone_id = int(record['zoneId'])
+                self._zones[zone_id] = (batch.symbol, batch.timeframe, record.copy())
+                bounds[zone_id] = zone_bounds(record) + (is_demand(record),)
+            self._symbols[batch.symbol] = _SymbolZones(bounds)
+
+    def remove(self, zone_id):
+        # A consumed zone stops being active; returns its entry, or None
+        with self._lock:
+            entry = self._zones.pop(zone_id, None)
+            if entry is None:
+                return None
+            symbol = entry[0]
+            bounds = self._bounds[symbol]
+            del bounds[zone_id]
+            if bounds:
+                zones = self._symbols[symbol]
+                zones.dead.add(zone_id)
+                if len(zones.dead) * 2 > len(bounds):
+                    self._symbols[symbol] = _SymbolZones(bounds)
+            else:
+                del self._bounds[symbol]
+                del self._symbols[symbol]
+            return entry
+
+    def zone(self, zone_id):
+        with self._lock:
+            return self._zones.get(zone_id)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._symbols)
+
+    def zones_of(self, symbol):
+        with self._lock:
+            return list(self._bounds.get(symbol, ()))
+
+    def containing(self, symbol, price):
+        # Ids of the active zones whose [low, high] contains price
+        with self._lock:
+            zones = self._symbols.get(symbol)
+        return zones.containing(price) if zones is not None else []
+
+    def nearest(self, symbol, price, k=1):
+        # Up to k (distance, zone_id) pairs, closest first; distance is 0 inside a zone
+        with self._lock:
+            zones = self._symbols.get(symbol)
+        return zones.nearest(price, k) if zones is not None else []
+
+    def closest(self, symbol, price):
+        # (zoneDistance %, zone_id) of the symbol's closest fresh zone, or None
+        with self._lock:
+            zones = self._symbols.get(symbol)
+        return zones.closest(price) if zones is not None else None
+
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Whole-universe version of app.detect_zones: every symbol of one timeframe is
+# packed into padded (symbols x bars) arrays and the leg-in / base / leg-out and
+# outcome rules are evaluated on the whole block at once.
+
+INTRADAY_TIMEFRAMES = ["15m", "30m", "60m", "75m", "120m", "125m", "240m"]
+AVG_RANGE_LENGTH = 20
+ONE_TOUCH_CHUNK = 256  # candidate zones per one-touch broadcast
+ENGINE_VERSION = 1  # bump whenever detection output changes; keys the scan cache
+
+ZONE_COLUMNS = ["Symbol", "Type", "Entry", "SL", "Target", "ZoneHigh", "ZoneLow", "Bar", "Time"]
+
+
+def max_base_for(tf):
+    return 3 if tf in INTRADAY_TIMEFRAMES else 6
+
+
+# ---------------- PACKING ---------------- #
+def pack_universe(frames):
+    # Right-align every symbol so its latest bar sits in the last column; the
+    # left padding is NaN and masked out by `valid`.
+    symbols = [s for s, df in frames.items() if df is not None and not df.empty]
+    n_bars = max((len(frames[s]) for s in symbols), default=0)
+    shape = (len(symbols), n_bars)
+
+    block = {c: np.full(shape, np.nan) for c in ("Open", "High", "Low", "Close")}
+    times = np.full(shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+    valid = np.zeros(shape, dtype=bool)
+    start = np.zeros(len(symbols), dtype=np.int64)
+
+    for s, symbol in enumerate(symbols):
+        df = frames[symbol]
+        first = n_bars - len(df)
+        for c in block:
+            block[c][s, first:] = df[c].to_numpy(dtype=float).ravel()
+        index = df.index.tz_localize(None) if getattr(df.index, "tz", None) is not None else df.index
+        times[s, first:] = index.to_numpy(dtype="datetime64[ns]")
+        valid[s, first:] = True
+        start[s] = first
+
+    return {"symbols": symbols, "valid": valid, "start": start, "times": times, **block}
+
+
+# ---------------- KERNEL ---------------- #
+def _rolling_mean(values, length):
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= length:
+        out[:, length - 1:] = sliding_window_view(values, length, axis=1).mean(axis=2)
+    return out
+
+
+def _one_touch(high, low, valid, rows, cols, zh, zl):
+    # Same rule as app.is_one_touch: at most one later bar overlaps [zl, zh]
+    n_cols = high.shape[1]
+    keep = np.zeros(len(rows), dtype=bool)
+    for first in range(0, len(rows), ONE_TOUCH_CHUNK):
+        part = slice(first, first + ONE_TOUCH_CHUNK)
+        r, c = rows[part], cols[part]
+        after = np.arange(n_cols)[None, :] > c[:, None]
+        touch = (high[r] >= zl[part, None]) & (low[r] <= zh[part, None]) & valid[r] & after
+        keep[part] = touch.sum(axis=1) <= 1
+    return keep
+
+
+def detect_zones_block(packed, tf):
+    O, H, L, C = packed["Open"], packed["High"], packed["Low"], packed["Close"]
+    valid = packed["valid"]
+    n_symbols, n_bars = H.shape
+    max_base = max_base_for(tf)
+    n_legin = n_bars - max_base - 2
+    if n_symbols == 0 or n_legin <= 0:
+        return pd.DataFrame(columns=ZONE_COLUMNS)
+
+    candle_range = H - L
+    avg_range = _rolling_mean(candle_range, AVG_RANGE_LENGTH)
+
+    legin = slice(0, n_legin)
+    legout = slice(max_base + 1, max_base + 1 + n_legin)
+    zh = sliding_window_view(H, max_base, axis=1)[:, 1:n_legin + 1].max(axis=2)
+    zl = sliding_window_view(L, max_base, axis=1)[:, 1:n_legin + 1].min(axis=2)
+
+    explosive = (
+        (candle_range[:, legin] >= 2 * avg_range[:, legin])
+        & (candle_range[:, legout] >= 2 * avg_range[:, legin])
+        & valid[:, legin]
+    )
+    supply = explosive & (C[:, legin] > O[:, legin]) & (C[:, legout] < O[:, legout])
+    demand = explosive & (C[:, legin] < O[:, legin]) & (C[:, legout] > O[:, legout])
+
+    # Entry / SL / target exactly as the scalar version computes them
+    entry = np.where(supply, zh, zl)
+    sl = np.where(supply, zh * 1.002, zl * 0.998)
+    target = np.where(supply, entry - (entry - sl) * 3, entry + (entry - sl) * 3)
+
+    price = C[:, -1:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distance = np.where(price > zh, (price - zh) / price * 100,
+                            np.where(price < zl, (zl - price) / price * 100, 0))
+        risk = np.abs(entry - sl)
+        rr = (risk > 0) & (np.abs(target - entry) / risk >= 3)
+
+    rows, cols = np.nonzero((supply | demand) & (distance <= 1) & rr)
+    keep = _one_touch(H, L, valid, rows, cols, zh[rows, cols], zl[rows, cols])
+    rows, cols = rows[keep], cols[keep]
+
+    symbols = np.asarray(packed["symbols"], dtype=object)
+    return pd.DataFrame({
+        "Symbol": symbols[rows],
+        "Type": np.where(supply[rows, cols], "Supply", "Demand"),
+        "Entry": entry[rows, cols],
+        "SL": sl[rows, cols],
+        "Target": target[rows, cols],
+        "ZoneHigh": zh[rows, cols],
+        "ZoneLow": zl[rows, cols],
+        "Bar": cols - packed["start"][rows],
+        "Time": packed["times"][rows, cols],
+    }, columns=ZONE_COLUMNS)
+
+
+def detect_zones_universe(frames, tf):
+    return detect_zones_block(pack_universe(frames), tf)
+
+
+def zones_by_symbol(table):
+    # Back to the (type, entry, sl, target, zh, zl) tuples plot_chart expects
+    zones = {}
+    for row in table.itertuples(index=False):
+        zones.setdefault(row.Symbol, []).append(
+            (row.Type, row.Entry, row.SL, row.Target, row.ZoneHigh, row.ZoneLow)
+        )
+    return zones
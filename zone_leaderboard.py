@@ -0,0 +1,71 @@
+import heapq
+import threading
+
+# Live "closest zones" ranking for the whole universe. Each symbol contributes
+# its closest fresh zone (ZoneIndex.closest, zoneDistance in %) to one global
+# min-heap. A price update pushes a new entry and bumps the symbol's version;
+# superseded entries stay in the heap and are dropped when they surface
+# (lazy deletion), so an update costs O(log zones + log symbols) and top(k)
+# never re-sorts the universe.
+
+# Rebuild the heap once stale entries outnumber live ones by this factor
+COMPACT_FACTOR = 4
+
+
+class Leaderboard:
+    def __init__(self, index, prices=None):
+        self.index = index
+        self._heap = []  # (distance, version, symbol, zone_id)
+        self._current = {}  # symbol -> (distance, version, zone_id)
+        self._version = 0
+        self._lock = threading.Lock()
+        if prices is None:
+            # Start from the close each symbol was scanned at
+            prices = {}
+            for symbol in index.symbols():
+                zones = index.zones_of(symbol)
+                if zones:
+                    prices[symbol] = float(index.zone(zones[0])[2]['closePrice'])
+        for symbol, price in prices.items():
+            self.update(symbol, price)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._current)
+
+    def update(self, symbol, price):
+        best = self.index.closest(symbol, price)
+        with self._lock:
+            self._version += 1
+            if best is None:
+                self._current.pop(symbol, None)
+            else:
+                distance, zone_id = best
+                self._current[symbol] = (distance, self._version, zone_id)
+                heapq.heappush(self._heap, (distance, self._version, symbol, zone_id))
+            if len(self._heap) > COMPACT_FACTOR * len(self._current) + 64:
+                self._compact()
+
+    def _compact(self):
+        self._heap = [(distance, version, symbol, zone_id)
+                      for symbol, (distance, version, zone_id) in self._current.items()]
+        heapq.heapify(self._heap)
+
+    def distance(self, symbol):
+        with self._lock:
+            current = self._current.get(symbol)
+        return current[0] if current is not None else None
+
+    def top(self, k=10):
+        # The k closest setups as (distance %, symbol, zone_id)
+        with self._lock:
+            found = []
+            while self._heap and len(found) < k:
+                item = heapq.heappop(self._heap)
+                distance, version, symbol, zone_id = item
+                current = self._current.get(symbol)
+                if current is not None and current[1] == version:
+                    found.append(item)
+            for item in found:
+                heapq.heappush(self._heap, item)
+        return [(distance, symbol, zone_id) for distance, _, symbol, zone_id in found]
@@ -0,0 +1,258 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from zone_engine import zone_date_format
+
+# Compact zone records for the old_app scanner. find_patterns builds one dict
+# (~25 keys, flags as 'True'/'False' strings) per zone; scan results instead
+# keep one structured array per symbol/timeframe with real numeric fields and
+# the eight validation flags packed into a bitmask. zones_frame() turns a scan's
+# records back into the familiar patterns table for display.
+
+ZONE_STATUSES = ('Fresh', 'Target', 'Stop loss')
+ZONE_TYPES = ('DZ(RBR)', 'DZ(DBR)', 'SZ(RBD)', 'SZ(DBD)')
+DEMAND_TYPES = ZONE_TYPES[:2]
+FLAG_FIELDS = ('isWhiteArea', 'legoutNotCovered', 'isLegoutFormation', 'isWickInLegin',
+               'isTimeValidationPass', 'isLeginTrPass', 'isLegoutCovered', 'isOneTwoKaFour')
+FLAG_BITS = {name: 1 << n for n, name in enumerate(FLAG_FIELDS)}
+
+RECORD_VERSION = 2  # bump whenever ZONE_DTYPE changes; keys saved scan checkpoints
+
+ZONE_DTYPE = np.dtype([
+    ('zoneStatus', 'u1'), ('zoneType', 'u1'), ('flags', 'u1'),
+    ('legoutCount', 'u1'), ('baseCount', 'u1'),
+    ('entryPrice', 'f8'), ('stopLoss', 'f8'), ('Target', 'f8'),
+    ('zoneDistance', 'f8'), ('closePrice', 'f8'),
+    ('leginRange', 'f8'), ('baseRange', 'f8'), ('legoutRange', 'f8'),
+    ('leginTime', 'M8[ns]'), ('legoutTime', 'M8[ns]'),
+    ('entryTime', 'M8[ns]'), ('exitTime', 'M8[ns]'),
+    ('leginIndex', 'i4'), ('legoutIndex', 'i4'),
+    ('entryIndex', 'i4'), ('exitIndex', 'i4'),  # -1 = no entry / exit yet
+    ('ohlcStart', 'i4'), ('ohlcEnd', 'i4'),
+    ('zoneId', 'u8'), ('mergedCount', 'u2'),
+])
+
+# Column order of the dicts find_patterns returns
+PATTERN_COLUMNS = (['Symbol', 'timeFrame', 'zoneStatus', 'zoneType', 'entryPrice', 'stopLoss', 'Target']
+                   + list(FLAG_FIELDS[:7]) + ['legoutCount', 'isOneTwoKaFour', 'entryDate', 'exitDate',
+                   'exitIndex', 'entryIndex', 'zoneDistance', 'leginDate', 'baseCount', 'legoutDate',
+                   'leginIndex', 'legoutIndex', 'leginBaseLegoutRanges', 'ohlcRef', 'closePrice'])
+EXTRA_COLUMNS = ['zoneId', 'mergedCount', 'flags']
+
+# Fields that identify a zone within its symbol / timeframe
+ID_DTYPE = np.dtype([('leginTime', 'M8[ns]'), ('legoutTime', 'M8[ns]'),
+                     ('entryPrice', 'f8'), ('stopLoss', 'f8')])
+
+
+class ZoneBatch:
+    # The zones found for one symbol / timeframe scan
+    __slots__ = ('symbol', 'timeframe', 'series_id', 'records', 'tz')
+
+    def __init__(self, symbol, timeframe, series_id, records, tz=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.series_id = series_id
+        self.records = records  # ZONE_DTYPE, times stored as UTC
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.records)
+
+
+def has_flag(flags, name):
+    # Works on a single bitmask or a whole column
+    return (flags & FLAG_BITS[name]) != 0
+
+
+def encode_zones(patterns, stock_data):
+    records = np.zeros(len(patterns), dtype=ZONE_DTYPE)
+    times = stock_data.index.as_unit('ns')
+    if times.tz is not None:
+        times = times.tz_convert('UTC').tz_localize(None)
+    times = times.to_numpy()
+    for n, p in enumerate(patterns):
+        r = records[n]
+        r['zoneStatus'] = ZONE_STATUSES.index(p['zoneStatus'])
+        r['zoneType'] = ZONE_TYPES.index(p['zoneType'])
+        r['flags'] = sum(bit for name, bit in FLAG_BITS.items() if p[name] == 'True')
+        for name in ('legoutCount', 'baseCount', 'entryPrice', 'stopLoss', 'Target', 'zoneDistance',
+                     'closePrice', 'leginIndex', 'legoutIndex'):
+            r[name] = p[name]
+        r['leginRange'], r['baseRange'], r['legoutRange'] = map(float, p['leginBaseLegoutRanges'].split(':'))
+        r['entryIndex'] = -1 if p['entryIndex'] is None else p['entryIndex']
+        r['exitIndex'] = -1 if p['exitIndex'] is None else p['exitIndex']
+        r['ohlcStart'], r['ohlcEnd'] = p['ohlcRef'][1:]
+        r['leginTime'] = times[p['leginIndex']]
+        r['legoutTime'] = times[p['legoutIndex']]
+        r['entryTime'] = times[p['entryIndex']] if p['entryIndex'] is not None else np.datetime64('NaT')
+        r['exitTime'] = times[p['exitIndex']] if p['exitIndex'] is not None else np.datetime64('NaT')
+    if patterns:
+        records['zoneId'] = zone_ids(patterns[0]['Symbol'], patterns[0]['timeFrame'], records)
+    records['mergedCount'] = 1
+    return records
+
+
+# ---------------- IDENTITY ---------------- #
+def zone_ids(symbol, timeframe, records):
+    # Stable 64-bit id from symbol, timeframe, legin/legout time and bounds;
+    # the same zone keeps its id across rescans
+    keys = np.empty(len(records), dtype=ID_DTYPE)
+    for name in ID_DTYPE.names:
+        keys[name] = records[name]
+    prefix = f"{symbol}|{timeframe}|".encode()
+    raw = keys.tobytes()
+    size = ID_DTYPE.itemsize
+    return np.array([int.from_bytes(hashlib.blake2b(prefix + raw[n:n + size], digest_size=8).digest(), 'little')
+                     for n in range(0, len(raw), size)], dtype=np.uint64)
+
+
+def with_flag(batches, name):
+    # Keep only the zones that pass one validation flag
+    kept = []
+    for b in batches:
+        mask = has_flag(b.records['flags'], name)
+        kept.append(ZoneBatch(b.symbol, b.timeframe, b.series_id, b.records[mask], b.tz))
+    return kept
+
+
+# ---------------- OVERLAP MERGE ---------------- #
+def _root(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _overlap_clusters(groups, low, high, starts, ends):
+    # Connected components of "overlaps in price and in time" within each
+    # group. A sweep by low price keeps the zones whose range still reaches
+    # the current one; of those, only the ones whose lifetimes intersect are
+    # joined, so two zones are never merged through overlap on one axis alone
+    parent = list(range(len(low)))
+    low, high, starts, ends = low.tolist(), high.tolist(), starts.tolist(), ends.tolist()
+    active, group = [], None
+    for i in np.lexsort((low, groups)).tolist():
+        if groups[i] != group:
+            active, group = [], groups[i]
+        active = [j for j in active if high[j] > low[i]]
+        for j in active:
+            if starts[i] < ends[j] and starts[j] < ends[i]:
+                a, b = _root(parent, i), _root(parent, j)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+        active.append(i)
+    roots = [_root(parent, i) for i in range(len(parent))]
+    return np.unique(roots, return_inverse=True)[1]
+
+
+def merge_overlapping(batches):
+    # Collapse duplicate zones: same symbol and side (demand / supply), live at
+    # overlapping times and overlapping in price. Each cluster keeps one zone -
+    # the freshest status, then the latest leg-out, then the lowest zoneId - and
+    # records how many zones it absorbed in mergedCount.
+    batches = [b for b in batches if len(b)]
+    if not batches:
+        return batches
+    counts = [len(b) for b in batches]
+    records = np.concatenate([b.records for b in batches])
+    _, symbols = np.unique(np.repeat([b.symbol for b in batches], counts), return_inverse=True)
+    sides = (records['zoneType'] >= len(DEMAND_TYPES)).astype(np.int64)
+
+    # A zone is live from its leg-in to its exit (an unfilled zone until now)
+    legin = records['leginTime'].view(np.int64)
+    exits = records['exitTime'].view(np.int64)
+    exits = np.where(np.isnat(records['exitTime']), np.iinfo(np.int64).max, exits)
+    low = np.minimum(records['entryPrice'], records['stopLoss'])
+    high = np.maximum(records['entryPrice'], records['stopLoss'])
+    clusters = _overlap_clusters(symbols * 2 + sides, low, high, legin, exits)
+
+    priority = np.lexsort((records['zoneId'], -records['legoutTime'].view(np.int64),
+                           records['zoneStatus'], clusters))
+    first = np.r_[True, clusters[priority][1:] != clusters[priority][:-1]]
+    keep = np.zeros(len(records), dtype=bool)
+    keep[priority[first]] = True
+    merged = np.bincount(clusters)[clusters]
+
+    kept, start = [], 0
+    for b, count in zip(batches, counts):
+        part = slice(start, start + count)
+        rows = records[part][keep[part]]
+        rows['mergedCount'] = merged[part][keep[part]]
+        kept.append(ZoneBatch(b.symbol, b.timeframe, b.series_id, rows, b.tz))
+        start += count
+    return kept
+
+
+def _ranges_text(zone_type, legin, base, legout):
+    # Same text find_patterns writes: whole numbers for demand, 2 dp for supply
+    if ZONE_TYPES[zone_type] in DEMAND_TYPES:
+        return f"{round(legin)}:{round(base)}:{round(legout)}"
+    return f"{round(legin, 2)}:{round(base, 2)}:{round(legout, 2)}"
+
+
+def _local_times(values, tz):
+    times = pd.DatetimeIndex(values)
+    return times.tz_localize('UTC').tz_convert(tz) if tz is not None else times
+
+
+def zones_frame(batches):
+    # Patterns table (find_patterns column layout, flags as real bools) plus
+    # zoneId, mergedCount and the raw 'flags' bitmask for bitwise filtering
+    batches = [b for b in batches if len(b)]
+    if not batches:
+        return pd.DataFrame(columns=PATTERN_COLUMNS + EXTRA_COLUMNS)
+    records = np.concatenate([b.records for b in batches])
+    counts = [len(b) for b in batches]
+
+    # Times are stored as UTC and shown in each batch's own timezone
+    legin_text, legout_text, entry_dates, exit_dates = [], [], [], []
+    for b in batches:
+        date_format = zone_date_format(b.timeframe)
+        legin_text.extend(_local_times(b.records['leginTime'], b.tz).strftime(date_format))
+        legout_text.extend(_local_times(b.records['legoutTime'], b.tz).strftime(date_format))
+        entry_dates.append(_local_times(b.records['entryTime'], b.tz))
+        exit_dates.append(_local_times(b.records['exitTime'], b.tz))
+
+    flags = records['flags']
+    frame = {
+        'Symbol': np.repeat([b.symbol for b in batches], counts),
+        'timeFrame': np.repeat([b.timeframe for b in batches], counts),
+        'zoneStatus': np.asarray(ZONE_STATUSES, dtype=object)[records['zoneStatus']],
+        'zoneType': np.asarray(ZONE_TYPES, dtype=object)[records['zoneType']],
+        'entryPrice': records['entryPrice'],
+        'stopLoss': records['stopLoss'],
+        'Target': records['Target'],
+    }
+    for name in FLAG_FIELDS[:7]:
+        frame[name] = has_flag(flags, name)
+    frame.update({
+        'legoutCount': records['legoutCount'].astype(int),
+        'isOneTwoKaFour': has_flag(flags, 'isOneTwoKaFour'),
+        'entryDate': entry_dates[0].append(entry_dates[1:]),
+        'exitDate': exit_dates[0].append(exit_dates[1:]),
+        'exitIndex': pd.array(np.where(records['exitIndex'] >= 0, records['exitIndex'], None), dtype='Int64'),
+        'entryIndex': pd.array(np.where(records['entryIndex'] >= 0, records['entryIndex'], None), dtype='Int64'),
+        'zoneDistance': records['zoneDistance'],
+        'leginDate': legin_text,
+        'baseCount': records['baseCount'].astype(int),
+        'legoutDate': legout_text,
+        'leginIndex': records['leginIndex'].astype(int),
+        'legoutIndex': records['legoutIndex'].astype(int),
+        'leginBaseLegoutRanges': [_ranges_text(*r) for r in zip(records['zoneType'], records['leginRange'],
+                                                                records['baseRange'], records['legoutRange'])],
+        'ohlcRef': [(b.series_id, int(r['ohlcStart']), int(r['ohlcEnd'])) for b in batches for r in b.records],
+        'closePrice': records['closePrice'],
+        'zoneId': [f"{zone_id:016x}" for zone_id in records['zoneId'].tolist()],
+        'mergedCount': records['mergedCount'].astype(int),
+        'flags': flags,
+    })
+    return pd.DataFrame(frame)
+
+
+def status_counts(batches):
+    counts = np.zeros(len(ZONE_STATUSES), dtype=np.int64)
+    for b in batches:
+        counts += np.bincount(b.records['zoneStatus'], minlength=len(ZONE_STATUSES))
+    return dict(zip(ZONE_STATUSES, counts.tolist()))
@@ -0,0 +1,125 @@
+import argparse
+import sys
+
+import pandas as pd
+
+from candle_scheduler import CANDLE_SPANS, candle_close
+from zone_stream import StreamingDetector
+
+# Point-in-time replay of old_app's scanner: what find_patterns would have
+# shown right after each candle closed, without looking past that candle.
+# find_patterns itself labels zones with the whole series in hand (a zone is
+# Target if the price ever got there) and runs the time validation against
+# datetime.now(), so reproducing "the scan on date D" used to mean truncating
+# the data and rescanning once per date. Here the history is fed once, in
+# time order, through a StreamingDetector: every zone's entry / exit state is
+# carried forward candle by candle, and the time validation is run against
+# the candle's close instead of the clock.
+#   python zone_replay.py RELIANCE.NS --timeframe Daily --from 2024-01-01 --output changes.csv
+
+ZONE_KEY = ('leginIndex', 'legoutIndex', 'zoneType', 'entryPrice', 'stopLoss')
+CHANGE_COLUMNS = ['barTime', 'change']
+
+
+def bar_close(interval_key, when, holidays=()):
+    # When a candle stamped with its open time became final on NSE
+    if interval_key in CANDLE_SPANS:
+        return candle_close(interval_key, when, holidays)
+    return pd.Timestamp(when)
+
+
+def in_tz(when, tz):
+    # `when` comparable with times in tz: a naive time is read as tz's wall
+    # clock, an aware one is converted (tz None: naive times)
+    when = pd.Timestamp(when)
+    if tz is None:
+        return when.tz_localize(None) if when.tz is not None else when
+    return when.tz_localize(tz) if when.tz is None else when.tz_convert(tz)
+
+
+def replay_patterns(symbol, interval_key, ohlc, params, start=None, series_id=None, holidays=()):
+    # (bar time, find_patterns rows as of that bar) for every candle from
+    # start on; ohlc is the raw OHLC frame old_app fetches (before calculate_atr)
+    start = None if start is None else in_tz(start, ohlc.index.tz)
+    detector = StreamingDetector(symbol, interval_key, params)
+    columns = [ohlc[name].to_numpy(dtype=float) for name in ('Open', 'High', 'Low', 'Close')]
+    for when, o, h, l, c in zip(ohlc.index, *columns):
+        detector.append(when, o, h, l, c)
+        if start is not None and when < start:
+            continue
+        yield when, detector.patterns(series_id, bar_close(interval_key, when, holidays))
+
+
+def zone_key(pattern):
+    return tuple(pattern[name] for name in ZONE_KEY)
+
+
+def replay_changes(symbol, interval_key, ohlc, params, start=None, holidays=()):
+    # Only what changed from one candle to the next: a zone that appeared
+    # ('new'), changed status or legout-covered state ('status'), or left the
+    # scan's output ('dropped', e.g. moved out of the zone distance)
+    rows = []
+    shown = {}
+    for when, patterns in replay_patterns(symbol, interval_key, ohlc, params, start, holidays=holidays):
+        current = {zone_key(pattern): pattern for pattern in patterns}
+        for key, pattern in current.items():
+            before = shown.get(key)
+            if before is None:
+                rows.append(dict(pattern, barTime=when, change='new'))
+            elif (before['zoneStatus'], before['isLegoutCovered'], before['isTimeValidationPass']) != \
+                    (pattern['zoneStatus'], pattern['isLegoutCovered'], pattern['isTimeValidationPass']):
+                rows.append(dict(pattern, barTime=when, change='status'))
+        for key in shown.keys() - current.keys():
+            rows.append(dict(shown[key], barTime=when, change='dropped'))
+        shown = current
+    if not rows:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    changes = pd.DataFrame(rows)
+    return changes[CHANGE_COLUMNS + [name for name in changes.columns if name not in CHANGE_COLUMNS]]
+
+
+def visible_at(changes, when):
+    # The zones shown as of `when`, rebuilt from replay_changes() output
+    times = pd.DatetimeIndex(changes['barTime'])
+    changes = changes[times <= in_tz(when, times.tz)]
+    if changes.empty:
+        return changes
+    latest = changes.drop_duplicates(subset=list(ZONE_KEY), keep='last')
+    return latest[latest['change'] != 'dropped'].sort_values(['legoutIndex', 'zoneType'], ascending=[False, True])
+
+
+# ---------------- CLI ---------------- #
+def main(argv=None):
+    import pandas_market_calendars as mcal
+    from candle_scheduler import nse_holidays
+    from market_data import TIMEFRAMES, fetch_data
+    from zone_backtest import BACKTEST_PARAMS
+
+    parser = argparse.ArgumentParser(description="Replay the zone scanner bar by bar without look-ahead.")
+    parser.add_argument("symbol")
+    parser.add_argument("--timeframe", default="Daily", choices=list(TIMEFRAMES))
+    parser.add_argument("--period", default="2y", help="history to fetch (yfinance period)")
+    parser.add_argument("--from", dest="start", default=None, help="first bar to report")
+    parser.add_argument("--reward", type=float, default=5, help="reward_value (target in multiples of risk)")
+    parser.add_argument("--max-base", type=int, default=BACKTEST_PARAMS['max_base_candles'])
+    parser.add_argument("--time-validation", action="store_true", help="apply the time validation filter")
+    parser.add_argument("--output", default=None, help="write the changes to this .csv")
+    args = parser.parse_args(argv)
+
+    params = dict(BACKTEST_PARAMS, reward_value=args.reward, max_base_candles=args.max_base,
+                  time_validation_allowed=args.time_validation)
+    ohlc = fetch_data(args.symbol, TIMEFRAMES[args.timeframe], args.period)
+    if ohlc.empty:
+        print(f"No data for {args.symbol}", file=sys.stderr)
+        return 1
+    changes = replay_changes(args.symbol, args.timeframe, ohlc, params, args.start, nse_holidays(mcal.get_calendar('NSE')))
+    columns = ['barTime', 'change', 'zoneType', 'zoneStatus', 'entryPrice', 'stopLoss', 'Target', 'legoutDate']
+    with pd.option_context('display.width', 200, 'display.max_rows', 200):
+        print(changes[columns].to_string(index=False) if len(changes) else "No zones")
+    if args.output:
+        changes.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from bar_store import DEFAULT_CAPACITY, BarRing
+from zone_engine import (PATTERN_BAR_COLUMNS, ZoneOutcome, pattern_dict, pattern_rules,
+                         zone_setups)
+
+# Streaming version of zone_engine.find_patterns for one (symbol, timeframe).
+# Closed candles are appended one at a time; TR / ATR are carried forward
+# instead of recomputed, only the leg-out candidates the new candle can affect
+# are re-evaluated, and tracked zones sleep on price triggers until a candle
+# reaches one of their levels. patterns() returns exactly what find_patterns
+# returns over the same candles (as prepared by calculate_atr(...).round(2)).
+#
+# A setup with leg-out i reads candles up to i + 2, so it is final once candle
+# i + 2 has closed. The two newest leg-outs are provisional and re-evaluated
+# on every candle, which keeps the per-candle cost independent of history.
+#
+# The candles live in a bar_store.BarRing: only the newest `capacity` stay in
+# memory, which is plenty since detection reads a few candles around the
+# newest leg-outs and tracked zones only look at the candle just closed.
+# Candles keep their absolute number (0 = first appended), and the times a
+# tracked zone reports (leg-in, leg-out, entry, exit) are pinned when the
+# zone reaches them, so they outlive the window.
+
+ATR_LENGTH = 14
+MIN_CAPACITY = 16  # candles zone_setups / the leg-out checks may look back over, plus slack
+
+
+class _Column:
+    # A BarRing column addressed by absolute candle number (ints and slices)
+    __slots__ = ('values', 'offset')
+
+    def __init__(self, values, offset):
+        self.values = values
+        self.offset = offset
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.values[key.start - self.offset:key.stop - self.offset]
+        return self.values[key - self.offset]
+
+
+class _CandleTimes:
+    # times[k] for absolute candle k: pinned times first, then the ring
+    __slots__ = ('detector',)
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def __getitem__(self, k):
+        return self.detector._time(k)
+
+
+class StreamingDetector:
+    def __init__(self, symbol, interval_key, params, capacity=DEFAULT_CAPACITY):
+        # params: the find_patterns keyword arguments (max_base_candles, ...);
+        # capacity: candles kept in memory
+        self.symbol = symbol
+        self.interval_key = interval_key
+        self.params = dict(params)
+        self.rules = pattern_rules(**self.params)
+        self.reward_value = self.params['reward_value']
+        self.n = 0
+        self.ring = BarRing(max(capacity, MIN_CAPACITY + self.rules['max_base_candles']), PATTERN_BAR_COLUMNS)
+        self.times = _CandleTimes(self)
+        self._pinned = {}  # candle number -> time, for the candles tracked zones report
+        self._prev_close = None
+        self._atr = None
+        self._atr_alpha = 1 / ATR_LENGTH
+
+        self._zones = []  # final ZoneOutcomes, by leg-out then find_patterns order
+        self._provisional = []  # the same for the two newest leg-outs
+        self._falls = []  # heap of (-level, strict, seq, zone, version): wakes on low <= level
+        self._rises = []  # heap of (level, strict, seq, zone, version): wakes on high >= level
+        self._versions = []  # per final zone, bumped whenever its triggers are re-armed
+        self._seq = 0
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def bars(self):
+        # pattern_bars-style columns over the candles in memory, indexed by
+        # absolute candle number (views, no copy)
+        offset = self.n - len(self.ring)
+        return {name: _Column(values, offset) for name, values in self.ring.views().items()}
+
+    def _time(self, k):
+        when = self._pinned.get(k)
+        if when is not None:
+            return when
+        ring = self.ring
+        when = pd.Timestamp(int(ring.times()[k - (self.n - len(ring))]))
+        return when.tz_localize('UTC').tz_convert(ring.tz) if ring.tz is not None else when
+
+    def _pin(self, *indices):
+        for k in indices:
+            if k is not None and k not in self._pinned:
+                self._pinned[k] = self._time(k)
+
+    # ---------------- CANDLES ---------------- #
+    def append(self, when, open_, high, low, close):
+        # Add one closed candle; returns the number of candles so far
+        when = pd.Timestamp(when)
+        tr = high - low
+        if self._prev_close is not None:
+            tr = max(tr, abs(high - self._prev_close), abs(low - self._prev_close))
+        if self._atr is None:
+            self._atr = tr
+        elif self._atr != tr:
+            # Same update (and rounding) as pandas' ewm(alpha, adjust=False).mean()
+            old_weight = 1. - self._atr_alpha
+            self._atr = (old_weight * self._atr + self._atr_alpha * tr) / (old_weight + self._atr_alpha)
+        self._prev_close = close
+
+        t = self.n
+        values = (open_, high, low, close, tr, self._atr, high - low, abs(close - open_))
+        self.ring.append(when, *(np.round(value, 2) for value in values))
+        self.n = t + 1
+        self._advance(t)
+        return self.n
+
+    def _advance(self, t):
+        bars, n = self.bars, self.n
+        self._wake(bars, t)
+
+        # Leg-out t - 2 has now seen every candle it reads: track it for good
+        # and catch it up on the candles after it
+        i = t - 2
+        if i >= 3:
+            for setup in zone_setups(bars, n, i, self.rules):
+                zone = ZoneOutcome(setup, self.reward_value)
+                for m in range(i, n):
+                    _observe(zone, bars, m)
+                self._track(zone)
+
+        self._provisional = []
+        for i in (t - 1, t):
+            if i >= 3:
+                for setup in zone_setups(bars, n, i, self.rules):
+                    zone = ZoneOutcome(setup, self.reward_value)
+                    zone.settle(bars, n)
+                    self._provisional.append(zone)
+
+    # ---------------- TRIGGERS ---------------- #
+    def _wake(self, bars, m):
+        # Zones with a level inside candle m's range, each once
+        high, low = bars['High'][m], bars['Low'][m]
+        woken = set()
+        falls, rises, versions = self._falls, self._rises, self._versions
+        while falls and (-falls[0][0] > low or (-falls[0][0] == low and not falls[0][1])):
+            _, _, _, k, version = heapq.heappop(falls)
+            if versions[k] == version:
+                woken.add(k)
+        while rises and (rises[0][0] < high or (rises[0][0] == high and not rises[0][1])):
+            _, _, _, k, version = heapq.heappop(rises)
+            if versions[k] == version:
+                woken.add(k)
+        for k in sorted(woken):
+            zone = self._zones[k]
+            _observe(zone, bars, m)
+            self._pin(zone.entry_index, zone.exit_index)
+            self._arm(k, zone)
+
+    def _track(self, zone):
+        k = len(self._zones)
+        s = zone.setup
+        self._pin(s['leginIndex'], s['legoutIndex'], zone.entry_index, zone.exit_index)
+        self._zones.append(zone)
+        self._versions.append(0)
+        self._arm(k, zone)
+
+    def _arm(self, k, zone):
+        # Re-arm the levels at which the zone's state can next change; older
+        # triggers of the zone are dropped as they surface
+        self._versions[k] += 1
+        if zone.status is not None:
+            return
+        s = zone.setup
+        demand = s['demand']
+        if zone.entry_index is not None:
+            if demand:
+                self._push(k, s['stopLoss'], rising=False, strict=True)
+                self._push(k, zone.target, rising=True, strict=False)
+            else:
+                self._push(k, s['entryPrice'], rising=True, strict=True)
+                self._push(k, zone.target, rising=False, strict=False)
+            return
+        if demand:
+            self._push(k, s['entryPrice'], rising=False, strict=False)
+        else:
+            self._push(k, s['stopLoss'], rising=True, strict=False)
+        if not zone.crossed:
+            self._push(k, zone.half, rising=not demand, strict=False)
+        if not zone.beyond or (zone.crossed and not zone.covered):
+            self._push(k, zone.limit, rising=demand, strict=True)
+
+    def _push(self, k, level, rising, strict):
+        self._seq += 1
+        if rising:
+            heapq.heappush(self._rises, (level, strict, self._seq, k, self._versions[k]))
+        else:
+            heapq.heappush(self._falls, (-level, strict, self._seq, k, self._versions[k]))
+
+    # ---------------- RESULTS ---------------- #
+    def patterns(self, series_id=None, as_of=None):
+        # find_patterns(symbol, <candles so far>, interval_key, **params), with
+        # the time validation run against as_of instead of the clock if given
+        n = self.n
+        if n < 3:
+            return []
+        max_zones = self.params.get('max_zones')
+        max_lookback_bars = self.params.get('max_lookback_bars')
+        last_scanned_index = 2 if max_lookback_bars is None else max(2, n - 1 - max_lookback_bars)
+        bars, times = self.bars, self.times
+
+        patterns = []
+        i = None
+        for zone in reversed(self._ordered()):
+            legout = zone.setup['legoutIndex']
+            if legout <= last_scanned_index:
+                break
+            if legout != i:
+                if max_zones is not None and len(patterns) >= max_zones:
+                    break
+                i = legout
+            pattern = pattern_dict(self.symbol, self.interval_key, zone, bars, times, n,
+                                   self.rules, series_id, as_of)
+            if pattern is not None:
+                patterns.append(pattern)
+        return patterns[:max_zones]
+
+    def _ordered(self):
+        # Tracked zones in scan order, reversed per leg-out so that walking the
+        # list backwards gives find_patterns' order (newest leg-out first,
+        # demand before supply, fewest base candles first)
+        zones = self._zones + self._provisional
+        ordered, start = [], 0
+        for end in range(1, len(zones) + 1):
+            if end == len(zones) or zones[end].setup['legoutIndex'] != zones[start].setup['legoutIndex']:
+                ordered.extend(reversed(zones[start:end]))
+                start = end
+        return ordered
+
+
+def _observe(zone, bars, m):
+    # One candle of ZoneOutcome's walk: the legout-covered scan until entry,
+    # the entry / exit step from startIndex on
+    if zone.status is not None:
+        return
+    if zone.entry_index is None:
+        zone.scan(bars, m)
+        if m < zone.setup['startIndex']:
+            return
+    zone.step(bars, m)
+
+
+def replay(symbol, interval_key, ohlc, params):
+    # Feed a raw OHLC frame through a detector candle by candle
+    detector = StreamingDetector(symbol, interval_key, params)
+    for when, o, h, l, c in zip(ohlc.index, ohlc['Open'].to_numpy(dtype=float), ohlc['High'].to_numpy(dtype=float),
+                                ohlc['Low'].to_numpy(dtype=float), ohlc['Close'].to_numpy(dtype=float)):
+        detector.append(when, o, h, l, c)
+    return detector